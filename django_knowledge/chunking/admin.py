@@ -11,8 +11,8 @@ class ChunkDescriptionInline(admin.TabularInline):
 
 @admin.register(Chunk)
 class ChunkAdmin(admin.ModelAdmin):
-    list_display = ('python_file', 'updated_at', 'created_at')
-    list_filter = ('python_file__project', 'created_at', 'updated_at')
+    list_display = ('python_file', 'kind', 'position', 'start_line', 'end_line', 'num_tokens', 'updated_at')
+    list_filter = ('python_file__project', 'kind', 'is_leaf', 'created_at', 'updated_at')
     search_fields = ('content', 'python_file__module_path', 'python_file__project__name')
     readonly_fields = ('created_at', 'updated_at')
     ordering = ('-updated_at',)
@@ -44,7 +44,7 @@ class ChunkDescriptionAdmin(admin.ModelAdmin):
 
 @admin.register(ChunkConfig)
 class ChunkConfigAdmin(admin.ModelAdmin):
-    list_display = ('id', 'content_preview', 'created_at', 'updated_at')
+    list_display = ('id', 'content_preview', 'files_chunked', 'completed_at', 'updated_at')
     list_filter = ('created_at', 'updated_at')
     search_fields = ('content',)
     readonly_fields = ('created_at', 'updated_at')
@@ -0,0 +1,130 @@
+import multiprocessing
+import random
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from .chunker import ChunkTarget, chunk_files
+
+# Top-level definitions per file of each synthetic corpus size
+CORPUS_SIZES = {"small": 4, "medium": 40, "large": 400}
+DEFAULT_FILES_PER_SIZE = 50
+
+WORDS = (
+    "user", "order", "item", "price", "total", "cache", "query", "result",
+    "config", "value", "index", "path", "name", "count", "token", "record",
+)
+
+
+def synthetic_function(rng: random.Random, name: str, indent: str = "") -> str:
+    args = rng.sample(WORDS, rng.randint(1, 4))
+    lines = [
+        f"{indent}def {name}({', '.join(args)}):",
+        f'{indent}    """Compute the {rng.choice(WORDS)} of {" and ".join(args)}."""',
+        f"{indent}    {rng.choice(WORDS)}_list = []",
+    ]
+    for _ in range(rng.randint(2, 12)):
+        word, other = rng.choice(WORDS), rng.choice(args)
+        statement = rng.choice(
+            (
+                f"    for {word} in {other}:\n{indent}        {word}_list.append({word})",
+                f"    if {other} is not None and {other} > {rng.randint(0, 99)}:\n"
+                f"{indent}        {other} = {other} * {rng.randint(2, 9)}",
+                f"    {word} = {other} + {rng.randint(0, 999)}",
+                f'    logger.info(f"{word}: {{{other}}}")',
+            )
+        )
+        lines.append(indent + statement)
+    lines.append(f"{indent}    return {rng.choice(args)}")
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_module(rng: random.Random, num_definitions: int) -> str:
+    """A module of functions and classes with methods, plausible enough to chunk."""
+    parts = ["import logging\nimport os\n\nlogger = logging.getLogger(__name__)\n"]
+    for i in range(num_definitions):
+        word = rng.choice(WORDS)
+        if rng.random() < 0.3:
+            methods = "\n".join(
+                synthetic_function(rng, f"{rng.choice(WORDS)}_{m}", indent="    ")
+                for m in range(rng.randint(1, 6))
+            )
+            parts.append(
+                f"\nclass {word.title()}{i}:\n    \"\"\"A {word}.\"\"\"\n\n{methods}"
+            )
+        else:
+            parts.append("\n" + synthetic_function(rng, f"{word}_{i}"))
+    return "\n".join(parts)
+
+
+def synthetic_corpus(size: str, num_files: int = DEFAULT_FILES_PER_SIZE, seed: int = 0) -> list[str]:
+    """The same files for the same arguments, so runs can be compared across commits."""
+    rng = random.Random(f"{seed}-{size}")
+    return [synthetic_module(rng, CORPUS_SIZES[size]) for _ in range(num_files)]
+
+
+def peak_rss_mb() -> dict[str, float]:
+    """High-water marks of resident memory of this process and of its largest finished child.
+
+    Both only ever grow, so they describe one run when taken in a process of
+    its own, see benchmark_chunking.
+    """
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit,
+    }
+
+
+def benchmark_chunking(
+    contents: list[str],
+    chunk_size: int,
+    strategy: str = "code_chunker",
+    workers: int = 1,
+    **chunker_kwargs,
+) -> dict:
+    """Chunk `contents` the way chunk_code does, without the database, and time it.
+
+    The run happens in a process forked for it alone, so its peak RSS is not
+    that of an earlier, bigger run. "growth" is how far the run raised the
+    process's RSS above what it started with, i.e. the corpus and the imports.
+    """
+    # Forked rather than spawned, so the child has the parent's setup and corpus
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(
+            run_chunking, contents, chunk_size, strategy, workers, **chunker_kwargs
+        ).result()
+
+
+def run_chunking(
+    contents: list[str], chunk_size: int, strategy: str, workers: int, **chunker_kwargs
+) -> dict:
+    start_rss = peak_rss_mb()["self"]
+    items = ((i, content, (0,), None) for i, content in enumerate(contents))
+    num_bytes = sum(len(content.encode("utf-8")) for content in contents)
+
+    start = perf_counter()
+    num_chunks = 0
+    for _, spans_per_target in chunk_files(
+        items,
+        workers=workers,
+        targets=[ChunkTarget(chunk_size, strategy)],
+        **chunker_kwargs,
+    ):
+        num_chunks += len(spans_per_target[0])
+    elapsed = perf_counter() - start
+    peak_rss = peak_rss_mb()
+
+    return {
+        "files": len(contents),
+        "chunks": num_chunks,
+        "bytes": num_bytes,
+        "seconds": elapsed,
+        "files_per_sec": len(contents) / elapsed if elapsed else 0,
+        "chunks_per_sec": num_chunks / elapsed if elapsed else 0,
+        "mb_per_sec": num_bytes / 1024 / 1024 / elapsed if elapsed else 0,
+        "peak_rss_mb": {**peak_rss, "growth": peak_rss["self"] - start_rss},
+    }
@@ -1,9 +1,374 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Iterable, Iterator, Optional
+
+from chonkie import CodeChunker
+from django.db.models import Q
+
+from synthetic_data_generator.models import PythonFile
+from synthetic_data_generator.symbols import Symbol
+from tokenization.cache import DB_BATCH_SIZE
+from tokenization.registry import get_tokenizer, load_encoding
+
 from .models import Chunk, ChunkDescription
+from .splitter import ParsedSource, ast_hierarchy, ast_windows
+
+# Files with more tokens than this are split by chunking.splitter instead of the CodeChunker
+MAX_CHUNKABLE_TOKENS = 2048
+# How files that fit the chunker are split, see ChunkTarget
+STRATEGIES = ("code_chunker", "ast_windows", "hierarchy")
+# Chunks whose context windows are fetched per query
+EXPAND_BATCH_SIZE = 200
 
 
 def get_chunks(chunk_config_id: int):
-    return Chunk.objects.filter(config_id=chunk_config_id)
+    """The chunks to embed, i.e. all of them except the parents of hierarchy configurations."""
+    return Chunk.objects.filter(config_id=chunk_config_id, is_leaf=True)
 
 
 def get_chunk_descriptions():
     return ChunkDescription.objects.all()
+
+
+def materialize_chunks(chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+    """Yield the chunks with their `text` filled in, slicing offset-only chunks from their files.
+
+    Chunks are handled in batches: the files of a batch's offset-only chunks
+    are fetched with one query and each is encoded once for all its chunks.
+    """
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == DB_BATCH_SIZE:
+            yield from _materialize_batch(batch)
+            batch = []
+    yield from _materialize_batch(batch)
+
+
+def _materialize_batch(batch: list[Chunk]) -> list[Chunk]:
+    file_ids = {
+        chunk.python_file_id
+        for chunk in batch
+        if chunk.content is None and "text" not in chunk.__dict__
+    }
+    encoded = {
+        file_id: content.encode("utf-8")
+        for file_id, content in PythonFile.objects.filter(id__in=file_ids).values_list(
+            "id", "content"
+        )
+    }
+    for chunk in batch:
+        if chunk.python_file_id in encoded and "text" not in chunk.__dict__:
+            # Sets the Chunk.text cached_property
+            chunk.text = encoded[chunk.python_file_id][chunk.start_byte : chunk.end_byte].decode(
+                "utf-8"
+            )
+    return batch
+
+
+def expand_context(chunks: Iterable[Chunk], k: int = 1) -> dict[int, list[Chunk]]:
+    """Each chunk's window of itself plus up to `k` sibling chunks either side, by chunk id.
+
+    The windows of a batch of chunks are fetched with a single query of
+    position ranges, each served by the (python_file, config, position) index.
+    """
+    chunks = list(chunks)
+    windows = {}
+    for i in range(0, len(chunks), EXPAND_BATCH_SIZE):
+        batch = chunks[i : i + EXPAND_BATCH_SIZE]
+        ranges = Q()
+        for chunk in batch:
+            ranges |= Q(
+                python_file_id=chunk.python_file_id,
+                config_id=chunk.config_id,
+                parent_id=chunk.parent_id,
+                position__range=(chunk.position - k, chunk.position + k),
+            )
+
+        by_file = {}
+        for found in Chunk.objects.filter(ranges).order_by("position"):
+            key = (found.python_file_id, found.config_id, found.parent_id)
+            by_file.setdefault(key, []).append(found)
+        for chunk in batch:
+            windows[chunk.id] = [
+                found
+                for found in by_file.get((chunk.python_file_id, chunk.config_id, chunk.parent_id), [])
+                if abs(found.position - chunk.position) <= k
+            ]
+    return windows
+
+
+def fetch_parents(chunks: Iterable[Chunk], kind: Optional[str] = None) -> dict[int, Chunk]:
+    """Each chunk's parent, or its nearest ancestor of `kind` such as "class" or "file", by chunk id.
+
+    Ancestors are fetched with one query per level of the hierarchy climbed,
+    and their text is materialized in bulk. Chunks without one are left out.
+    """
+    pending = {chunk.id: chunk.parent_id for chunk in chunks if chunk.parent_id}
+    fetched, found = {}, {}
+    while pending:
+        fetched.update(Chunk.objects.in_bulk(set(pending.values()) - fetched.keys()))
+        climbing = {}
+        for chunk_id, parent_id in pending.items():
+            parent = fetched[parent_id]
+            if kind is None or parent.kind == kind:
+                found[chunk_id] = parent
+            elif parent.parent_id:
+                climbing[chunk_id] = parent.parent_id
+        pending = climbing
+    list(materialize_chunks({parent.id: parent for parent in found.values()}.values()))
+    return found
+
+
+@dataclass
+class ChunkSpan:
+    """A chunk's text and where it sits in its file."""
+
+    text: str
+    position: int
+    start_line: int  # 1-based, inclusive
+    end_line: int
+    start_byte: int  # UTF-8 offsets into the file, end exclusive
+    end_byte: int
+    num_tokens: int = 0
+    kind: str = ""  # Set for hierarchy chunks, see chunking.splitter.ast_hierarchy
+    parent: Optional[int] = None  # Index of the parent among the file's spans
+    is_leaf: bool = True
+
+
+def locate_chunks(content: str, chunks: list) -> list[ChunkSpan]:
+    """Work out the line and byte ranges of chunks produced in order from `content`.
+
+    A chunk's own start_index is used when it checks out, otherwise its text is
+    searched for from the end of the previous chunk. Offsets are computed
+    incrementally, so this is linear in the size of the file.
+    """
+    spans = []
+    cursor, cursor_byte, cursor_line = 0, 0, 1
+
+    def advance(index: int):
+        nonlocal cursor, cursor_byte, cursor_line
+        if index >= cursor:
+            cursor_byte += len(content[cursor:index].encode("utf-8"))
+            cursor_line += content.count("\n", cursor, index)
+        else:
+            # Overlapping chunks step back a little
+            cursor_byte -= len(content[index:cursor].encode("utf-8"))
+            cursor_line -= content.count("\n", index, cursor)
+        cursor = index
+
+    for position, chunk in enumerate(chunks):
+        text = chunk.text
+        start = getattr(chunk, "start_index", None)
+        if start is None or content[start : start + len(text)] != text:
+            found = content.find(text, cursor)
+            start = found if found != -1 else content.find(text)
+        if start == -1:
+            raise ValueError(f"Chunk {position} is not part of the file's content")
+
+        advance(start)
+        start_byte, start_line = cursor_byte, cursor_line
+        advance(start + len(text))
+        end_line = cursor_line - (1 if text.endswith("\n") else 0)
+        spans.append(
+            ChunkSpan(
+                text=text,
+                position=position,
+                start_line=start_line,
+                end_line=max(end_line, start_line),
+                start_byte=start_byte,
+                end_byte=cursor_byte,
+            )
+        )
+    return spans
+
+
+@dataclass(frozen=True)
+class ChunkTarget:
+    """One chunk configuration a file is chunked for.
+
+    The "code_chunker" strategy hands files to chonkie's CodeChunker and only
+    splits files over MAX_CHUNKABLE_TOKENS with chunking.splitter, the
+    "ast_windows" strategy splits every file with chunking.splitter. The
+    "hierarchy" strategy produces file, class and function chunks linked to
+    their parents, whose leaves are at most `chunk_size`.
+    """
+
+    chunk_size: int
+    strategy: str = "code_chunker"
+
+
+class FileChunker:
+    """Turns a file's content into located chunks for one or more targets, the unit of work of chunk_code.
+
+    Each file is read and token counted once whatever the number of targets,
+    and its syntax tree and line index are built at most once and shared by
+    every target split with chunking.splitter, optionally overlapping by
+    `overlap_lines`. The CodeChunker parses on its own, once per chunk size.
+
+    Tokens are counted with `count_tokens_many` when given, otherwise with the
+    raw encoding, which is what worker processes use since they must not share
+    the database-backed token count cache.
+    """
+
+    def __init__(
+        self,
+        language: str,
+        targets: list[ChunkTarget],
+        embedding_model: Optional[str] = None,
+        count_tokens_many: Optional[Callable[[list[str]], list[int]]] = None,
+        overlap_lines: int = 0,
+    ):
+        self.targets = list(targets)
+        self.embedding_model = embedding_model
+        self.overlap_lines = overlap_lines
+        self.chunkers = {
+            target.chunk_size: CodeChunker(
+                language=language,
+                tokenizer=get_tokenizer(embedding_model).backend if embedding_model else "character",
+                chunk_size=target.chunk_size,
+                include_nodes=False,
+            )
+            for target in self.targets
+            if target.strategy == "code_chunker"
+        }
+        if count_tokens_many is None:
+            encoding = load_encoding(embedding_model or "cl100k_base")
+            count_tokens_many = lambda texts: [
+                len(ids) for ids in encoding.encode_ordinary_batch(texts)
+            ]
+        self.count_tokens_many = count_tokens_many
+
+    def __call__(
+        self,
+        content: str,
+        targets: Optional[Iterable[int]] = None,
+        symbols: Optional[list[Symbol]] = None,
+    ) -> dict[int, list[ChunkSpan]]:
+        """Chunks per target index, for all targets or only the given indices.
+
+        With the file's stored `symbols` the hierarchy is built without parsing it again.
+        """
+        targets = range(len(self.targets)) if targets is None else targets
+        [num_tokens] = self.count_tokens_many([content])
+        parsed = None
+        results = {}
+        for i in targets:
+            target = self.targets[i]
+            if target.strategy == "hierarchy":
+                parsed = parsed or ParsedSource(content, self.measure_many, symbols)
+                results[i] = self.hierarchy(content, target.chunk_size, parsed)
+            elif target.strategy == "ast_windows" or num_tokens > MAX_CHUNKABLE_TOKENS:
+                parsed = parsed or ParsedSource(content, self.measure_many, symbols)
+                results[i] = self.split(content, target.chunk_size, parsed)
+            else:
+                results[i] = locate_chunks(content, self.chunkers[target.chunk_size].chunk(content))
+
+        # One call counts the chunks of every target
+        spans = [span for target_spans in results.values() for span in target_spans]
+        for span, count in zip(spans, self.count_tokens_many([span.text for span in spans])):
+            span.num_tokens = count
+        return results
+
+    def measure_many(self, texts: list[str]) -> list[int]:
+        """Sizes in the chunker's units, i.e. what chunk_size is measured in."""
+        if self.embedding_model:
+            return self.count_tokens_many(texts)
+        return [len(text) for text in texts]
+
+    def split(self, content: str, chunk_size: int, parsed: ParsedSource) -> list[ChunkSpan]:
+        """Windows of whole classes, methods and statements, e.g. for files too big for the chunker."""
+        index = parsed.index
+        windows = ast_windows(
+            content,
+            chunk_size,
+            self.measure_many,
+            overlap_lines=self.overlap_lines,
+            parsed=parsed,
+        )
+        return [
+            ChunkSpan(
+                text=index.text(start, end),
+                position=position,
+                start_line=start,
+                end_line=end,
+                start_byte=index.byte_prefix[start - 1],
+                end_byte=index.byte_prefix[end],
+            )
+            for position, (start, end) in enumerate(windows)
+        ]
+
+    def hierarchy(self, content: str, chunk_size: int, parsed: ParsedSource) -> list[ChunkSpan]:
+        index = parsed.index
+        nodes = ast_hierarchy(
+            content,
+            chunk_size,
+            self.measure_many,
+            overlap_lines=self.overlap_lines,
+            parsed=parsed,
+        )
+        return [
+            ChunkSpan(
+                text=index.text(node.start_line, node.end_line),
+                position=node.position,
+                start_line=node.start_line,
+                end_line=node.end_line,
+                start_byte=index.byte_prefix[node.start_line - 1],
+                end_byte=index.byte_prefix[node.end_line],
+                kind=node.kind,
+                parent=node.parent,
+                is_leaf=node.is_leaf,
+            )
+            for node in nodes
+        ]
+
+
+# The FileChunker of a worker process, built once by the pool initializer
+_worker_chunker: Optional[FileChunker] = None
+
+
+def init_worker(**chunker_kwargs):
+    global _worker_chunker
+    _worker_chunker = FileChunker(**chunker_kwargs)
+
+
+def chunk_in_worker(
+    item: tuple[int, str, tuple[int, ...], Optional[list[Symbol]]]
+) -> tuple[int, dict[int, list[ChunkSpan]]]:
+    file_id, content, targets, symbols = item
+    return file_id, _worker_chunker(content, targets, symbols)
+
+
+def chunk_files(
+    items: Iterable[tuple[int, str, tuple[int, ...], Optional[list[Symbol]]]],
+    workers: int = 1,
+    file_chunker: Optional[FileChunker] = None,
+    **chunker_kwargs,
+) -> Iterator[tuple[int, dict[int, list[ChunkSpan]]]]:
+    """Chunk (file_id, content, target indices, symbols) items, yielding (file_id, chunks per target) in input order.
+
+    Symbols are the file's stored ones, or None to extract them when needed.
+
+    With more than one worker the files are chunked in a process pool whose
+    workers each build their chunker and encoding once. Results come back in
+    input order with a bounded number of files in flight, so the output is the
+    same as in serial mode.
+    """
+    if workers <= 1:
+        file_chunker = file_chunker or FileChunker(**chunker_kwargs)
+        for file_id, content, targets, symbols in items:
+            yield file_id, file_chunker(content, targets, symbols)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=partial(init_worker, **chunker_kwargs)
+    ) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(chunk_in_worker, item))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
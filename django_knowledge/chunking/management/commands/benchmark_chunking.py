@@ -0,0 +1,107 @@
+import json
+import platform
+from pathlib import Path
+
+import djclick as click
+from loguru import logger
+
+from chunking.benchmark import (
+    CORPUS_SIZES,
+    DEFAULT_FILES_PER_SIZE,
+    benchmark_chunking,
+    synthetic_corpus,
+)
+from chunking.chunker import STRATEGIES
+
+
+@click.command()
+@click.option(
+    "--size",
+    "sizes",
+    multiple=True,
+    type=click.Choice(list(CORPUS_SIZES)),
+    help="Synthetic corpus to chunk, by file size (default: all)",
+)
+@click.option(
+    "--files",
+    default=DEFAULT_FILES_PER_SIZE,
+    type=int,
+    help=f"Files per corpus (default: {DEFAULT_FILES_PER_SIZE})",
+)
+@click.option(
+    "--chunk-size",
+    "chunk_sizes",
+    multiple=True,
+    type=int,
+    default=[512, 2048],
+    help="Chunk size to benchmark, repeat for several (default: 512 and 2048)",
+)
+@click.option(
+    "--workers",
+    "worker_counts",
+    multiple=True,
+    type=int,
+    default=[1, 4],
+    help="Worker count to benchmark, repeat for several (default: 1 and 4)",
+)
+@click.option(
+    "--strategy",
+    "strategies",
+    multiple=True,
+    type=click.Choice(STRATEGIES),
+    default=["code_chunker"],
+    help="Chunking strategy to benchmark, repeat for several (default: code_chunker)",
+)
+@click.option("--language", default="python", help="Programming language for chunking")
+@click.option("--seed", default=0, type=int, help="Seed of the synthetic corpus")
+@click.option(
+    "--output",
+    default="chunking_benchmark.json",
+    help="Path the results are written to as JSON",
+)
+def command(sizes, files, chunk_sizes, worker_counts, strategies, language, seed, output):
+    """Benchmark chunk_code's chunking path on fixed synthetic corpora.
+
+    Every combination of corpus size, strategy, chunk size and worker count
+    is chunked as chunk_code would, without the database, and reported as
+    files/sec, chunks/sec and MB/sec. The corpora only depend on --files and
+    --seed, so results from different commits are comparable. Each run is
+    forked into a process of its own, so its peak RSS, that of its largest
+    worker and its RSS growth are its own.
+    """
+    runs = []
+    for size in sizes or CORPUS_SIZES:
+        contents = synthetic_corpus(size, files, seed=seed)
+        for strategy in strategies:
+            for chunk_size in chunk_sizes:
+                for workers in worker_counts:
+                    result = benchmark_chunking(
+                        contents,
+                        chunk_size,
+                        strategy=strategy,
+                        workers=workers,
+                        language=language,
+                    )
+                    result.update(
+                        corpus=size, strategy=strategy, chunk_size=chunk_size, workers=workers
+                    )
+                    runs.append(result)
+                    logger.info(
+                        f"{size} {strategy} chunk_size={chunk_size} workers={workers}:\t"
+                        f"{result['files_per_sec']:.1f} files/sec, "
+                        f"{result['chunks_per_sec']:.1f} chunks/sec, "
+                        f"{result['mb_per_sec']:.2f} MB/sec, "
+                        f"peak RSS {result['peak_rss_mb']['self']:.0f} MB "
+                        f"(+{result['peak_rss_mb']['growth']:.0f} MB, "
+                        f"workers {result['peak_rss_mb']['children']:.0f} MB)"
+                    )
+
+    report = {
+        "files_per_corpus": files,
+        "seed": seed,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "runs": runs,
+    }
+    Path(output).write_text(json.dumps(report, indent=2))
+    logger.success(f"Wrote benchmark results to {output}")
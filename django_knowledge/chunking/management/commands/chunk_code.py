@@ -1,19 +1,31 @@
+from django.db import transaction
+from django.utils import timezone
 import djclick as click
-from chonkie import CodeChunker
 from loguru import logger
+from synthetic_data_generator.ingestion import content_hash
 from synthetic_data_generator.models import PythonFile
+from synthetic_data_generator.symbol_index import batched, get_symbol_tables
+from chunking.chunker import STRATEGIES, ChunkTarget, FileChunker, chunk_files
 from chunking.models import Chunk, ChunkConfig
-import tiktoken
-from dataclasses import dataclass
-
-enc = tiktoken.get_encoding("cl100k_base")
+from tokenization.cache import DB_BATCH_SIZE, get_token_counter
+from tokenization.registry import get_tokenizer
 
 @click.command()
 @click.option(
     '--chunk-size',
-    default=2048,
+    'chunk_sizes',
+    default=[2048],
     type=int,
-    help='Maximum tokens per chunk (default: 2048)'
+    multiple=True,
+    help='Maximum tokens per chunk (default: 2048), repeat to sweep several sizes in one pass'
+)
+@click.option(
+    '--strategy',
+    'strategies',
+    default=['code_chunker'],
+    type=click.Choice(STRATEGIES),
+    multiple=True,
+    help='Split files with chonkie\'s CodeChunker, into AST windows or into a file/class/function hierarchy (default: code_chunker), repeat to sweep several'
 )
 @click.option(
     '--language',
@@ -26,70 +38,233 @@ enc = tiktoken.get_encoding("cl100k_base")
     is_flag=True,
     help='Clear existing chunks before processing'
 )
-def chunk_code(chunk_size, language, clear_existing=False):
-    """Chunk all PythonFile content using CodeChunker from chonkie package."""
+@click.option(
+    '--embedding-model',
+    default=None,
+    type=str,
+    help='Measure chunk sizes with this embedding model\'s tokenizer and cap them at its token limit'
+)
+@click.option(
+    '--workers',
+    default=1,
+    type=int,
+    help='Number of worker processes chunking files (default: 1, chunk in this process)'
+)
+@click.option(
+    '--overlap-lines',
+    default=0,
+    type=int,
+    help='Lines shared by consecutive AST windows (default: 0)'
+)
+@click.option(
+    '--offsets-only',
+    is_flag=True,
+    help='Store only where chunks sit in their files, their text is sliced from the file when read'
+)
+def chunk_code(
+    chunk_sizes=(2048,),
+    strategies=('code_chunker',),
+    language='python',
+    clear_existing=False,
+    embedding_model=None,
+    workers=1,
+    overlap_lines=0,
+    offsets_only=False,
+):
+    """Chunk all PythonFile content using CodeChunker from chonkie package.
+
+    Every combination of the given chunk sizes and strategies gets its own
+    configuration, and all of them are chunked in a single pass over the files:
+    each file is read, token counted and parsed once for the whole sweep.
+    The hierarchy strategy takes class and function ranges from the files'
+    symbol tables (see index_symbols), building the missing ones.
+
+    With --workers N files are chunked in a pool of N processes; the chunks
+    written are the same as in serial mode. Runs with the same settings share
+    a configuration and skip the files already chunked under it, so an
+    interrupted run picks up where it stopped.
+
+    The hierarchy strategy stores file, class and function chunks linked to
+    their parents; only the leaves are embedded and described.
+
+    With --offsets-only chunks don't copy their text but keep only their byte
+    offsets into the file, which keeps the database small when sweeping many
+    configurations or overlapping windows.
+    """
     
-    # Create chunk configuration
-    chunk_config = ChunkConfig.objects.create(
-        content={
-            'chunk_size': chunk_size,
+    if embedding_model:
+        tokenizer = get_tokenizer(embedding_model)
+        capped_sizes = []
+        for chunk_size in chunk_sizes:
+            if chunk_size > tokenizer.max_content_tokens:
+                logger.info(
+                    f"Capping chunk size {chunk_size} at {embedding_model}'s limit of {tokenizer.max_content_tokens} tokens"
+                )
+                chunk_size = tokenizer.max_content_tokens
+            capped_sizes.append(chunk_size)
+        chunk_sizes = capped_sizes
+        tokenizer_name = embedding_model
+        token_counter = get_token_counter(embedding_model)
+    else:
+        tokenizer_name = "character"
+        token_counter = get_token_counter("cl100k_base")
+
+    targets = list(dict.fromkeys(
+        ChunkTarget(chunk_size, strategy) for strategy in strategies for chunk_size in chunk_sizes
+    ))
+
+    # Reuse a configuration if its settings were used before, so an interrupted run resumes
+    chunk_configs = []
+    for target in targets:
+        config_content = {
+            'chunk_size': target.chunk_size,
             'language': language,
-            'tokenizer': 'character',
-            'chunking_method': 'chonkie.CodeChunker'
+            'tokenizer': tokenizer_name,
+            'overlap_lines': overlap_lines,
         }
-    )
-    logger.info(f"Created chunk configuration with ID: {chunk_config.id}")
+        if target.strategy == 'code_chunker':
+            config_content['chunking_method'] = 'chonkie.CodeChunker'
+            config_content['large_file_method'] = 'ast_windows'
+        elif target.strategy == 'ast_windows':
+            config_content['chunking_method'] = 'ast_windows'
+        else:
+            config_content['chunking_method'] = 'ast_hierarchy'
+        if offsets_only:
+            config_content['storage'] = 'offsets'
+        chunk_config = ChunkConfig.objects.filter(content=config_content).first()
+        if chunk_config is None:
+            chunk_config = ChunkConfig.objects.create(content=config_content)
+            logger.info(f"Created chunk configuration with ID: {chunk_config.id}")
+        else:
+            logger.info(f"Resuming chunk configuration with ID: {chunk_config.id}")
+        chunk_configs.append(chunk_config)
     
     if clear_existing:
         count = Chunk.objects.count()
         Chunk.objects.all().delete()
         logger.info(f"Cleared {count} existing chunks")
     
-    chunker = CodeChunker(
-        language=language,
-        tokenizer="character",
-        chunk_size=chunk_size,
-        include_nodes=False
-    )
+    # Files already chunked under each configuration, fetched in one query per configuration
+    chunked_ids = [
+        set(
+            Chunk.objects.filter(config=chunk_config)
+            .values_list('python_file_id', flat=True)
+            .distinct()
+        )
+        for chunk_config in chunk_configs
+    ]
+    
+    chunker_kwargs = {
+        'language': language,
+        'targets': targets,
+        'embedding_model': embedding_model,
+        'overlap_lines': overlap_lines,
+    }
+    # Serial mode counts tokens through the shared cache, workers with their own encoding
+    file_chunker = None
+    if workers <= 1:
+        file_chunker = FileChunker(count_tokens_many=token_counter.count_many, **chunker_kwargs)
     
-    python_files = PythonFile.objects.all()
+    python_files = PythonFile.objects.order_by('id')
     total_files = python_files.count()
     total_chunks_created = 0
     
-    logger.info(f"Processing {total_files} Python files...")
+    logger.info(
+        f"Processing {total_files} Python files for {len(chunk_configs)} configuration(s) "
+        f"with {max(workers, 1)} worker(s), "
+        f"{min(len(ids) for ids in chunked_ids)} already chunked under all of them..."
+    )
+    
+    needs_symbols = any(target.strategy == 'hierarchy' for target in targets)
     
-    with click.progressbar(python_files, label='Chunking files') as files:
-        for python_file in files:
-            try:
-                if Chunk.objects.filter(python_file=python_file).exists():
+    def pending_files():
+        files = python_files.only('id', 'content', 'content_hash', 'num_tokens').iterator(chunk_size=DB_BATCH_SIZE)
+        for batch in batched(files, DB_BATCH_SIZE):
+            # Files ingested before token counts were stored get theirs while their contents are loaded
+            uncounted = [python_file for python_file in batch if python_file.num_tokens is None]
+            if uncounted:
+                file_counter = get_token_counter("cl100k_base")
+                for python_file, num_tokens in zip(
+                    uncounted, file_counter.count_many(pf.content for pf in uncounted)
+                ):
+                    python_file.num_tokens = num_tokens
+                PythonFile.objects.bulk_update(uncounted, ['num_tokens'])
+            pending = []
+            for python_file in batch:
+                pending_targets = tuple(
+                    i for i, ids in enumerate(chunked_ids) if python_file.id not in ids
+                )
+                if not pending_targets:
+                    progress.update(1)
                     continue
-                
-                tokens = enc.encode(python_file.content)
-                if len(tokens) > 2048:
-                    @dataclass
-                    class StubChunk:
-                        text: str
-                    chunks = [StubChunk(python_file.content)]
-                else:
-                    chunks = chunker.chunk(python_file.content)
-                
-                chunk_objects = []
-                for chunk in chunks:
-                    chunk_objects.append(
-                        Chunk(
-                            python_file=python_file,
-                            config=chunk_config,
-                            content=chunk.text
-                        )
+                pending.append((python_file, pending_targets))
+            # The hierarchy is built from the stored symbol tables, only contents without one are parsed
+            tables = get_symbol_tables(python_file for python_file, _ in pending) if needs_symbols else {}
+            for python_file, pending_targets in pending:
+                table = tables.get(python_file.id)
+                symbols = table.get_symbols() if table else None
+                yield python_file.id, python_file.content, pending_targets, symbols
+    
+    chunk_objects = []
+    batch_file_ids = []
+    
+    def flush():
+        # A file's chunks and the progress that counts it are committed together
+        with transaction.atomic():
+            # Parents are created before their children, so the children can refer to their ids
+            for depth in sorted({depth for depth, _ in chunk_objects}):
+                Chunk.objects.bulk_create(
+                    [chunk for chunk_depth, chunk in chunk_objects if chunk_depth == depth]
+                )
+            for i, file_id in batch_file_ids:
+                chunked_ids[i].add(file_id)
+            for i in {i for i, _ in batch_file_ids}:
+                chunk_configs[i].files_chunked = len(chunked_ids[i])
+                chunk_configs[i].save(update_fields=['files_chunked', 'updated_at'])
+        return len(chunk_objects)
+    
+    with click.progressbar(length=total_files, label='Chunking files') as progress:
+        for file_id, spans_per_target in chunk_files(
+            pending_files(), workers=workers, file_chunker=file_chunker, **chunker_kwargs
+        ):
+            for i, spans in spans_per_target.items():
+                created = []
+                for span in spans:
+                    parent_depth, parent = (
+                        created[span.parent] if span.parent is not None else (-1, None)
+                    )
+                    chunk = Chunk(
+                        python_file_id=file_id,
+                        config=chunk_configs[i],
+                        # Parents are sliced from the file when needed rather than copying it
+                        content=None if offsets_only or not span.is_leaf else span.text,
+                        content_hash=content_hash(span.text),
+                        position=span.position,
+                        start_line=span.start_line,
+                        end_line=span.end_line,
+                        start_byte=span.start_byte,
+                        end_byte=span.end_byte,
+                        num_tokens=span.num_tokens,
+                        parent=parent,
+                        kind=span.kind,
+                        is_leaf=span.is_leaf,
                     )
-                
-                if chunk_objects:
-                    Chunk.objects.bulk_create(chunk_objects)
-                    total_chunks_created += len(chunk_objects)
-                
-            except Exception as e:
-                raise
-                logger.error(f"Error processing {python_file.module_path}: {e}")
-                continue
+                    created.append((parent_depth + 1, chunk))
+                chunk_objects.extend(created)
+                batch_file_ids.append((i, file_id))
+            
+            if len(chunk_objects) >= DB_BATCH_SIZE:
+                total_chunks_created += flush()
+                chunk_objects, batch_file_ids = [], []
+            progress.update(1)
     
-    logger.info(f"Completed! Created {total_chunks_created} chunks from {total_files} files.")
\ No newline at end of file
+    total_chunks_created += flush()
+    for chunk_config in chunk_configs:
+        chunk_config.completed_at = timezone.now()
+        chunk_config.save(update_fields=['completed_at', 'updated_at'])
+    
+    logger.info(
+        f"Completed! Created {total_chunks_created} chunks from {total_files} files "
+        f"for configuration(s) {', '.join(str(c.id) for c in chunk_configs)}."
+    )
+    token_counter.log_stats()
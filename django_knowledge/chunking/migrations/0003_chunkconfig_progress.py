@@ -0,0 +1,23 @@
+# Generated by Django 6.1.2 on 2026-10-19 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chunking', '0002_chunkconfig_chunk_config'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkconfig',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, help_text='When the last chunking run over all files finished', null=True),
+        ),
+        migrations.AddField(
+            model_name='chunkconfig',
+            name='files_chunked',
+            field=models.PositiveIntegerField(default=0, help_text='Files chunked under this configuration so far'),
+        ),
+    ]
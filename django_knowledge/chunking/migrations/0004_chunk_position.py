@@ -0,0 +1,67 @@
+# Generated by Django 6.1.2 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+def number_existing_chunks(apps, schema_editor):
+    # Chunks were bulk created in file order, so ids give their positions
+    Chunk = apps.get_model('chunking', 'Chunk')
+    batch, key, position = [], None, 0
+    rows = Chunk.objects.order_by('python_file_id', 'config_id', 'id').values_list(
+        'id', 'python_file_id', 'config_id'
+    )
+    for pk, python_file_id, config_id in rows.iterator(chunk_size=500):
+        if (python_file_id, config_id) != key:
+            key, position = (python_file_id, config_id), 0
+        batch.append(Chunk(pk=pk, position=position))
+        position += 1
+        if len(batch) == 500:
+            Chunk.objects.bulk_update(batch, ['position'])
+            batch = []
+    Chunk.objects.bulk_update(batch, ['position'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chunking', '0003_chunkconfig_progress'),
+        ('synthetic_data_generator', '0009_symboltable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunk',
+            name='end_byte',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chunk',
+            name='end_line',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chunk',
+            name='num_tokens',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chunk',
+            name='position',
+            field=models.PositiveIntegerField(default=0, help_text='Ordinal of the chunk within its file and configuration'),
+        ),
+        migrations.AddField(
+            model_name='chunk',
+            name='start_byte',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chunk',
+            name='start_line',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(number_existing_chunks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='chunk',
+            index=models.Index(fields=['python_file', 'config', 'position'], name='chunk_file_config_position'),
+        ),
+    ]
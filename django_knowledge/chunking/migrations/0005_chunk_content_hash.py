@@ -0,0 +1,33 @@
+# Generated by Django 6.1.2 on 2026-10-19 11:43
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_content_hashes(apps, schema_editor):
+    Chunk = apps.get_model('chunking', 'Chunk')
+    batch = []
+    for pk, content in Chunk.objects.values_list('pk', 'content').iterator(chunk_size=500):
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        batch.append(Chunk(pk=pk, content_hash=digest))
+        if len(batch) == 500:
+            Chunk.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    Chunk.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chunking', '0004_chunk_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunk',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='sha256 hex digest of content, shared by identical chunks', max_length=64),
+        ),
+        migrations.RunPython(fill_content_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 11:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chunking', '0005_chunk_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chunk',
+            name='content',
+            field=models.TextField(blank=True, help_text='Chunk text, null when only its byte offsets into the file are stored', null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.1.2 on 2026-10-19 11:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chunking', '0006_chunk_offsets_only'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunk',
+            name='is_leaf',
+            field=models.BooleanField(default=True, help_text='Whether the chunk is embedded, i.e. has no children'),
+        ),
+        migrations.AddField(
+            model_name='chunk',
+            name='kind',
+            field=models.CharField(blank=True, default='', help_text='file, class, function, code or window for hierarchy chunks', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='chunk',
+            name='parent',
+            field=models.ForeignKey(blank=True, help_text='The class or file chunk containing this one, for hierarchy configurations', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='chunking.chunk'),
+        ),
+        migrations.AlterField(
+            model_name='chunk',
+            name='position',
+            field=models.PositiveIntegerField(default=0, help_text='Ordinal of the chunk within its file, configuration and parent'),
+        ),
+    ]
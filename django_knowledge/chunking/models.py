@@ -1,9 +1,21 @@
+from functools import cached_property
+
 from django.db import models
 from synthetic_data_generator.models import PythonFile
 
 
+def slice_bytes(content: str, start_byte: int, end_byte: int) -> str:
+    return content.encode("utf-8")[start_byte:end_byte].decode("utf-8")
+
+
 class ChunkConfig(models.Model):
     content = models.JSONField()
+    files_chunked = models.PositiveIntegerField(
+        default=0, help_text="Files chunked under this configuration so far"
+    )
+    completed_at = models.DateTimeField(
+        null=True, blank=True, help_text="When the last chunking run over all files finished"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -21,7 +33,43 @@ class Chunk(models.Model):
     config = models.ForeignKey(
         ChunkConfig, on_delete=models.SET_NULL, null=True, blank=True
     )
-    content = models.TextField()
+    content = models.TextField(
+        null=True,
+        blank=True,
+        help_text="Chunk text, null when only its byte offsets into the file are stored",
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        db_index=True,
+        help_text="sha256 hex digest of content, shared by identical chunks",
+    )
+    position = models.PositiveIntegerField(
+        default=0, help_text="Ordinal of the chunk within its file, configuration and parent"
+    )
+    start_line = models.PositiveIntegerField(null=True, blank=True)
+    end_line = models.PositiveIntegerField(null=True, blank=True)
+    start_byte = models.PositiveIntegerField(null=True, blank=True)
+    end_byte = models.PositiveIntegerField(null=True, blank=True)
+    num_tokens = models.PositiveIntegerField(null=True, blank=True)
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="children",
+        help_text="The class or file chunk containing this one, for hierarchy configurations",
+    )
+    kind = models.CharField(
+        max_length=16,
+        blank=True,
+        default="",
+        help_text="file, class, function, code or window for hierarchy chunks",
+    )
+    is_leaf = models.BooleanField(
+        default=True, help_text="Whether the chunk is embedded, i.e. has no children"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -29,29 +77,48 @@ class Chunk(models.Model):
         verbose_name = "Chunk"
         verbose_name_plural = "Chunks"
         ordering = ["updated_at"]
+        indexes = [
+            models.Index(
+                fields=["python_file", "config", "position"],
+                name="chunk_file_config_position",
+            )
+        ]
 
     def __str__(self):
         return f"Chunk from {self.python_file.module_path} ({self.updated_at})"
 
-    def previous(self):
-        """Return the previous chunk for the same PythonFile based on updated_at."""
-        return (
-            Chunk.objects.filter(
-                python_file=self.python_file, updated_at__lt=self.updated_at
-            )
-            .order_by("-updated_at")
-            .first()
+    @cached_property
+    def text(self) -> str:
+        """The chunk's text, sliced from its file when only offsets are stored.
+
+        Use chunking.chunker.materialize_chunks to fill this in for many chunks
+        with one query per batch instead of one per chunk.
+        """
+        if self.content is not None:
+            return self.content
+        return slice_bytes(self.python_file.content, self.start_byte, self.end_byte)
+
+    def siblings(self):
+        """Chunks of the same file, configuration and parent."""
+        return Chunk.objects.filter(
+            python_file_id=self.python_file_id,
+            config_id=self.config_id,
+            parent_id=self.parent_id,
         )
 
+    def neighbors(self, k: int = 1):
+        """This chunk and up to `k` chunks on either side of it, in file order."""
+        return self.siblings().filter(
+            position__range=(self.position - k, self.position + k)
+        ).order_by("position")
+
+    def previous(self):
+        """Return the previous chunk of the same PythonFile, configuration and parent."""
+        return self.siblings().filter(position=self.position - 1).first()
+
     def next(self):
-        """Return the next chunk for the same PythonFile based on updated_at."""
-        return (
-            Chunk.objects.filter(
-                python_file=self.python_file, updated_at__gt=self.updated_at
-            )
-            .order_by("updated_at")
-            .first()
-        )
+        """Return the next chunk of the same PythonFile, configuration and parent."""
+        return self.siblings().filter(position=self.position + 1).first()
 
 
 class ChunkDescription(models.Model):
@@ -0,0 +1,272 @@
+import ast
+from dataclasses import dataclass
+from functools import cached_property
+from itertools import accumulate
+from typing import Callable, Iterable, Iterator, Optional
+
+from synthetic_data_generator.symbols import Symbol, symbols_of_tree
+
+# Lines measured per call to the size function
+MEASURE_BATCH_SIZE = 1000
+
+
+class LineIndex:
+    """Per-line sizes and byte offsets of a file, with prefix sums for O(1) range lookups."""
+
+    def __init__(self, content: str, measure_many: Callable[[list[str]], list[int]]):
+        # Split on "\n" only, like the line numbers of ast (str.splitlines also splits on "\f" etc.)
+        self.lines = [line + "\n" for line in content.split("\n")]
+        self.lines[-1] = self.lines[-1][:-1]
+        if not self.lines[-1]:
+            self.lines.pop()
+        sizes = []
+        for i in range(0, len(self.lines), MEASURE_BATCH_SIZE):
+            sizes.extend(measure_many(self.lines[i : i + MEASURE_BATCH_SIZE]))
+        self.size_prefix = [0, *accumulate(sizes)]
+        self.byte_prefix = [0, *accumulate(len(line.encode("utf-8")) for line in self.lines)]
+
+    def __len__(self):
+        return len(self.lines)
+
+    def size(self, start: int, end: int) -> int:
+        """Size of lines `start` to `end`, 1-based and inclusive."""
+        return self.size_prefix[end] - self.size_prefix[start - 1]
+
+    def text(self, start: int, end: int) -> str:
+        return "".join(self.lines[start - 1 : end])
+
+
+def child_statements(node) -> list:
+    children = [
+        child
+        for child in ast.iter_child_nodes(node)
+        if isinstance(child, (ast.stmt, ast.excepthandler, ast.match_case))
+    ]
+    return sorted(children, key=statement_start)
+
+
+def statement_start(node) -> int:
+    if isinstance(node, ast.match_case):
+        node = node.pattern
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def split_units(
+    index: LineIndex, node, start: int, end: int, max_size: int
+) -> Iterator[tuple[int, int]]:
+    """Yield consecutive line ranges covering `start`..`end`, each under `max_size` if possible.
+
+    A range that is too big is split at the statements nested in `node`: a
+    class into its header and methods, a function into its header and body
+    statements, and so on. Ranges without nested statements are split into
+    lines; a single line over the limit is yielded as is.
+    """
+    if index.size(start, end) <= max_size:
+        yield start, end
+        return
+
+    children = child_statements(node) if node is not None else []
+    if not children:
+        for line in range(start, end + 1):
+            yield line, line
+        return
+
+    # The header up to the first nested statement, then each statement with the
+    # blank lines and comments before it; the last one also takes the trailing lines
+    boundaries = [max(statement_start(child), start) for child in children]
+    if boundaries[0] > start:
+        yield from split_units(index, None, start, boundaries[0] - 1, max_size)
+    for i, child in enumerate(children):
+        child_start = boundaries[i]
+        child_end = boundaries[i + 1] - 1 if i + 1 < len(children) else end
+        if child_end >= child_start:
+            yield from split_units(index, child, child_start, child_end, max_size)
+
+
+def parse_module(content: str) -> Optional[ast.Module]:
+    try:
+        return ast.parse(content)
+    except (SyntaxError, ValueError, MemoryError, RecursionError):
+        # Unparsable or too deeply nested for the parser
+        return None
+
+
+class ParsedSource:
+    """A file's LineIndex, syntax tree and symbols, built once and shared by windows of any size.
+
+    The tree is only parsed when first needed. Pass the file's stored symbols,
+    see synthetic_data_generator.symbol_index, so that the hierarchy is built
+    without parsing.
+    """
+
+    def __init__(
+        self,
+        content: str,
+        measure_many: Callable[[list[str]], list[int]],
+        symbols: Optional[list[Symbol]] = None,
+    ):
+        self.content = content
+        self.index = LineIndex(content, measure_many)
+        if symbols is not None:
+            self.symbols = symbols
+
+    @cached_property
+    def tree(self) -> Optional[ast.Module]:
+        return parse_module(self.content)
+
+    @cached_property
+    def symbols(self) -> list[Symbol]:
+        return symbols_of_tree(self.tree).symbols if self.tree is not None else []
+
+    @cached_property
+    def definitions(self) -> dict[tuple[int, int], ast.AST]:
+        """Class and function nodes by their line range, as stored in symbols."""
+        if self.tree is None:
+            return {}
+        return {
+            (statement_start(node), node.end_lineno): node
+            for node in ast.walk(self.tree)
+            if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef))
+        }
+
+
+def ast_windows(
+    content: str,
+    max_size: int,
+    measure_many: Callable[[list[str]], list[int]],
+    overlap_lines: int = 0,
+    parsed: Optional[ParsedSource] = None,
+) -> Iterator[tuple[int, int]]:
+    """Split a file into windows of whole statements whose size stays under `max_size`.
+
+    Windows are packed greedily from units produced by split_units and are
+    yielded as 1-based inclusive line ranges as soon as they are complete.
+    With `overlap_lines` a window starts with up to that many trailing lines
+    of the previous one, as far as they fit. Files that don't parse are split
+    at line boundaries only. Pass `parsed` to reuse one parse for several sizes.
+    """
+    parsed = parsed or ParsedSource(content, measure_many)
+    index = parsed.index
+    if not len(index):
+        return
+    units = split_units(index, parsed.tree, 1, len(index), max_size)
+    yield from pack_windows(index, units, max_size, overlap_lines)
+
+
+def pack_windows(
+    index: LineIndex,
+    units: Iterable[tuple[int, int]],
+    max_size: int,
+    overlap_lines: int = 0,
+) -> Iterator[tuple[int, int]]:
+    """Pack consecutive line ranges greedily into windows whose size stays under `max_size`."""
+    window_start, window_end = None, None
+    for unit_start, unit_end in units:
+        if window_start is None:
+            window_start, window_end = unit_start, unit_end
+        elif index.size(window_start, unit_end) <= max_size:
+            window_end = unit_end
+        else:
+            yield window_start, window_end
+            next_start = max(unit_start - overlap_lines, window_start + 1, 1)
+            while next_start < unit_start and index.size(next_start, unit_end) > max_size:
+                next_start += 1
+            window_start, window_end = next_start, unit_end
+    if window_start is not None:
+        yield window_start, window_end
+
+
+@dataclass
+class HierarchyNode:
+    kind: str  # "file", "class", "function", "code" or "window"
+    start_line: int  # 1-based, inclusive
+    end_line: int
+    parent: Optional[int]  # Index of the parent node in the list, None for the file
+    position: int  # Ordinal among the children of the parent
+    is_leaf: bool = True
+
+
+def ast_hierarchy(
+    content: str,
+    max_size: int,
+    measure_many: Callable[[list[str]], list[int]],
+    overlap_lines: int = 0,
+    parsed: Optional[ParsedSource] = None,
+) -> list[HierarchyNode]:
+    """A file's classes and functions as a tree of line ranges, parents before their children.
+
+    The file node contains its top-level classes and functions, and classes
+    contain theirs; functions are not broken up further, nested definitions
+    stay part of them. The lines of a file or class outside its definitions,
+    such as imports, constants or a class header, become "code" nodes.
+    Leaves over `max_size` get "window" children packed like ast_windows.
+
+    The ranges come from the file's symbols, so with a stored symbol table in
+    `parsed` the file is only parsed if a leaf needs splitting into windows.
+    """
+    parsed = parsed or ParsedSource(content, measure_many)
+    index = parsed.index
+    if not len(index):
+        return []
+    nodes = []
+    num_children = {}
+
+    def add(kind: str, start: int, end: int, parent: Optional[int]) -> int:
+        position = num_children.get(parent, 0)
+        num_children[parent] = position + 1
+        if parent is not None:
+            nodes[parent].is_leaf = False
+        nodes.append(HierarchyNode(kind, start, end, parent, position))
+        return len(nodes) - 1
+
+    symbols = parsed.symbols
+    nested = nested_symbols(symbols)
+
+    def split_leaf(i: int, start: int, end: int, node: Callable[[], Optional[ast.AST]]):
+        # Only leaves over the limit need the syntax tree, to be split at statements
+        if index.size(start, end) <= max_size:
+            return
+        units = split_units(index, node(), start, end, max_size)
+        for window_start, window_end in pack_windows(index, units, max_size, overlap_lines):
+            add("window", window_start, window_end, i)
+
+    def add_code(parent: int, start: int, end: int):
+        if start <= end and index.text(start, end).strip():
+            split_leaf(add("code", start, end, parent), start, end, lambda: None)
+
+    def definition(start: int, end: int) -> Callable[[], Optional[ast.AST]]:
+        return lambda: parsed.definitions.get((start, end))
+
+    def visit(i: int, scope: Optional[int], start: int, end: int, node):
+        if not nested.get(scope):
+            split_leaf(i, start, end, node)
+            return
+        cursor = start
+        for j in nested[scope]:
+            symbol = symbols[j]
+            add_code(i, cursor, symbol.start_line - 1)
+            is_class = symbol.kind == "class"
+            child = add("class" if is_class else "function", symbol.start_line, symbol.end_line, i)
+            node = definition(symbol.start_line, symbol.end_line)
+            if is_class:
+                visit(child, j, symbol.start_line, symbol.end_line, node)
+            else:
+                split_leaf(child, symbol.start_line, symbol.end_line, node)
+            cursor = symbol.end_line + 1
+        add_code(i, cursor, end)
+
+    visit(add("file", 1, len(index), None), None, 1, len(index), lambda: parsed.tree)
+    return nodes
+
+
+def nested_symbols(symbols: list[Symbol]) -> dict[Optional[int], list[int]]:
+    """Indices of the symbols directly inside each symbol, by its index (None for the module), in line order."""
+    nested = {}
+    enclosing = []
+    for i in sorted(range(len(symbols)), key=lambda i: (symbols[i].start_line, -symbols[i].end_line)):
+        while enclosing and symbols[enclosing[-1]].end_line < symbols[i].start_line:
+            enclosing.pop()
+        nested.setdefault(enclosing[-1] if enclosing else None, []).append(i)
+        enclosing.append(i)
+    return nested
@@ -0,0 +1,23 @@
+from dataclasses import dataclass
+
+
+class WhitespaceEncoding:
+    name = "whitespace"
+
+    def encode_ordinary_batch(self, texts):
+        return [text.split() for text in texts]
+
+
+@dataclass
+class TextChunk:
+    text: str
+
+
+class BlankLineChunker:
+    """Stands in for chonkie's CodeChunker, whose tree-sitter grammars need a download."""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def chunk(self, text):
+        return [TextChunk(part) for part in text.split("\n\n")]
@@ -0,0 +1,51 @@
+import json
+
+from django.core.management import call_command
+
+from chunking.benchmark import benchmark_chunking, peak_rss_mb, synthetic_corpus
+from chunking.splitter import parse_module
+
+
+def test_synthetic_corpus_is_fixed_and_parses():
+    corpus = synthetic_corpus("medium", 3)
+    assert corpus == synthetic_corpus("medium", 3)
+    assert corpus != synthetic_corpus("medium", 3, seed=1)
+    assert all(parse_module(content) is not None for content in corpus)
+
+
+def test_benchmark_reports_every_combination(fake_chunking, tmp_path):
+    output = tmp_path / "bench.json"
+    call_command(
+        "benchmark_chunking",
+        "--size", "small",
+        "--size", "large",
+        "--files", "3",
+        "--chunk-size", "256",
+        "--workers", "1",
+        "--workers", "2",
+        "--strategy", "code_chunker",
+        "--strategy", "ast_windows",
+        "--output", str(output),
+    )
+
+    runs = json.loads(output.read_text())["runs"]
+    assert len(runs) == 8
+    serial = {(r["corpus"], r["strategy"]): r["chunks"] for r in runs if r["workers"] == 1}
+    parallel = {(r["corpus"], r["strategy"]): r["chunks"] for r in runs if r["workers"] == 2}
+    assert serial == parallel
+    for run in runs:
+        assert run["files"] == 3 and run["chunks"] > 3
+        assert run["files_per_sec"] > 0 and run["mb_per_sec"] > 0
+        assert run["peak_rss_mb"]["self"] > 0 and run["peak_rss_mb"]["growth"] >= 0
+
+
+def test_peak_rss_is_measured_per_run(fake_chunking):
+    # An earlier, bigger allocation in this process does not show up in a later run
+    ballast = bytearray(200 * 1024 * 1024)
+    ballast[::4096] = b"x" * len(ballast[::4096])
+    del ballast
+    assert peak_rss_mb()["self"] > 200
+
+    result = benchmark_chunking(synthetic_corpus("small", 2), 256, language="python")
+    assert result["chunks"] > 0
+    assert result["peak_rss_mb"]["self"] < peak_rss_mb()["self"] - 100
@@ -0,0 +1,243 @@
+from django.core.management import call_command
+from pytest import fixture, raises
+
+from chunking import chunker as chunker_module
+from chunking.models import Chunk
+from synthetic_data_generator.ingestion import content_hash
+from synthetic_data_generator.models import Project, PythonFile, SymbolTable
+
+from . import BlankLineChunker
+
+
+@fixture
+def python_files(db):
+    project = Project.objects.create(name="p", root_path="/p")
+    for i in range(12):
+        content = "\n\n".join(f"def f{i}_{j}():\n    return {j}" for j in range(i % 4 + 1))
+        PythonFile.objects.create(project=project, module_path=f"m{i}.py", content=content)
+    PythonFile.objects.create(
+        project=project, module_path="big.py", content="x " * 3000 + "\n\ny = 1"
+    )
+
+
+def chunk_rows():
+    return list(
+        Chunk.objects.order_by("id").values_list("python_file__module_path", "content")
+    )
+
+
+def test_workers_produce_the_same_chunks_as_serial(python_files, fake_chunking):
+    call_command("chunk_code")
+    serial = chunk_rows()
+    assert len(serial) == sum(i % 4 + 1 for i in range(12)) + 2
+    # Too big for the chunker, split at line boundaries since it doesn't parse
+    assert [text for path, text in serial if path == "big.py"] == [
+        "x " * 3000 + "\n",
+        "\ny = 1",
+    ]
+    # Files created without a token count get one while they are read
+    assert PythonFile.objects.get(module_path="big.py").num_tokens == 3003
+
+    call_command("chunk_code", "--clear-existing", "--workers", "3")
+    assert chunk_rows() == serial
+
+
+class FailingChunker(BlankLineChunker):
+    def chunk(self, text):
+        if "f7_" in text:
+            raise RuntimeError("interrupted")
+        return super().chunk(text)
+
+
+def test_interrupted_run_resumes_per_config(python_files, fake_chunking, monkeypatch):
+    from chunking.management.commands import chunk_code as command_module
+    from chunking.models import ChunkConfig
+
+    monkeypatch.setattr(command_module, "DB_BATCH_SIZE", 1)
+    monkeypatch.setattr(chunker_module, "CodeChunker", FailingChunker)
+    with raises(RuntimeError):
+        call_command("chunk_code")
+    config = ChunkConfig.objects.get()
+    assert config.files_chunked == 7
+    assert config.completed_at is None
+
+    monkeypatch.setattr(chunker_module, "CodeChunker", BlankLineChunker)
+    call_command("chunk_code")
+    config.refresh_from_db()
+    assert config.files_chunked == 13
+    assert config.completed_at is not None
+    assert Chunk.objects.values("python_file_id", "content").distinct().count() == (
+        Chunk.objects.count()
+    )
+
+    # Other settings get their own configuration and chunk every file again
+    call_command("chunk_code", "--chunk-size", "512")
+    assert ChunkConfig.objects.count() == 2
+    assert Chunk.objects.filter(config__content__chunk_size=512).values(
+        "python_file_id"
+    ).distinct().count() == 13
+
+
+def test_chunks_know_their_place(python_files, fake_chunking, django_assert_num_queries):
+    from chunking.chunker import expand_context
+
+    python_file = PythonFile.objects.get(module_path="m3.py")
+    python_file.content = "# é\n\ndef a():\n    pass\n\ndef b():\n    pass\n\nc = 1\n"
+    python_file.save()
+    call_command("chunk_code")
+
+    chunks = list(Chunk.objects.filter(python_file=python_file).order_by("position"))
+    assert [c.position for c in chunks] == [0, 1, 2, 3]
+    assert [(c.start_line, c.end_line) for c in chunks] == [(1, 1), (3, 4), (6, 7), (9, 9)]
+    assert chunks[1].start_byte == len("# é\n\n".encode())
+    assert python_file.content.encode()[chunks[2].start_byte : chunks[2].end_byte] == (
+        chunks[2].content.encode()
+    )
+    assert chunks[2].num_tokens == 3
+
+    assert chunks[1].previous() == chunks[0]
+    assert chunks[3].next() is None
+    assert list(chunks[1].neighbors(k=1)) == chunks[0:3]
+
+    others = list(Chunk.objects.filter(python_file__module_path="m0.py"))
+    with django_assert_num_queries(1):
+        windows = expand_context([chunks[0], chunks[3]] + others, k=2)
+    assert windows[chunks[0].id] == chunks[0:3]
+    assert windows[chunks[3].id] == chunks[1:4]
+    assert windows[others[0].id] == others
+
+
+def test_sweep_parses_each_file_once(python_files, fake_chunking, monkeypatch):
+    from chunking import splitter as splitter_module
+    from chunking.models import ChunkConfig
+
+    parses = []
+
+    def counting_parse(content):
+        parses.append(content)
+        return parse_module(content)
+
+    parse_module = splitter_module.parse_module
+    monkeypatch.setattr(splitter_module, "parse_module", counting_parse)
+    call_command(
+        "chunk_code",
+        "--chunk-size", "40",
+        "--chunk-size", "80",
+        "--strategy", "code_chunker",
+        "--strategy", "ast_windows",
+    )
+
+    configs = ChunkConfig.objects.order_by("id")
+    assert [(c.content["chunk_size"], c.content["chunking_method"]) for c in configs] == [
+        (40, "chonkie.CodeChunker"),
+        (80, "chonkie.CodeChunker"),
+        (40, "ast_windows"),
+        (80, "ast_windows"),
+    ]
+    assert all(c.files_chunked == 13 and c.completed_at for c in configs)
+    # One parse per file serves both window sizes and the oversized file's code_chunker configs
+    assert len(parses) == 13
+
+    small, large = configs[2], configs[3]
+    for python_file in PythonFile.objects.all():
+        for config in (small, large):
+            chunks = Chunk.objects.filter(python_file=python_file, config=config)
+            assert "".join(c.content for c in chunks.order_by("position")) == python_file.content
+    assert Chunk.objects.filter(config=large).count() < Chunk.objects.filter(config=small).count()
+
+    # The single-size configurations of the sweep are the ones a plain run resumes
+    call_command("chunk_code", "--chunk-size", "40")
+    assert ChunkConfig.objects.count() == 4
+
+
+def test_offsets_only_chunks_slice_their_files(
+    python_files, fake_chunking, django_assert_num_queries
+):
+    from chunking.chunker import materialize_chunks
+
+    python_file = PythonFile.objects.get(module_path="m3.py")
+    python_file.content = "# é\n\ndef a():\n    pass\n\nc = 'ü'\n"
+    python_file.save()
+    call_command("chunk_code")
+    call_command("chunk_code", "--offsets-only")
+
+    stored = Chunk.objects.filter(content__isnull=False).order_by("python_file_id", "position")
+    offsets = Chunk.objects.filter(content__isnull=True).order_by("python_file_id", "position")
+    assert offsets.count() == stored.count()
+
+    with django_assert_num_queries(2):
+        texts = [chunk.text for chunk in materialize_chunks(offsets)]
+    assert texts == [chunk.content for chunk in stored]
+
+    chunk = offsets.get(python_file=python_file, position=2)
+    assert chunk.text == "c = 'ü'\n"
+    assert chunk.content_hash == stored.get(python_file=python_file, position=2).content_hash
+
+
+def test_hierarchy_links_leaves_to_their_parents(
+    python_files, fake_chunking, django_assert_num_queries
+):
+    from chunking.chunker import fetch_parents, get_chunks
+    from chunking.models import ChunkConfig
+
+    python_file = PythonFile.objects.get(module_path="m3.py")
+    python_file.content = (
+        "import os\n\nclass A:\n    def a(self):\n        pass\n\n    def b(self):\n        pass\n"
+    )
+    python_file.save()
+    call_command("chunk_code", "--strategy", "hierarchy")
+    config = ChunkConfig.objects.get()
+    # The ranges come from the stored symbol tables, built for the files that had none
+    assert SymbolTable.objects.filter(content_hash=content_hash(python_file.content)).exists()
+
+    chunks = Chunk.objects.filter(python_file=python_file)
+    file_chunk = chunks.get(kind="file")
+    assert file_chunk.content is None and file_chunk.text == python_file.content
+    method_a, method_b = chunks.filter(kind="function").order_by("position")
+    assert method_a.text == "    def a(self):\n        pass\n"
+    assert method_a.next() == method_b and method_b.previous() == method_a
+    assert method_a.parent.kind == "class"
+
+    leaves = list(get_chunks(config.id).filter(python_file=python_file))
+    assert {leaf.kind for leaf in leaves} == {"code", "function"}
+    # Per call, one query per level climbed and one for the files the parents are sliced from
+    with django_assert_num_queries(4):
+        parents = fetch_parents(leaves)
+        files = fetch_parents(leaves, kind="file")
+    assert parents[method_a.id].text.startswith("class A:\n")
+    assert {parent.id for parent in files.values()} == {file_chunk.id}
+    assert files[method_a.id].text == python_file.content
+
+
+def test_token_profile_counts_leaves_apart_from_parents(python_files, fake_chunking, tmp_path):
+    import json
+
+    call_command("chunk_code", "--strategy", "hierarchy")
+    output = tmp_path / "profile.json"
+    call_command(
+        "profile_tokens", "--table", "chunk", "--table", "chunk_parent", "--output", str(output)
+    )
+
+    tables = json.loads(output.read_text())["tables"]
+    assert tables["chunk"]["count"] == Chunk.objects.filter(is_leaf=True).count()
+    assert tables["chunk_parent"]["count"] == Chunk.objects.filter(is_leaf=False).count() > 0
+
+
+def test_code_stats_count_parents_apart_from_leaves(python_files, fake_chunking):
+    from loguru import logger
+
+    call_command("chunk_code", "--strategy", "hierarchy")
+    leaves = Chunk.objects.filter(is_leaf=True)
+    parents = Chunk.objects.filter(is_leaf=False).count()
+    duplicates = leaves.count() - leaves.values("content_hash").distinct().count()
+
+    messages = []
+    sink = logger.add(messages.append, format="{message}")
+    try:
+        call_command("get_code_stats")
+    finally:
+        logger.remove(sink)
+    assert any(f"{leaves.count()} chunks and {parents} parents" in m for m in messages)
+    # Leaves keep their content, only the parents are sliced from the files
+    assert any("0 chunks stored as offsets" in m for m in messages)
+    assert any(m.startswith(f"DUPLICATE_CHUNKS:\t{duplicates} ") for m in messages)
@@ -0,0 +1,76 @@
+from chromadb import EmbeddingFunction
+from django.core.management import call_command
+
+from chunking.models import ChunkDescription
+from embedding_generator.persistence import save_embeddings
+from synthetic_data_generator.chunk_describe import CodeDescriptions
+from synthetic_data_generator import chunk_describe
+from vectordb.db import ChromaDB
+
+
+class CountingEmbeddings(EmbeddingFunction):
+    def __init__(self):
+        self.embedded = []
+
+    @staticmethod
+    def name():
+        return "counting"
+
+    def __call__(self, input):
+        self.embedded.extend(input)
+        return [[float(len(text)), 1.0] for text in input]
+
+
+def test_identical_chunks_are_embedded_once(make_chunks):
+    chunks = make_chunks(["a = 1\n", "b = 2\n", "a = 1\n", "a = 1\n"])
+    ef = CountingEmbeddings()
+    vector_db = ChromaDB(collection_name="dedupe_test", embedding_generator=ef)
+
+    save_embeddings(vector_db, chunks[:2])
+    assert ef.embedded == ["a = 1\n", "b = 2\n"]
+
+    save_embeddings(vector_db, chunks)
+    assert ef.embedded == ["a = 1\n", "b = 2\n"]
+    stored = vector_db.get_embeddings([str(chunk.id) for chunk in chunks])
+    assert len(stored) == 4
+    assert list(stored[str(chunks[3].id)]) == list(stored[str(chunks[0].id)])
+    vector_db.delete_collection()
+
+
+def test_common_content_fetches_one_stored_embedding(make_chunks):
+    chunks = make_chunks(["a = 1\n"] * 12 + ["b = 2\n"])
+    ef = CountingEmbeddings()
+    vector_db = ChromaDB(collection_name="dedupe_common_test", embedding_generator=ef)
+    save_embeddings(vector_db, chunks[:10])
+
+    fetched = []
+    get_embeddings = vector_db.get_embeddings
+
+    def recording_get_embeddings(ids, *args, **kwargs):
+        fetched.append(list(ids))
+        return get_embeddings(ids, *args, **kwargs)
+
+    vector_db.get_embeddings = recording_get_embeddings
+    save_embeddings(vector_db, chunks[10:])
+    assert ef.embedded == ["a = 1\n", "b = 2\n"]
+    assert fetched[0] == [str(chunks[0].id)]
+    stored = get_embeddings([str(chunk.id) for chunk in chunks])
+    assert list(stored[str(chunks[11].id)]) == list(stored[str(chunks[0].id)])
+    vector_db.delete_collection()
+
+
+def test_identical_chunks_share_descriptions(make_chunks, monkeypatch):
+    chunks = make_chunks(["a = 1\n", "b = 2\n", "a = 1\n"])
+    described = []
+
+    def fake_descriptions(code, model, **kwargs):
+        described.append(code)
+        return CodeDescriptions(descriptions=[f"sets {code.strip()}"])
+
+    monkeypatch.setattr(chunk_describe, "generate_chunk_descriptions", fake_descriptions)
+    call_command("describe_chunk")
+
+    assert described == ["a = 1\n", "b = 2\n"]
+    assert list(
+        ChunkDescription.objects.filter(chunk=chunks[2]).values_list("description", flat=True)
+    ) == ["sets a = 1"]
@@ -0,0 +1,106 @@
+from chunking import splitter
+from chunking.splitter import LineIndex, ParsedSource, ast_hierarchy, ast_windows
+from synthetic_data_generator.symbols import extract_symbols
+
+
+def char_sizes(texts):
+    return [len(text) for text in texts]
+
+
+def module(num_classes, num_methods):
+    parts = ["import os\n\n"]
+    for c in range(num_classes):
+        parts.append(f"\n@register\nclass C{c}(Base):\n    \"\"\"Class {c}.\"\"\"\n")
+        for m in range(num_methods):
+            parts.append(f"\n    def m{m}(self, x):\n        y = x + {m}\n        return y * 2\n")
+    return "".join(parts)
+
+
+def windows_text(source, windows):
+    index = LineIndex(source, char_sizes)
+    return [index.text(start, end) for start, end in windows]
+
+
+def test_windows_cover_the_file_at_statement_boundaries():
+    source = module(20, 8)
+    windows = list(ast_windows(source, 600, char_sizes))
+
+    assert windows[0][0] == 1
+    assert windows[-1][1] == source.count("\n")
+    for (_, end), (start, _) in zip(windows, windows[1:]):
+        assert start == end + 1
+
+    texts = windows_text(source, windows)
+    assert "".join(texts) == source
+    for text in texts:
+        assert len(text) <= 600
+        first_line = text.lstrip("\n").splitlines()[0]
+        assert first_line.startswith(("import", "@register", "    def"))
+
+
+def test_large_class_is_split_into_methods():
+    source = module(1, 200)
+    texts = windows_text(source, ast_windows(source, 500, char_sizes))
+    assert len(texts) > 1
+    assert texts[0].startswith("import os\n\n\n@register\nclass C0(Base):")
+    assert all(text.lstrip("\n").startswith("    def") for text in texts[1:])
+
+
+def test_overlap_repeats_trailing_lines():
+    source = module(5, 10)
+    windows = list(ast_windows(source, 400, char_sizes, overlap_lines=2))
+    for (_, end), (start, _) in zip(windows, windows[1:]):
+        assert end - 2 < start <= end
+    assert all(len(text) <= 400 for text in windows_text(source, windows))
+
+
+def test_unparsable_files_fall_back_to_lines():
+    source = "def broken(:\n" + "x = 1\n" * 100
+    texts = windows_text(source, ast_windows(source, 60, char_sizes))
+    assert "".join(texts) == source
+    assert all(len(text) <= 60 for text in texts)
+
+
+def test_hierarchy_nests_functions_in_classes_in_the_file():
+    source = module(1, 2)
+    nodes = ast_hierarchy(source, 1000, char_sizes)
+    assert [
+        (n.kind, n.start_line, n.end_line, n.parent, n.position, n.is_leaf) for n in nodes
+    ] == [
+        ("file", 1, 14, None, 0, False),
+        ("code", 1, 3, 0, 0, True),
+        ("class", 4, 14, 0, 1, False),
+        ("code", 4, 7, 2, 0, True),
+        ("function", 8, 10, 2, 1, True),
+        ("function", 12, 14, 2, 2, True),
+    ]
+
+    # Leaves over the size limit are split into windows of statements
+    nodes = ast_hierarchy(source, 40, char_sizes)
+    method = next(i for i, n in enumerate(nodes) if n.kind == "function")
+    windows = [(n.kind, n.start_line, n.end_line) for n in nodes if n.parent == method]
+    assert windows == [("window", 8, 9), ("window", 10, 10)]
+    assert not nodes[method].is_leaf
+
+
+def test_hierarchy_from_stored_symbols_parses_only_to_split_leaves(monkeypatch):
+    source = module(2, 3)
+    symbols = extract_symbols(source).symbols
+    expected = ast_hierarchy(source, 1000, char_sizes)
+    split = ast_hierarchy(source, 40, char_sizes)
+
+    parses = []
+    parse_module = splitter.parse_module
+    monkeypatch.setattr(
+        splitter, "parse_module", lambda content: parses.append(1) or parse_module(content)
+    )
+
+    def hierarchy(max_size):
+        parsed = ParsedSource(source, char_sizes, symbols)
+        return ast_hierarchy(source, max_size, char_sizes, parsed=parsed)
+
+    assert hierarchy(1000) == expected
+    assert parses == []
+    # A method over the limit is split at its statements, which takes the tree
+    assert hierarchy(40) == split
+    assert parses == [1]
@@ -0,0 +1,188 @@
+import subprocess
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+
+def run_git(*args, cwd=None, input=None) -> str:
+    result = subprocess.run(
+        ["git", *args],
+        cwd=cwd,
+        input=input,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout
+
+
+def resolve_remote(repo: str, as_url: bool = False) -> str:
+    """Turn `owner/repo`, a URL or a local path into something `git clone` accepts.
+
+    Local paths are returned as `file://` URLs when `as_url` is set, because git
+    ignores --depth and --filter for plain-path clones.
+    """
+    if "://" in repo or repo.startswith("git@"):
+        return repo
+    path = Path(repo).expanduser()
+    if path.exists():
+        return path.absolute().as_uri() if as_url else str(path.absolute())
+    return f"https://github.com/{repo}.git"
+
+
+def repo_name(repo: str) -> str:
+    """Directory-friendly name of a repository given as `owner/repo`, URL or path."""
+    if "://" in repo or repo.startswith("git@") or Path(repo).expanduser().exists():
+        name = repo.rstrip("/").rsplit("/", 1)[-1].rsplit(":", 1)[-1]
+        return name.removesuffix(".git")
+    return repo.replace("/", "_")
+
+
+def clone(
+    remote: str,
+    dest: Path,
+    depth: Optional[int] = None,
+    blob_filter: Optional[str] = None,
+    sparse_patterns: Optional[list[str]] = None,
+    bare: bool = False,
+):
+    """Clone `remote` into `dest`, optionally shallow, partial and sparse.
+
+    With sparse patterns the clone is made without a checkout, the sparse
+    checkout is restricted to the patterns and only then checked out, so a
+    partial clone fetches just the blobs that match.
+    """
+    clone_cmd = ["clone", "--quiet"]
+    if bare:
+        clone_cmd += ["--bare"]
+    if depth:
+        clone_cmd += ["--depth", str(depth)]
+    if blob_filter:
+        clone_cmd += [f"--filter={blob_filter}"]
+    if sparse_patterns:
+        clone_cmd += ["--no-checkout"]
+    run_git(*clone_cmd, remote, str(dest))
+
+    if sparse_patterns:
+        run_git("sparse-checkout", "set", "--no-cone", *sparse_patterns, cwd=dest)
+        run_git("checkout", "--quiet", cwd=dest)
+
+
+def object_store_bytes(repo_dir: Path) -> int:
+    """Size of the repository's object store, i.e. what the clone transferred."""
+    stats = {}
+    for line in run_git("count-objects", "-v", cwd=repo_dir).splitlines():
+        key, value = line.split(":", 1)
+        stats[key] = value.strip()
+    return (int(stats.get("size", 0)) + int(stats.get("size-pack", 0))) * 1024
+
+
+@dataclass
+class TreeEntry:
+    path: str
+    sha: str
+    size: int = 0
+
+
+def ls_tree(repo_dir, rev: str = "HEAD", extensions: Optional[list[str]] = None) -> list[TreeEntry]:
+    """List the regular-file blobs of `rev`, optionally only those with the given extensions."""
+    entries = []
+    output = run_git("ls-tree", "-r", "-z", "--long", rev, cwd=repo_dir)
+    for record in output.split("\0"):
+        if not record:
+            continue
+        meta, path = record.split("\t", 1)
+        mode, obj_type, sha, size = meta.split()
+        # Skip submodules and symlinks
+        if obj_type != "blob" or mode == "120000":
+            continue
+        if extensions and Path(path).suffix not in extensions:
+            continue
+        entries.append(TreeEntry(path=path, sha=sha, size=int(size)))
+    return entries
+
+
+def rev_parse(repo_dir, rev: str) -> str:
+    """Resolve `rev` to a full commit SHA."""
+    return run_git("rev-parse", "--verify", f"{rev}^{{commit}}", cwd=repo_dir).strip()
+
+
+def has_commit(repo_dir, sha: str) -> bool:
+    try:
+        rev_parse(repo_dir, sha)
+        return True
+    except subprocess.CalledProcessError:
+        return False
+
+
+def fetch_commit(repo_dir, sha: str, depth: int = 1) -> bool:
+    """Fetch a single commit from origin into a shallow clone, returning whether it worked."""
+    try:
+        run_git("fetch", "--quiet", "--depth", str(depth), "origin", sha, cwd=repo_dir)
+        return True
+    except subprocess.CalledProcessError:
+        return False
+
+
+@dataclass
+class TreeChanges:
+    changed: list[TreeEntry]
+    deleted: list[str]
+
+
+def diff_tree(repo_dir, old: str, new: str, extensions: Optional[list[str]] = None) -> TreeChanges:
+    """Added/modified blobs and deleted paths between two commits.
+
+    Renames are reported as a deletion plus an addition, and a file that turns
+    into a symlink or submodule counts as deleted.
+    """
+    changes = TreeChanges(changed=[], deleted=[])
+    output = run_git("diff-tree", "-r", "-z", "--no-renames", old, new, cwd=repo_dir)
+    records = output.split("\0")
+    for meta, path in zip(records[0::2], records[1::2]):
+        _, new_mode, _, new_sha, status = meta.lstrip(":").split()
+        if extensions and Path(path).suffix not in extensions:
+            continue
+        if status == "D" or new_mode in ("120000", "160000"):
+            changes.deleted.append(path)
+        else:
+            changes.changed.append(TreeEntry(path=path, sha=new_sha))
+    return changes
+
+
+def iter_blobs(repo_dir, shas: Iterable[str]) -> Iterator[tuple[str, bytes]]:
+    """Stream (sha, content) for every blob through a single `git cat-file --batch`."""
+    process = subprocess.Popen(
+        ["git", "cat-file", "--batch"],
+        cwd=repo_dir,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    shas = list(shas)
+
+    # Feed the requests from a thread so a full stdout pipe can't block stdin
+    def write_requests():
+        try:
+            for sha in shas:
+                process.stdin.write(f"{sha}\n".encode())
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    writer = threading.Thread(target=write_requests, daemon=True)
+    writer.start()
+    try:
+        for sha in shas:
+            header = process.stdout.readline().decode().split()
+            if len(header) < 3 or header[1] != "blob":
+                raise ValueError(f"Unexpected cat-file output for {sha}: {header}")
+            content = process.stdout.read(int(header[2]))
+            process.stdout.read(1)  # trailing newline
+            yield header[0], content
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        writer.join()
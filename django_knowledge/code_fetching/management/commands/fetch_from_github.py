@@ -2,52 +2,81 @@ import os
 import shutil
 import subprocess
 from pathlib import Path
+from time import perf_counter
 
 import djclick as click
 from loguru import logger
 
 from code_fetching.constants import DEFAULT_OUTPUT_DIR
+from code_fetching.git import clone, object_store_bytes, repo_name, resolve_remote
 
 
 @click.command()
-@click.option("--repo", required=True, help="GitHub repository in format owner/repo")
+@click.option(
+    "--repo",
+    required=True,
+    help="GitHub repository in format owner/repo, a git URL (including file://) or a local path",
+)
 @click.option(
     "--output-dir", default=DEFAULT_OUTPUT_DIR, help="Directory to save fetched code"
 )
 @click.option(
     "--file-types", default=".py", help="Comma-separated file extensions to fetch"
 )
-def command(repo, output_dir, file_types):
+@click.option(
+    "--depth", default=None, type=int, help="Shallow clone with this many commits of history"
+)
+@click.option(
+    "--filter",
+    "blob_filter",
+    default=None,
+    help="Partial clone filter passed to git, e.g. blob:none",
+)
+@click.option(
+    "--sparse",
+    is_flag=True,
+    help="Sparse checkout limited to the requested --file-types",
+)
+def command(repo, output_dir, file_types, depth=None, blob_filter=None, sparse=False):
     """Fetch code files from a GitHub repository using git clone."""
 
     logger.info(f"Cloning repository {repo}")
+    start_time = perf_counter()
 
-    # Construct GitHub URL
-    github_url = f"https://github.com/{repo}.git"
+    # Construct the remote, local paths become file:// URLs when git options need a transport
+    remote = resolve_remote(repo, as_url=bool(depth or blob_filter))
 
     # Create output directory
-    output_path = Path(output_dir) / repo.replace("/", "_")
+    output_path = Path(output_dir) / repo_name(repo)
     output_path.mkdir(parents=True, exist_ok=True)
 
+    # Parse file types
+    allowed_extensions = [ext.strip() for ext in file_types.split(",")]
+
     # Clone repository
     try:
         # Remove existing directory if it exists
-        repo_dir = output_path / repo.split("/")[-1]
+        repo_dir = output_path / remote.rstrip("/").split("/")[-1].removesuffix(".git")
         if repo_dir.exists():
             shutil.rmtree(repo_dir)
 
-        # Clone the specific branch
-        clone_cmd = ["git", "clone", github_url, str(repo_dir)]
-        result = subprocess.run(clone_cmd, capture_output=True, text=True, check=True)
+        sparse_patterns = [f"*{ext}" for ext in allowed_extensions] if sparse else None
+        clone(
+            remote,
+            repo_dir,
+            depth=depth,
+            blob_filter=blob_filter,
+            sparse_patterns=sparse_patterns,
+        )
+        clone_time = perf_counter() - start_time
+        bytes_transferred = object_store_bytes(repo_dir)
 
         logger.info(f"Successfully cloned repository to {repo_dir}")
 
-        # Parse file types
-        allowed_extensions = [ext.strip() for ext in file_types.split(",")]
-
         fetched_count = 0
+        fetched_bytes = 0
 
-        # Walk through the cloned repository and copy matching files
+        # Walk through the cloned repository and move matching files
         for root, dirs, files in os.walk(repo_dir):
             # Skip .git directory
             if ".git" in dirs:
@@ -66,15 +95,21 @@ def command(repo, output_dir, file_types):
                     dest_path = output_path / rel_path
                     dest_path.parent.mkdir(parents=True, exist_ok=True)
 
-                    # Copy file
-                    shutil.copy2(file_path, dest_path)
+                    # Move rather than copy, the clone is deleted afterwards anyway
+                    fetched_bytes += file_path.stat().st_size
+                    shutil.move(file_path, dest_path)
                     fetched_count += 1
-                    logger.info(f"Copied: {rel_path}")
+                    logger.debug(f"Moved: {rel_path}")
 
-        # Remove the cloned repository after copying files
+        # Remove the cloned repository after moving files
         shutil.rmtree(repo_dir)
 
         logger.info(f"Successfully fetched {fetched_count} files to {output_path}")
+        logger.info(
+            f"Transferred {bytes_transferred:,} bytes in {clone_time:.2f}s, "
+            f"kept {fetched_bytes:,} bytes, "
+            f"wall time {perf_counter() - start_time:.2f}s"
+        )
 
     except subprocess.CalledProcessError as e:
         logger.error(f"Error cloning repository: {e}")
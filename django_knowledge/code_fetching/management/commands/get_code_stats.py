@@ -1,17 +1,32 @@
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Length
 from loguru import logger
 import djclick as click
-import tiktoken
 
 from synthetic_data_generator.models import PythonFile
 from chunking.models import Chunk, ChunkDescription
+from tokenization.cache import backfill_token_counts
 
 
 @click.command()
-def command():
+@click.option(
+    "--backfill",
+    is_flag=True,
+    help="Count and store the tokens of files that have no stored count yet",
+)
+def command(backfill=False):
+    """Corpus statistics computed with database aggregates, without loading file contents."""
+    if backfill:
+        filled = backfill_token_counts(PythonFile.objects.all(), "content")
+        logger.info("BACKFILLED_TOKEN_COUNTS:\t" + str(filled))
+
     count_tokens()
     count_python_modules()
     count_code_chunks()
     count_chunk_descriptions()
+    count_per_project()
+    count_per_config()
+    count_duplicate_chunks()
 
 
 def count_chunk_descriptions():
@@ -30,15 +45,72 @@ def count_code_chunks():
 
 
 def count_tokens():
-    all_texts = []
-    for pf in PythonFile.objects.all():
-        if pf.content:
-            all_texts.append(pf.content)
+    totals = PythonFile.objects.aggregate(
+        tokens=Sum("num_tokens"),
+        chars=Sum(Length("content")),
+        missing=Count("id", filter=Q(num_tokens__isnull=True) & ~Q(content="")),
+    )
+
+    logger.info("TOTAL_TOKENS:\t" + str(totals["tokens"] or 0))
+    logger.info("TOTAL_CHARS:\t" + str(totals["chars"] or 0))
+    if totals["missing"]:
+        logger.warning(
+            f"{totals['missing']} files have no stored token count, "
+            "run with --backfill to count them"
+        )
+
+
+def count_per_project():
+    rows = (
+        PythonFile.objects.values("project__name")
+        .annotate(
+            files=Count("id"),
+            chars=Sum(Length("content")),
+            tokens=Sum("num_tokens"),
+        )
+        .order_by("project__name")
+    )
+    for row in rows:
+        logger.info(
+            f"PROJECT {row['project__name']}:\t{row['files']} files, "
+            f"{row['chars'] or 0} chars, {row['tokens'] or 0} tokens"
+        )
+
 
-    combined = "\n\n".join(all_texts)
+def count_per_config():
+    descriptions = dict(
+        ChunkDescription.objects.values("chunk__config_id")
+        .annotate(n=Count("id"))
+        .values_list("chunk__config_id", "n")
+    )
+    rows = (
+        Chunk.objects.values("config_id")
+        .annotate(
+            chunks=Count("id", filter=Q(is_leaf=True)),
+            # Hierarchy parents are never embedded and always sliced from their files
+            parents=Count("id", filter=Q(is_leaf=False)),
+            files=Count("python_file", distinct=True),
+            chars=Sum(Length("content")),
+            offsets_only=Count("id", filter=Q(is_leaf=True, content__isnull=True)),
+        )
+        .order_by("config_id")
+    )
+    for row in rows:
+        logger.info(
+            f"CONFIG {row['config_id']}:\t{row['chunks']} chunks and {row['parents']} parents "
+            f"from {row['files']} files, "
+            f"{row['chars'] or 0} chars stored, {row['offsets_only']} chunks stored as offsets, "
+            f"{descriptions.get(row['config_id'], 0)} descriptions"
+        )
 
-    enc = tiktoken.get_encoding("cl100k_base")
-    tokens = enc.encode(combined)
-    logger.info("TOTAL_TOKENS:\t" + str(len(tokens)))
-    logger.info("TOTAL_CHARS:\t" + str(len(combined)))
 
+def count_duplicate_chunks():
+    # Only leaves are described and embedded
+    totals = Chunk.objects.filter(is_leaf=True).aggregate(
+        chunks=Count("id"), contents=Count("content_hash", distinct=True)
+    )
+    logger.info("UNIQUE_CHUNK_CONTENTS:\t" + str(totals["contents"]))
+    logger.info(
+        "DUPLICATE_CHUNKS:\t" + str(totals["chunks"] - totals["contents"])
+        + " (descriptions and embeddings shared instead of generated)"
+    )
@@ -0,0 +1,50 @@
+from django.core.management import call_command
+
+from code_fetching.git import repo_name, resolve_remote
+
+
+def test_resolve_remote(git_repo):
+    assert resolve_remote("owner/repo") == "https://github.com/owner/repo.git"
+    assert resolve_remote("file:///srv/repo.git") == "file:///srv/repo.git"
+    assert resolve_remote(str(git_repo)) == str(git_repo)
+    assert resolve_remote(str(git_repo), as_url=True) == git_repo.as_uri()
+    assert repo_name("owner/repo") == "owner_repo"
+    assert repo_name("https://github.com/owner/repo.git") == "repo"
+    assert repo_name(str(git_repo)) == "sample_repo"
+
+
+def test_full_clone_from_local_path(git_repo, tmp_path):
+    output_dir = tmp_path / "out"
+    call_command(
+        "fetch_from_github", "--repo", str(git_repo), "--output-dir", str(output_dir)
+    )
+
+    fetched = sorted(
+        str(p.relative_to(output_dir / "sample_repo"))
+        for p in (output_dir / "sample_repo").rglob("*")
+        if p.is_file()
+    )
+    assert fetched == ["pkg/__init__.py", "pkg/models.py", "pkg/sub/views.py"]
+
+
+def test_shallow_partial_sparse_clone(git_repo, tmp_path):
+    output_dir = tmp_path / "out"
+    call_command(
+        "fetch_from_github",
+        "--repo",
+        git_repo.as_uri(),
+        "--output-dir",
+        str(output_dir),
+        "--depth",
+        "1",
+        "--filter",
+        "blob:none",
+        "--sparse",
+    )
+
+    project_dir = output_dir / "sample_repo"
+    assert (project_dir / "pkg" / "sub" / "views.py").read_text() == (
+        "def view():\n    return 1\n"
+    )
+    assert not (project_dir / "README.md").exists()
+    assert not (project_dir / "sample_repo").exists()
@@ -0,0 +1,88 @@
+from pytest import fixture
+
+from code_fetching.git import run_git
+
+GIT_IDENTITY = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+
+
+def commit_all(repo_dir, message):
+    run_git("add", "-A", cwd=repo_dir)
+    run_git(*GIT_IDENTITY, "commit", "--quiet", "-m", message, cwd=repo_dir)
+    return run_git("rev-parse", "HEAD", cwd=repo_dir).strip()
+
+
+@fixture
+def git_commit():
+    """Commit everything in a repository and return the new commit SHA."""
+    return commit_all
+
+
+@fixture
+def git_repo(tmp_path):
+    """A small local repository with Python and non-Python files."""
+    repo_dir = tmp_path / "sample_repo"
+    (repo_dir / "pkg" / "sub").mkdir(parents=True)
+    (repo_dir / "pkg" / "__init__.py").write_text("")
+    (repo_dir / "pkg" / "models.py").write_text("class Model:\n    pass\n")
+    (repo_dir / "pkg" / "sub" / "views.py").write_text("def view():\n    return 1\n")
+    (repo_dir / "README.md").write_text("# sample\n" * 1000)
+    (repo_dir / "data.bin").write_bytes(bytes(range(256)) * 1000)
+
+    run_git("init", "--quiet", "-b", "main", cwd=repo_dir)
+    run_git("config", "uploadpack.allowFilter", "true", cwd=repo_dir)
+    commit_all(repo_dir, "initial")
+    return repo_dir
+
+
+def create_chunks(contents):
+    """One file with a single chunk per content, in a new project."""
+    from chunking.models import Chunk
+    from synthetic_data_generator.ingestion import content_hash
+    from synthetic_data_generator.models import Project, PythonFile
+
+    project = Project.objects.create(name="p", root_path="/p")
+    chunks = []
+    for i, content in enumerate(contents):
+        python_file = PythonFile.objects.create(
+            project=project, module_path=f"m{i}.py", content=content
+        )
+        chunks.append(
+            Chunk.objects.create(
+                python_file=python_file, content=content, content_hash=content_hash(content)
+            )
+        )
+    return chunks
+
+
+@fixture
+def make_chunks(db):
+    """Create chunks with the given contents and return them."""
+    return create_chunks
+
+
+@fixture
+def fake_chunking(monkeypatch):
+    """CodeChunker and encodings that work offline, for running chunk_code."""
+    from chunking import chunker as chunker_module
+    from chunking.tests import BlankLineChunker, WhitespaceEncoding
+
+    # Worker processes are forked, so they inherit these patches
+    monkeypatch.setattr(chunker_module, "CodeChunker", BlankLineChunker)
+    monkeypatch.setattr(chunker_module, "load_encoding", lambda name: WhitespaceEncoding())
+
+
+@fixture(autouse=True)
+def offline_encodings(monkeypatch):
+    """Count tokens without downloading encodings, for ingested files and LLM prompts."""
+    from chunking.tests import WhitespaceEncoding
+    from synthetic_data_generator import chunk_describe
+    from tokenization import cache as cache_module
+    from tokenization.cache import TokenCountCache
+
+    monkeypatch.setitem(
+        cache_module._token_counters,
+        "cl100k_base",
+        TokenCountCache("cl100k_base", encoding=WhitespaceEncoding()),
+    )
+    monkeypatch.setattr(chunk_describe, "_prompt_encodings", {})
+    monkeypatch.setattr(chunk_describe, "load_encoding", lambda name: WhitespaceEncoding())
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     "experiment_tracking",
     "synthetic_data_generator",
     "code_fetching",
+    "tokenization",
 ]
 
 MIDDLEWARE = [
@@ -1,27 +1,157 @@
 from time import time
 from loguru import logger
 from vectordb.db import Doc
+from chunking.chunker import materialize_chunks
+from chunking.models import Chunk
+from synthetic_data_generator.ingestion import content_hash
+from tokenization.cache import DB_BATCH_SIZE, get_token_counter
+from tokenization.registry import get_tokenizer, is_registered
 
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_BATCH_TOKENS = 16384
+# Chunks per content hash checked for an embedding to reuse
+MAX_CANDIDATES_PER_HASH = 8
 
-def save_embeddings(db, chunks):
-    """Save chunks to the vector database if they don't already exist."""
+
+def pack_batches(docs, token_counts, max_batch_tokens, max_batch_size):
+    """Group docs, in order, into batches that stay within both the token and size budget.
+
+    A doc that alone exceeds the token budget gets a batch of its own.
+    """
+    batch, batch_tokens = [], 0
+    for doc, num_tokens in zip(docs, token_counts):
+        if batch and (
+            batch_tokens + num_tokens > max_batch_tokens or len(batch) == max_batch_size
+        ):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(doc)
+        batch_tokens += num_tokens
+    if batch:
+        yield batch
+
+
+def stored_embeddings_by_hash(db, hashes, exclude_ids=()) -> dict:
+    """Embeddings already in the collection for chunks with the given content hashes.
+
+    Content shared by many chunks, like empty `__init__.py` files, would match
+    thousands of ids, so at most MAX_CANDIDATES_PER_HASH are looked up per hash,
+    one at a time and by id only, and one embedding is fetched per hash found.
+    """
+    if db.collection.count() == 0:
+        return {}
+    exclude_ids = set(exclude_ids)
+    hashes = list(hashes)
+    candidates = {}
+    for i in range(0, len(hashes), DB_BATCH_SIZE):
+        # Only leaves are embedded
+        rows = Chunk.objects.filter(
+            content_hash__in=hashes[i : i + DB_BATCH_SIZE], is_leaf=True
+        ).order_by("id")
+        for chunk_id, chunk_hash in rows.values_list("id", "content_hash").iterator(
+            chunk_size=DB_BATCH_SIZE
+        ):
+            ids = candidates.setdefault(chunk_hash, [])
+            if len(ids) < MAX_CANDIDATES_PER_HASH and str(chunk_id) not in exclude_ids:
+                ids.append(str(chunk_id))
+
+    found = {}
+    for position in range(MAX_CANDIDATES_PER_HASH):
+        round_ids = {
+            ids[position]: chunk_hash
+            for chunk_hash, ids in candidates.items()
+            if chunk_hash not in found and position < len(ids)
+        }
+        if not round_ids:
+            break
+        for chunk_id in db.existing_ids(list(round_ids)):
+            found[round_ids[chunk_id]] = chunk_id
+    embeddings = db.get_embeddings(list(found.values()))
+    return {
+        chunk_hash: embeddings[chunk_id]
+        for chunk_hash, chunk_id in found.items()
+        if chunk_id in embeddings
+    }
+
+
+def save_embeddings(
+    db,
+    chunks,
+    model_name=None,
+    max_batch_tokens=DEFAULT_MAX_BATCH_TOKENS,
+    max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+):
+    """Save chunks to the vector database if they don't already exist.
+
+    Chunks with identical content are embedded once: the others, and copies of
+    chunks already in the collection under another id, are added with the
+    stored embedding. Chunks stored as offsets are sliced from their files in
+    bulk. When `model_name` has a registered tokenizer, documents
+    are packed into embedding requests by their token count under that
+    model's tokenizer.
+    """
     embedding_start_time = time()
+    chunks = list(materialize_chunks(chunks))
+    existing_ids = db.existing_ids([str(chu.id) for chu in chunks])
+    if existing_ids:
+        logger.info(f"{len(existing_ids)} documents already exist, skipping")
+
+    by_hash = {}
     for chu in chunks:
-        document_id = str(chu.id)
-        if db.document_exists(
-            document_id=document_id,
-        ):
-            logger.info(f"Document {document_id} already exists, skipping")
-            continue
-        else:
+        if str(chu.id) not in existing_ids:
+            by_hash.setdefault(chu.content_hash or content_hash(chu.text), []).append(chu)
+    new_ids = [str(chu.id) for group in by_hash.values() for chu in group]
+    reusable = stored_embeddings_by_hash(db, by_hash, exclude_ids=new_ids)
+
+    # One document per content that has no embedding yet
+    first_copies = {
+        chunk_hash: group[0]
+        for chunk_hash, group in by_hash.items()
+        if chunk_hash not in reusable
+    }
+    docs = [Doc(text=chu.text, id=str(chu.id)) for chu in first_copies.values()]
+
+    if model_name and is_registered(model_name):
+        token_counter = get_token_counter(model_name)
+        token_counts = token_counter.count_many([doc.text for doc in docs])
+        max_tokens = get_tokenizer(model_name).max_content_tokens
+        too_long = sum(1 for num_tokens in token_counts if num_tokens > max_tokens)
+        if too_long:
+            logger.warning(
+                f"{too_long} documents exceed {model_name}'s limit of {max_tokens} tokens"
+            )
+    else:
+        token_counts = [0] * len(docs)
+
+    for batch in pack_batches(docs, token_counts, max_batch_tokens, max_batch_size):
+        db.add(documents=batch)
+        logger.info(f"Added {len(batch)} documents, last ID: {batch[-1].id}")
+
+    # Every other chunk is added with the embedding of its content
+    copies = [
+        (chu, chunk_hash)
+        for chunk_hash, group in by_hash.items()
+        for chu in group
+        if chu is not first_copies.get(chunk_hash)
+    ]
+    if copies:
+        embedded = db.get_embeddings([str(chu.id) for chu in first_copies.values()])
+        for chunk_hash, chu in first_copies.items():
+            reusable[chunk_hash] = embedded[str(chu.id)]
+        for i in range(0, len(copies), max_batch_size * 32):
+            batch = copies[i : i + max_batch_size * 32]
             db.add(
-                documents=[Doc(text=chu.content, id=document_id)],
+                documents=[Doc(text=chu.text, id=str(chu.id)) for chu, _ in batch],
+                embeddings=[reusable[chunk_hash] for _, chunk_hash in batch],
             )
-            logger.info(f"Added document with ID: {document_id}")
-    
+        logger.info(
+            f"Reused embeddings for {len(copies)} documents with duplicate content, "
+            f"{len(copies)} embedding computations avoided"
+        )
+
     embedding_time = int(time() - embedding_start_time)
     logger.info(
-        f"Successfully added {len(chunks)} documents with embedding function"
+        f"Successfully added {len(docs) + len(copies)} documents with embedding function"
     )
     logger.info(f"Embedding time: {embedding_time} seconds")
-    return embedding_time
\ No newline at end of file
+    return embedding_time
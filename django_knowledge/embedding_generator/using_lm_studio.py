@@ -6,3 +6,8 @@ client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
 
 def get_embeddings(model_name: str, text: str) -> list[float]:
     return client.embeddings.create(input=[text], model=model_name).data[0].embedding
+
+
+def get_embeddings_batch(model_name: str, texts: list[str]) -> list[list[float]]:
+    data = client.embeddings.create(input=texts, model=model_name).data
+    return [d.embedding for d in sorted(data, key=lambda d: d.index)]
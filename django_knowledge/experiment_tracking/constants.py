@@ -1 +1,2 @@
 COLLECTION_NAME = "embedding_model_eval"
+CHROMADB_PATH = "chromadb_data"
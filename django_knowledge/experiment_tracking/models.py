@@ -1,7 +1,7 @@
 from django.db import models
 from loguru import logger
 from chromadb import EmbeddingFunction
-from embedding_generator.using_lm_studio import get_embeddings
+from embedding_generator.using_lm_studio import get_embeddings_batch
 
 
 class EmbeddingModel(models.Model):
@@ -85,11 +85,8 @@ class EmbeddingModelKlass(EmbeddingFunction):
         return self._name
 
     def __call__(self, input):
-        res = []
-        for text in input:
-            emb = get_embeddings(self._name, text)
-            assert emb
-            res.append(emb)
+        res = get_embeddings_batch(self._name, list(input))
+        assert all(res)
         return res
 
 
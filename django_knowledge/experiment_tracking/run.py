@@ -2,12 +2,12 @@ import json
 import random
 from time import time
 
-from chunking.chunker import get_chunk_descriptions, get_chunks
+from chunking.chunker import get_chunk_descriptions, get_chunks, materialize_chunks
 from chunking.models import Chunk
 from loguru import logger
 from vectordb.db import ChromaDB
 
-from .constants import COLLECTION_NAME
+from .constants import CHROMADB_PATH, COLLECTION_NAME
 from .models import EmbeddingModelKlass
 from embedding_generator.persistence import save_embeddings
 
@@ -43,7 +43,7 @@ def run_experiment(embedding_functions: list[EmbeddingModelKlass], num_rounds: i
         db = ChromaDB(
             collection_name=collection_name,
             embedding_generator=ef,
-            path="chromadb_data",
+            path=CHROMADB_PATH,
         )
         logger.info(
             f"Collection {collection_name} has {db.collection.count()} documents"
@@ -62,7 +62,7 @@ def run_experiment(embedding_functions: list[EmbeddingModelKlass], num_rounds: i
         #     pass
 
         logger.info("Adding documents to collection")
-        embedding_time = save_embeddings(db, chunks)
+        embedding_time = save_embeddings(db, chunks, model_name=ef.name())
 
         for _ in range(num_rounds):
             logger.info(
@@ -71,23 +71,34 @@ def run_experiment(embedding_functions: list[EmbeddingModelKlass], num_rounds: i
 
             start_time = time()
             score = 0
+            misses = []
             for chunk_desc in chunk_descriptions_to_test:
                 res = db.search(chunk_desc.description, top_k=1)
                 found_chunk_id = int(res["ids"][0][0])
-                found_chunk = Chunk.objects.get(id=found_chunk_id)
-                if found_chunk_id == int(chunk_desc.chunk.id):
+                if found_chunk_id == chunk_desc.chunk_id:
                     score += 1
                 else:
-                    bad_result_data = {
-                        "correct_chunk_id": chunk_desc.chunk.id,
+                    misses.append((chunk_desc, found_chunk_id))
+
+            search_time_elapsed = int(time() - start_time)
+
+            # The chunks of every miss are fetched and their text sliced in one pass
+            missed_ids = {chunk_desc.chunk_id for chunk_desc, _ in misses}
+            missed_ids |= {found_chunk_id for _, found_chunk_id in misses}
+            missed_chunks = {
+                chunk.id: chunk
+                for chunk in materialize_chunks(Chunk.objects.filter(id__in=missed_ids))
+            }
+            for chunk_desc, found_chunk_id in misses:
+                bad_results.append(
+                    {
+                        "correct_chunk_id": chunk_desc.chunk_id,
                         "returned_chunk_id": found_chunk_id,
                         "search_query": chunk_desc.description,
-                        "correct_chunk_content": chunk_desc.chunk.content,
-                        "wrong_chunk_content": found_chunk.content,
+                        "correct_chunk_content": missed_chunks[chunk_desc.chunk_id].text,
+                        "wrong_chunk_content": missed_chunks[found_chunk_id].text,
                     }
-                    bad_results.append(bad_result_data)
-
-            search_time_elapsed = int(time() - start_time)
+                )
 
             logger.info(
                 f"Search time: {search_time_elapsed} seconds, {search_time_elapsed / num_tests} per query"
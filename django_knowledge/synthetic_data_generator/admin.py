@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Project, PythonFile
+from .models import LLMCall, LLMResponse, Project, PythonFile, SymbolTable
 
 
 @admin.register(Project)
@@ -21,3 +21,34 @@ class PythonFileAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('project')
+
+
+@admin.register(SymbolTable)
+class SymbolTableAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'version', 'symbol_count', 'error', 'updated_at')
+    list_filter = ('version', 'created_at', 'updated_at')
+    search_fields = ('content_hash',)
+    readonly_fields = ('created_at', 'updated_at')
+    ordering = ('-updated_at',)
+    
+    def symbol_count(self, obj):
+        return len(obj.symbols)
+    symbol_count.short_description = 'Symbols'
+
+
+@admin.register(LLMResponse)
+class LLMResponseAdmin(admin.ModelAdmin):
+    list_display = ('model', 'content_hash', 'template_version', 'temperature', 'hits', 'size', 'last_used_at')
+    list_filter = ('model', 'template_version')
+    search_fields = ('content_hash', 'model')
+    readonly_fields = ('created_at',)
+    ordering = ('-last_used_at',)
+
+
+@admin.register(LLMCall)
+class LLMCallAdmin(admin.ModelAdmin):
+    list_display = ('model', 'run_id', 'num_chunks', 'prompt_tokens', 'completion_tokens', 'latency', 'finish_reason', 'cost', 'created_at')
+    list_filter = ('model', 'finish_reason')
+    search_fields = ('model', 'run_id')
+    readonly_fields = ('created_at',)
+    ordering = ('-created_at',)
@@ -1,7 +1,21 @@
-from pydantic import BaseModel, Field
-from typing import List
+import io
+import json
+import re
+import tokenize
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+from litellm.exceptions import BadRequestError
 import litellm
 from loguru import logger
+from tiktoken.model import encoding_name_for_model
+
+from chunking.splitter import LineIndex
+from tokenization.registry import load_encoding
+
+from .llm_pacing import RateLimiter, retry_rate_limited
 
 
 class CodeDescriptions(BaseModel):
@@ -14,19 +28,248 @@ class CodeDescriptions(BaseModel):
     )
 
 
-def generate_chunk_descriptions(code_content: str, model: str) -> CodeDescriptions:
-    """Generate descriptions for a code chunk using LLM
-    
-    Args:
-        code_content: The code content to analyze
-        model: The LLM model to use for generation
-        
-    Returns:
-        CodeDescriptions object containing the generated descriptions
-        
-    Raises:
-        Exception: If the LLM call fails
+class ChunkDescriptions(BaseModel):
+    """Descriptions of one chunk of a batch request"""
+
+    chunk_id: int = Field(description="The ID of the chunk, as given in the request")
+    descriptions: List[str] = Field(
+        description="List of descriptions of what this chunk does, as concise and specific as for a single chunk."
+    )
+
+
+class BatchDescriptions(BaseModel):
+    """Pydantic model for LLM response describing several code chunks"""
+
+    chunks: List[ChunkDescriptions] = Field(
+        description="One entry per chunk of the request, each with its chunk_id"
+    )
+
+
+SYSTEM_PROMPT = "You are a helpful assistant that analyzes code and provides clear descriptions of its functionality."
+TEMPERATURE = 0.2
+# Bump when the prompts change, so cached responses to the old prompts are not reused
+PROMPT_TEMPLATE_VERSION = 2
+# Completion budget of a single chunk request, scaled with the code from MIN_COMPLETION_TOKENS up to this
+MAX_TOKENS = 1000
+MIN_COMPLETION_TOKENS = 300
+# Completion budget of a batch request, the sum of its chunks' budgets up to this
+MAX_BATCH_TOKENS = 8000
+# Tokens of code in the prompt of one request
+MAX_PROMPT_TOKENS = 6000
+# String and constant collection literals longer than this are elided from prompts
+MAX_LITERAL_CHARS = 200
+DEFAULT_BATCH_SIZE = 20
+
+
+@dataclass(frozen=True)
+class TokenBudget:
+    """Caps of one request: tokens of code in the prompt, and completion tokens."""
+
+    prompt: int = MAX_PROMPT_TOKENS
+    completion: int = MAX_TOKENS
+
+
+DEFAULT_BUDGET = TokenBudget()
+
+
+@dataclass
+class CallUsage:
+    """Token usage and latency of one completed LLM request."""
+
+    model: str
+    num_chunks: int
+    max_tokens: int
+    latency: float
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    finish_reason: str = ""
+    cost: Optional[float] = None
+
+
+def approx_tokens(text: str) -> int:
+    # Rounded up, so the counts of a text's lines add up to at least that of the text
+    return (len(text) + 3) // 4
+
+
+def approx_tokens_many(texts: list[str]) -> list[int]:
+    return [approx_tokens(text) for text in texts]
+
+
+# tiktoken encodings of LLMs by model name, None for models it has none for
+_prompt_encodings: dict = {}
+
+
+def prompt_encoding(model: str):
+    """The tiktoken encoding of an LLM, looked up by the last part of its litellm name."""
+    if model not in _prompt_encodings:
+        encoding = None
+        try:
+            encoding = load_encoding(encoding_name_for_model(model.rsplit("/", 1)[-1]))
+        except KeyError:
+            pass
+        except Exception as e:
+            logger.warning(f"Could not load the encoding of {model}, estimating tokens as characters/4: {e}")
+        _prompt_encodings[model] = encoding
+    return _prompt_encodings[model]
+
+
+def token_counter(model: Optional[str] = None) -> Callable[[list[str]], list[int]]:
+    """Counts tokens with the model's encoding, or estimates them as characters/4 for models without one.
+
+    The encoding is used directly rather than through the token count cache,
+    since prompts are also fitted on the event loop thread, away from the ORM.
+    """
+    encoding = prompt_encoding(model) if model else None
+    if encoding is None:
+        return approx_tokens_many
+    return lambda texts: [len(ids) for ids in encoding.encode_ordinary_batch(list(texts))]
+
+
+LITERAL_TOKENS = (tokenize.NUMBER, tokenize.STRING, tokenize.NL, tokenize.NEWLINE, tokenize.COMMENT)
+LITERAL_NAMES = ("True", "False", "None")
+LITERAL_OPS = (",", ":", "-", "+", ".", "(", "[", "{", ")", "]", "}")
+STRING_PREFIX = re.compile(r"[rRbBuU]*('\'\'|\"\"\"|'|\")")
+
+
+def literal_spans(code: str, max_chars: int) -> list[tuple[int, int, str]]:
+    """(start, end, replacement) of the string literals and constant-only displays longer than `max_chars`."""
+    line_starts = [0]
+    for line in code.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line))
+
+    def offset(position):
+        row, col = position
+        return line_starts[row - 1] + col
+
+    spans = []
+    open_brackets = []  # [opening token, whether only literals are inside so far]
+    tokens = tokenize.generate_tokens(io.StringIO(code).readline)
+    try:
+        for token in tokens:
+            if token.type == tokenize.OP and token.string in "([{":
+                open_brackets.append([token, True])
+            elif token.type == tokenize.OP and token.string in ")]}":
+                if not open_brackets:
+                    continue
+                opening, only_literals = open_brackets.pop()
+                start, end = offset(opening.end), offset(token.start)
+                if only_literals and end - start > max_chars:
+                    kept = max_chars // 2
+                    spans.append((start, end, f"{code[start:start + kept]} ...<{end - start - kept} chars elided>"))
+                if open_brackets and not only_literals:
+                    open_brackets[-1][1] = False
+            elif token.type == tokenize.STRING and len(token.string) > max_chars:
+                quote = STRING_PREFIX.match(token.string)
+                if quote:
+                    kept = max_chars // 2
+                    elided = f"...<{len(token.string) - kept} chars elided>{quote.group(1)}"
+                    spans.append((offset(token.start), offset(token.end), token.string[:kept] + elided))
+            elif open_brackets and not (
+                token.type in LITERAL_TOKENS
+                or (token.type == tokenize.NAME and token.string in LITERAL_NAMES)
+                or (token.type == tokenize.OP and token.string in LITERAL_OPS)
+            ):
+                open_brackets[-1][1] = False
+    except (tokenize.TokenError, SyntaxError):
+        # Chunks cut mid-statement stop tokenizing somewhere, the literals before that are still elided
+        pass
+    return spans
+
+
+def elide_literals(code: str, max_chars: int = MAX_LITERAL_CHARS) -> str:
+    """Shorten long literals, such as embedded data, templates or SQL, keeping their start.
+
+    They cost many prompt tokens and say little about what the code does.
+    """
+    # Outermost first, literals inside an elided display are dropped with it
+    kept = []
+    for start, end, replacement in sorted(literal_spans(code, max_chars), key=lambda s: (s[0], -s[1])):
+        if not kept or start >= kept[-1][1]:
+            kept.append((start, end, replacement))
+    for start, end, replacement in reversed(kept):
+        code = code[:start] + replacement + code[end:]
+    return code
+
+
+def truncate_code(
+    code: str, max_tokens: int, count_tokens_many: Callable[[list[str]], list[int]] = approx_tokens_many
+) -> str:
+    """Keep the first and last lines of `code` within `max_tokens`, marking the lines left out.
+
+    The marker counts against the budget, and a budget too small for it keeps nothing.
+    """
+    max_tokens = max(max_tokens, 0)
+    [total] = count_tokens_many([code])
+    if total <= max_tokens:
+        return code
+    index = LineIndex(code, count_tokens_many)
+    num_lines = len(index)
+    # Room for the longest possible marker, so the actual one fits
+    [marker_tokens] = count_tokens_many([f"# ... {num_lines} lines elided ...\n"])
+    budget = max_tokens - marker_tokens
+    head = 0
+    while head < num_lines and index.size(1, head + 1) <= budget * 3 // 4:
+        head += 1
+    if not head:
+        # A first line too long on its own is cut in proportion to its tokens
+        [marker_tokens] = count_tokens_many([f"\n# ... {len(code)} chars elided ...\n"])
+        keep = len(code) * (max_tokens - marker_tokens) // total
+        if keep <= 0:
+            return ""
+        return f"{code[:keep]}\n# ... {len(code) - keep} chars elided ...\n"
+    tail = 0
+    while (
+        head + tail < num_lines
+        and index.size(1, head) + index.size(num_lines - tail, num_lines) <= budget
+    ):
+        tail += 1
+    elided = num_lines - head - tail
+    return (
+        index.text(1, head)
+        + f"# ... {elided} lines elided ...\n"
+        + (index.text(num_lines - tail + 1, num_lines) if tail else "")
+    )
+
+
+def fit_codes(
+    codes: dict[int, str],
+    max_tokens: int = MAX_PROMPT_TOKENS,
+    count_tokens_many: Callable[[list[str]], list[int]] = approx_tokens_many,
+) -> dict[int, str]:
+    """Elide the long literals of each code, then trim the largest until together they fit `max_tokens`.
+
+    Smaller codes are fitted first, so what they leave of their even share
+    goes to the larger ones. Codes left without a share are dropped.
     """
+    elided = {chunk_id: elide_literals(code) for chunk_id, code in codes.items()}
+    fitted, remaining, left = {}, max_tokens, len(elided)
+    for chunk_id, code in sorted(elided.items(), key=lambda item: len(item[1])):
+        fitted[chunk_id] = truncate_code(code, max(remaining, 0) // left, count_tokens_many)
+        [num_tokens] = count_tokens_many([fitted[chunk_id]])
+        remaining -= num_tokens
+        left -= 1
+    return {chunk_id: fitted[chunk_id] for chunk_id in codes}
+
+
+def fit_code(
+    code: str,
+    max_tokens: int = MAX_PROMPT_TOKENS,
+    count_tokens_many: Callable[[list[str]], list[int]] = approx_tokens_many,
+) -> str:
+    return fit_codes({0: code}, max_tokens, count_tokens_many)[0]
+
+
+def completion_tokens(
+    code: str,
+    max_tokens: int = MAX_TOKENS,
+    count_tokens_many: Callable[[list[str]], list[int]] = approx_tokens_many,
+) -> int:
+    """Completion budget of describing `code`, larger code having more to describe."""
+    [num_tokens] = count_tokens_many([code])
+    return min(max_tokens, MIN_COMPLETION_TOKENS + num_tokens // 2)
+
+
+def build_messages(code_content: str) -> list[dict]:
     prompt = f"""Analyze the following code chunk and generate a list of descriptions of what this code does. Focus on the main functionality and purpose.
 
 Code:
@@ -36,22 +279,291 @@ Code:
 
 Provide concise descriptions of what this code accomplishes. Each description should be a clear, informative statement about the code's functionality.
 """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def build_batch_messages(codes: dict[int, str]) -> list[dict]:
+    blocks = "\n\n".join(
+        f"Chunk {chunk_id}:\n```python\n{code}\n```" for chunk_id, code in codes.items()
+    )
+    prompt = f"""Analyze each of the following code chunks and generate, for each one, a list of descriptions of what that code does. Focus on the main functionality and purpose.
+
+{blocks}
+
+Return one entry per chunk with its chunk_id. Each description should be a clear, informative statement about the functionality of that chunk alone.
+"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
 
+def estimate_tokens(
+    messages: list[dict],
+    max_tokens: int = MAX_TOKENS,
+    count_tokens_many: Callable[[list[str]], list[int]] = approx_tokens_many,
+) -> int:
+    """Prompt plus completion budget of a request, for pacing by tokens per minute."""
+    return sum(count_tokens_many([message["content"] for message in messages])) + max_tokens
+
+
+def batch_max_tokens(
+    codes: dict[int, str],
+    max_tokens: int = MAX_TOKENS,
+    count_tokens_many: Callable[[list[str]], list[int]] = approx_tokens_many,
+) -> int:
+    budgets = (completion_tokens(code, max_tokens, count_tokens_many) for code in codes.values())
+    return min(sum(budgets), MAX_BATCH_TOKENS)
+
+
+def call_usage(resp, model: str, num_chunks: int, max_tokens: int, latency: float) -> CallUsage:
+    usage = getattr(resp, "usage", None)
     try:
-        resp = litellm.completion(
+        cost = litellm.completion_cost(completion_response=resp, model=model)
+    except Exception:
+        # Models missing from litellm's cost map, such as local ones, have no cost
+        cost = None
+    return CallUsage(
+        model=model,
+        num_chunks=num_chunks,
+        max_tokens=max_tokens,
+        latency=latency,
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
+        finish_reason=getattr(resp.choices[0], "finish_reason", None) or "",
+        cost=cost,
+    )
+
+
+def complete(model, messages, max_tokens, response_format, usage=None, num_chunks=1):
+    """litellm.completion, with the call's usage appended to `usage`."""
+    start = perf_counter()
+    resp = litellm.completion(
+        model=model,
+        messages=messages,
+        temperature=TEMPERATURE,
+        max_tokens=max_tokens,
+        response_format=response_format,
+    )
+    if usage is not None:
+        usage.append(call_usage(resp, model, num_chunks, max_tokens, perf_counter() - start))
+    return resp
+
+
+async def acomplete(model, messages, max_tokens, response_format, usage=None, num_chunks=1, limiter=None):
+    """Async complete, paced by `limiter` and retried when rate limited."""
+    num_tokens = estimate_tokens(messages, max_tokens, token_counter(model)) if limiter else 0
+
+    async def call():
+        if limiter:
+            await limiter.acquire(num_tokens)
+        start = perf_counter()
+        resp = await litellm.acompletion(
             model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that analyzes code and provides clear descriptions of its functionality.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.2,
-            max_tokens=1000,
-            response_format=CodeDescriptions,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=max_tokens,
+            response_format=response_format,
         )
+        if usage is not None:
+            usage.append(call_usage(resp, model, num_chunks, max_tokens, perf_counter() - start))
+        return resp
+
+    return await retry_rate_limited(call)
+
+
+def truncated(resp) -> bool:
+    return getattr(resp.choices[0], "finish_reason", None) == "length"
+
+
+def pack_chunks(
+    chunks: Iterable,
+    max_tokens: int,
+    max_size: int = DEFAULT_BATCH_SIZE,
+    count_tokens_many: Callable[[list[str]], list[int]] = approx_tokens_many,
+) -> Iterator[list]:
+    """Group chunks, in order, into batches whose code stays within a token budget.
+
+    With a budget of 0 every chunk is a batch of its own. A chunk that alone
+    exceeds the budget also gets a batch of its own.
+    """
+    batch, batch_tokens = [], 0
+    for chunk in chunks:
+        [num_tokens] = count_tokens_many([chunk.text])
+        if batch and (
+            not max_tokens or batch_tokens + num_tokens > max_tokens or len(batch) == max_size
+        ):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(chunk)
+        batch_tokens += num_tokens
+    if batch:
+        yield batch
+
+
+def parse_batch_descriptions(content: str, chunk_ids: Iterable[int]) -> dict[int, CodeDescriptions]:
+    """The valid descriptions of each requested chunk in a batch response.
+
+    Entries are validated one by one, so a malformed or missing entry only
+    loses its own chunk; an unparsable response loses all of them.
+    """
+    chunk_ids = set(chunk_ids)
+    try:
+        entries = json.loads(content)["chunks"]
+    except (ValueError, TypeError, KeyError) as e:
+        logger.warning(f"Unparsable batch response: {e}")
+        return {}
+
+    results = {}
+    for entry in entries if isinstance(entries, list) else []:
+        try:
+            chunk_id = int(entry["chunk_id"])
+            descriptions = CodeDescriptions.model_validate(
+                {"descriptions": entry["descriptions"]}
+            )
+        except (ValidationError, ValueError, TypeError, KeyError):
+            continue
+        if chunk_id in chunk_ids:
+            results.setdefault(chunk_id, descriptions)
+    return results
+
+
+def generate_chunk_descriptions(
+    code_content: str, model: str, budget: TokenBudget = DEFAULT_BUDGET, usage: Optional[list] = None
+) -> CodeDescriptions:
+    """Generate descriptions for a code chunk using LLM
+    
+    Args:
+        code_content: The code content to analyze, fitted to `budget.prompt` tokens
+        model: The LLM model to use for generation
+        budget: Token caps of the request; a response cut short by the scaled
+            completion budget is requested again with the full `budget.completion`
+        usage: If given, the CallUsage of each request is appended to it
+        
+    Returns:
+        CodeDescriptions object containing the generated descriptions
+        
+    Raises:
+        Exception: If the LLM call fails
+    """
+    count_tokens_many = token_counter(model)
+    messages = build_messages(fit_code(code_content, budget.prompt, count_tokens_many))
+    max_tokens = completion_tokens(code_content, budget.completion, count_tokens_many)
+    try:
+        resp = complete(model, messages, max_tokens, CodeDescriptions, usage)
+        if truncated(resp) and max_tokens < budget.completion:
+            resp = complete(model, messages, budget.completion, CodeDescriptions, usage)
+        return CodeDescriptions.model_validate_json(resp.choices[0].message.content)
+    except Exception as e:
+        logger.error(f"Error calling LLM: {e}")
+        raise
+
+
+async def agenerate_chunk_descriptions(
+    code_content: str,
+    model: str,
+    limiter: Optional[RateLimiter] = None,
+    budget: TokenBudget = DEFAULT_BUDGET,
+    usage: Optional[list] = None,
+) -> CodeDescriptions:
+    """Async generate_chunk_descriptions, paced by `limiter` and retried when rate limited."""
+    count_tokens_many = token_counter(model)
+    messages = build_messages(fit_code(code_content, budget.prompt, count_tokens_many))
+    max_tokens = completion_tokens(code_content, budget.completion, count_tokens_many)
+    try:
+        resp = await acomplete(model, messages, max_tokens, CodeDescriptions, usage, limiter=limiter)
+        if truncated(resp) and max_tokens < budget.completion:
+            resp = await acomplete(
+                model, messages, budget.completion, CodeDescriptions, usage, limiter=limiter
+            )
         return CodeDescriptions.model_validate_json(resp.choices[0].message.content)
     except Exception as e:
         logger.error(f"Error calling LLM: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+def generate_batch_descriptions(
+    codes: dict[int, str], model: str, budget: TokenBudget = DEFAULT_BUDGET, usage: Optional[list] = None
+) -> dict[int, CodeDescriptions]:
+    """Describe several chunks, keyed by chunk ID, in one structured-output request."""
+    resp = complete(
+        model,
+        build_batch_messages(fit_codes(codes, budget.prompt, token_counter(model))),
+        batch_max_tokens(codes, budget.completion, token_counter(model)),
+        BatchDescriptions,
+        usage,
+        num_chunks=len(codes),
+    )
+    return parse_batch_descriptions(resp.choices[0].message.content, codes)
+
+
+async def agenerate_batch_descriptions(
+    codes: dict[int, str],
+    model: str,
+    limiter: Optional[RateLimiter] = None,
+    budget: TokenBudget = DEFAULT_BUDGET,
+    usage: Optional[list] = None,
+) -> dict[int, CodeDescriptions]:
+    """Async generate_batch_descriptions, paced by `limiter` and retried when rate limited."""
+    resp = await acomplete(
+        model,
+        build_batch_messages(fit_codes(codes, budget.prompt, token_counter(model))),
+        batch_max_tokens(codes, budget.completion, token_counter(model)),
+        BatchDescriptions,
+        usage,
+        num_chunks=len(codes),
+        limiter=limiter,
+    )
+    return parse_batch_descriptions(resp.choices[0].message.content, codes)
+
+
+def describe_codes(
+    codes: dict[int, str], model: str, budget: TokenBudget = DEFAULT_BUDGET, usage: Optional[list] = None
+) -> dict[int, CodeDescriptions]:
+    """Descriptions per chunk ID, with one request for the batch and one per chunk it failed for.
+
+    Chunks the LLM refuses as a bad request are left out of the result.
+    """
+    results = {}
+    if len(codes) > 1:
+        try:
+            results = generate_batch_descriptions(codes, model, budget=budget, usage=usage)
+        except Exception as e:
+            logger.warning(f"Batch of {len(codes)} chunks failed, describing them one by one: {e}")
+    for chunk_id, code in codes.items():
+        if chunk_id not in results:
+            try:
+                results[chunk_id] = generate_chunk_descriptions(code, model, budget=budget, usage=usage)
+            except BadRequestError as e:
+                logger.error(f"Bad request error for chunk {chunk_id}: {e}")
+    return results
+
+
+async def adescribe_codes(
+    codes: dict[int, str],
+    model: str,
+    limiter: Optional[RateLimiter] = None,
+    budget: TokenBudget = DEFAULT_BUDGET,
+    usage: Optional[list] = None,
+) -> dict[int, CodeDescriptions]:
+    """Async describe_codes, paced by `limiter`."""
+    results = {}
+    if len(codes) > 1:
+        try:
+            results = await agenerate_batch_descriptions(
+                codes, model, limiter, budget=budget, usage=usage
+            )
+        except Exception as e:
+            logger.warning(f"Batch of {len(codes)} chunks failed, describing them one by one: {e}")
+    for chunk_id, code in codes.items():
+        if chunk_id not in results:
+            try:
+                results[chunk_id] = await agenerate_chunk_descriptions(
+                    code, model, limiter, budget=budget, usage=usage
+                )
+            except BadRequestError as e:
+                logger.error(f"Bad request error for chunk {chunk_id}: {e}")
+    return results
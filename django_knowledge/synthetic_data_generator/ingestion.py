@@ -0,0 +1,280 @@
+import hashlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from django.db import transaction
+from django.utils import timezone
+from loguru import logger
+
+from chunking.models import Chunk
+from code_fetching.git import (
+    TreeEntry,
+    clone,
+    diff_tree,
+    fetch_commit,
+    has_commit,
+    iter_blobs,
+    ls_tree,
+    resolve_remote,
+    rev_parse,
+)
+from experiment_tracking.constants import CHROMADB_PATH
+from synthetic_data_generator.models import Project, PythonFile
+from tokenization.cache import get_token_counter
+from vectordb.db import delete_from_all_collections
+
+DEFAULT_BATCH_SIZE = 500
+
+
+@dataclass
+class IngestStats:
+    new: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    deleted: int = 0
+    invalidated_chunks: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.new + self.updated + self.unchanged + self.skipped + self.deleted
+
+    def merge(self, other: "IngestStats"):
+        for field in self.__dataclass_fields__:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class FileRow:
+    module_path: str
+    content: str
+    blob_sha: str = ""
+
+
+@dataclass
+class RefreshPlan:
+    commit: str
+    changed: list[TreeEntry]
+    deleted: list[str]
+    incremental: bool
+
+
+# Reading from git. These functions never touch the database, so they can run
+# in worker threads.
+
+
+def open_repo(repo: str, tmp_dir, last_commit: str = "") -> Path:
+    """Return a local repository for `repo`.
+
+    Local repositories are used in place. Remote ones are cloned bare with depth 1
+    into `tmp_dir`, plus `last_commit` so an incremental refresh can diff against it.
+    """
+    repo_dir = Path(repo).expanduser()
+    if repo_dir.exists():
+        return repo_dir
+
+    repo_dir = Path(tmp_dir) / "repo.git"
+    logger.info(f"Cloning {repo} (bare, depth 1)")
+    clone(resolve_remote(repo), repo_dir, depth=1, bare=True)
+    if last_commit:
+        fetch_commit(repo_dir, last_commit)
+    return repo_dir
+
+
+def plan_refresh(
+    repo_dir,
+    rev: str,
+    last_commit: str,
+    known_paths: Iterable[str],
+    extensions: Optional[list[str]] = None,
+    full: bool = False,
+) -> RefreshPlan:
+    """Work out which paths to (re)load and delete to bring a project to `rev`.
+
+    If `last_commit` is available in the repository only the paths that changed
+    since then are returned, otherwise the whole tree, plus every known path
+    that no longer exists.
+    """
+    commit = rev_parse(repo_dir, rev)
+    if not full and last_commit and has_commit(repo_dir, last_commit):
+        changes = diff_tree(repo_dir, last_commit, commit, extensions)
+        return RefreshPlan(commit, changes.changed, changes.deleted, incremental=True)
+
+    entries = ls_tree(repo_dir, commit, extensions)
+    vanished = set(known_paths) - {entry.path for entry in entries}
+    return RefreshPlan(commit, entries, sorted(vanished), incremental=False)
+
+
+def read_changed_blobs(
+    repo_dir,
+    entries: list[TreeEntry],
+    known_shas: dict[str, str],
+    stats: IngestStats,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[list[FileRow]]:
+    """Yield batches of decoded files whose blob differs from the known one.
+
+    Files whose blob SHA is already known are not read at all.
+    """
+    pending = [entry for entry in entries if known_shas.get(entry.path) != entry.sha]
+    stats.unchanged += len(entries) - len(pending)
+
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i : i + batch_size]
+        contents = dict(
+            iter_blobs(repo_dir, list(dict.fromkeys(entry.sha for entry in batch)))
+        )
+        rows = []
+        for entry in batch:
+            try:
+                content = contents[entry.sha].decode("utf-8")
+            except UnicodeDecodeError:
+                logger.warning(f"Skipping binary file: {entry.path}")
+                stats.skipped += 1
+                continue
+            rows.append(FileRow(entry.path, content, entry.sha))
+        yield rows
+
+
+# Writing to the database.
+
+
+def known_blob_shas(project: Project) -> dict[str, str]:
+    return dict(
+        PythonFile.objects.filter(project=project).values_list(
+            "module_path", "blob_sha"
+        )
+    )
+
+
+def known_content_hashes(project: Project) -> dict[str, str]:
+    return dict(
+        PythonFile.objects.filter(project=project).values_list(
+            "module_path", "content_hash"
+        )
+    )
+
+
+def invalidate_chunks(python_file_ids: list[int]) -> int:
+    """Delete the chunks of the given files, their descriptions and their vector entries."""
+    chunks = Chunk.objects.filter(python_file_id__in=python_file_ids)
+    chunk_ids = [str(chunk_id) for chunk_id in chunks.values_list("id", flat=True)]
+    if not chunk_ids:
+        return 0
+    delete_from_all_collections(CHROMADB_PATH, chunk_ids)
+    chunks.delete()
+    return len(chunk_ids)
+
+
+def delete_python_files(project: Project, module_paths: list[str], stats: IngestStats):
+    """Delete the project's files at the given paths, with everything derived from them."""
+    for i in range(0, len(module_paths), DEFAULT_BATCH_SIZE):
+        batch = module_paths[i : i + DEFAULT_BATCH_SIZE]
+        with transaction.atomic():
+            ids = list(
+                PythonFile.objects.filter(
+                    project=project, module_path__in=batch
+                ).values_list("id", flat=True)
+            )
+            stats.invalidated_chunks += invalidate_chunks(ids)
+            PythonFile.objects.filter(id__in=ids).delete()
+            stats.deleted += len(ids)
+
+
+@transaction.atomic
+def write_files(project: Project, rows: list[FileRow], stats: IngestStats):
+    """Create or update the project's PythonFile rows in bulk, invalidating chunks of updated files.
+
+    Paths are unique per project, so another project's file at the same path
+    is left alone and this project gets a row of its own. Token counts are
+    stored while the contents are at hand.
+    """
+    existing = {
+        pf.module_path: pf
+        for pf in PythonFile.objects.filter(
+            project=project, module_path__in=[row.module_path for row in rows]
+        ).only("id", "module_path")
+    }
+
+    token_counts = get_token_counter("cl100k_base").count_many([row.content for row in rows])
+    to_create, to_update = [], []
+    now = timezone.now()
+    for row, num_tokens in zip(rows, token_counts):
+        python_file = existing.get(row.module_path)
+        if python_file is None:
+            to_create.append(
+                PythonFile(
+                    project=project,
+                    module_path=row.module_path,
+                    content=row.content,
+                    content_hash=content_hash(row.content),
+                    blob_sha=row.blob_sha,
+                    num_tokens=num_tokens,
+                )
+            )
+        else:
+            python_file.content = row.content
+            python_file.content_hash = content_hash(row.content)
+            python_file.blob_sha = row.blob_sha
+            python_file.num_tokens = num_tokens
+            python_file.updated_at = now
+            to_update.append(python_file)
+
+    PythonFile.objects.bulk_create(to_create)
+    PythonFile.objects.bulk_update(
+        to_update,
+        ["content", "content_hash", "blob_sha", "num_tokens", "updated_at"],
+    )
+    stats.invalidated_chunks += invalidate_chunks([pf.id for pf in to_update])
+    stats.new += len(to_create)
+    stats.updated += len(to_update)
+
+
+def finish_refresh(project: Project, plan: RefreshPlan):
+    project.last_commit = plan.commit
+    project.save(update_fields=["last_commit", "updated_at"])
+
+
+def refresh_project(
+    project: Project,
+    repo_dir,
+    rev: str = "HEAD",
+    extensions: Optional[list[str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    full: bool = False,
+) -> IngestStats:
+    """Bring the project's files in line with `rev` and record it as the last ingested commit.
+
+    If the project's last ingested commit is available in the repository only
+    the paths that changed between the two commits are touched, otherwise the
+    whole tree is ingested and files that no longer exist are deleted.
+    """
+    stats = IngestStats()
+    known_shas = known_blob_shas(project)
+    plan = plan_refresh(repo_dir, rev, project.last_commit, known_shas, extensions, full)
+    log_plan(project.name, project.last_commit, plan)
+
+    delete_python_files(project, plan.deleted, stats)
+    for rows in read_changed_blobs(repo_dir, plan.changed, known_shas, stats, batch_size):
+        write_files(project, rows, stats)
+
+    finish_refresh(project, plan)
+    return stats
+
+
+def log_plan(name: str, last_commit: str, plan: RefreshPlan):
+    if plan.incremental:
+        logger.info(
+            f"{name}: incremental refresh {last_commit[:8]}..{plan.commit[:8]}, "
+            f"{len(plan.changed)} added or modified, {len(plan.deleted)} deleted"
+        )
+    else:
+        logger.info(
+            f"{name}: full ingestion of {len(plan.changed)} files at {plan.commit[:8]}, "
+            f"{len(plan.deleted)} vanished"
+        )
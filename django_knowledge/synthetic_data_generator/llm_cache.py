@@ -0,0 +1,161 @@
+from typing import Optional
+
+from django.db.models import F
+from django.utils import timezone
+from loguru import logger
+
+from synthetic_data_generator.chunk_describe import (
+    MAX_PROMPT_TOKENS,
+    PROMPT_TEMPLATE_VERSION,
+    TEMPERATURE,
+    CodeDescriptions,
+    fit_code,
+    fit_codes,
+    token_counter,
+)
+from synthetic_data_generator.ingestion import content_hash
+from synthetic_data_generator.models import LLMResponse
+from tokenization.cache import DB_BATCH_SIZE
+
+DEFAULT_MAX_MB = 512
+
+
+class DescriptionCache:
+    """Chunk descriptions keyed by (model, prompt template version, content hash, temperature).
+
+    The content hash is that of the code as a prompt shows it, i.e. fitted to
+    `prompt_tokens` on its own, so runs with different prompt budgets don't
+    share responses. A chunk trimmed further to share a batch request with
+    others was shown differently, and its response is not stored.
+
+    Lookups and stores take {chunk_id: code} mappings, so they sit in front of
+    a batch of LLM requests. Entries are evicted least recently used first
+    once the stored responses exceed `max_bytes`. Uses the ORM, so it must be
+    called from the command's thread rather than an event loop.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        temperature: float = TEMPERATURE,
+        template_version: int = PROMPT_TEMPLATE_VERSION,
+        max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+        prompt_tokens: int = MAX_PROMPT_TOKENS,
+    ):
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.temperature = temperature
+        self.template_version = template_version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._to_store = {}
+
+    def entries(self):
+        return LLMResponse.objects.filter(
+            model=self.model,
+            template_version=self.template_version,
+            temperature=self.temperature,
+        )
+
+    def get_many(self, codes: dict[int, str]) -> dict[int, CodeDescriptions]:
+        """The cached descriptions of the chunks that have them, by chunk ID."""
+        hashes = {
+            chunk_id: content_hash(fit_code(code, self.prompt_tokens, token_counter(self.model)))
+            for chunk_id, code in codes.items()
+        }
+        found = {}
+        unique_hashes = list(set(hashes.values()))
+        for i in range(0, len(unique_hashes), DB_BATCH_SIZE):
+            batch = unique_hashes[i : i + DB_BATCH_SIZE]
+            found.update(
+                self.entries()
+                .filter(content_hash__in=batch)
+                .values_list("content_hash", "response")
+            )
+        if found:
+            self.entries().filter(content_hash__in=list(found)).update(
+                hits=F("hits") + 1, last_used_at=timezone.now()
+            )
+
+        results = {
+            chunk_id: CodeDescriptions.model_validate_json(found[h])
+            for chunk_id, h in hashes.items()
+            if h in found
+        }
+        self.hits += len(results)
+        self.misses += len(codes) - len(results)
+        return results
+
+    def put_many(self, codes: dict[int, str], results: dict[int, CodeDescriptions]):
+        """Store the responses to one request for `codes`, written in batches; call flush() once done."""
+        count_tokens_many = token_counter(self.model)
+        alone = {
+            chunk_id: fit_code(code, self.prompt_tokens, count_tokens_many)
+            for chunk_id, code in codes.items()
+        }
+        shown = fit_codes(codes, self.prompt_tokens, count_tokens_many) if len(codes) > 1 else alone
+        for chunk_id, descriptions in results.items():
+            if shown[chunk_id] != alone[chunk_id]:
+                continue
+            response = descriptions.model_dump_json()
+            h = content_hash(alone[chunk_id])
+            self._to_store[h] = LLMResponse(
+                model=self.model,
+                template_version=self.template_version,
+                content_hash=h,
+                temperature=self.temperature,
+                response=response,
+                size=len(response),
+            )
+        if len(self._to_store) >= DB_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        LLMResponse.objects.bulk_create(
+            self._to_store.values(), batch_size=DB_BATCH_SIZE, ignore_conflicts=True
+        )
+        self._to_store.clear()
+
+    def evict(self) -> int:
+        """Delete the least recently used responses until they fit in `max_bytes`."""
+        self.flush()
+        total = 0
+        keep_until = None
+        rows = LLMResponse.objects.order_by("-last_used_at", "-id").values_list("id", "size")
+        for entry_id, size in rows.iterator(chunk_size=DB_BATCH_SIZE):
+            total += size
+            if total > self.max_bytes:
+                keep_until = entry_id
+                break
+        if keep_until is None:
+            return 0
+        cutoff = LLMResponse.objects.get(id=keep_until).last_used_at
+        # Everything used before the first entry over budget, and that entry itself
+        stale = LLMResponse.objects.filter(last_used_at__lt=cutoff) | LLMResponse.objects.filter(
+            last_used_at=cutoff, id__lte=keep_until
+        )
+        deleted, _ = stale.delete()
+        self.evicted += deleted
+        return deleted
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def log_stats(self):
+        logger.info(
+            f"LLM_CACHE[{self.model}]:\t"
+            f"hit_rate={self.hit_rate:.2%} hits={self.hits} misses={self.misses} "
+            f"evicted={self.evicted}"
+        )
+
+
+def cached(cache: Optional[DescriptionCache], codes: dict[int, str]):
+    """Split `codes` into the descriptions the cache has and the codes still to describe."""
+    if cache is None:
+        return {}, codes
+    hits = cache.get_many(codes)
+    return hits, {chunk_id: code for chunk_id, code in codes.items() if chunk_id not in hits}
@@ -0,0 +1,119 @@
+import asyncio
+import random
+import threading
+from concurrent.futures import Future
+from time import monotonic
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from litellm.exceptions import RateLimitError
+from loguru import logger
+
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Paces consumption to `per_minute` units, allowing bursts of up to `capacity`.
+
+    A request bigger than the capacity waits for a full bucket and then drives
+    it negative, so it is delayed rather than refused.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60
+        self.capacity = capacity or per_minute
+        self.available = self.capacity
+        self.updated = monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self, amount: float = 1):
+        # Waiters are served in order, so a big request is not starved by small ones
+        async with self._lock:
+            needed = min(amount, self.capacity)
+            self._refill()
+            while self.available < needed:
+                await asyncio.sleep((needed - self.available) / self.rate)
+                self._refill()
+            self.available -= amount
+
+
+class RateLimiter:
+    """Request and token budgets per minute, either of which may be unlimited."""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, num_tokens: int):
+        if self.requests:
+            await self.requests.take(1)
+        if self.tokens:
+            await self.tokens.take(num_tokens)
+
+
+def backoff_delay(
+    attempt: int, base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY
+) -> float:
+    """Exponential backoff with full jitter, so retrying clients spread out."""
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+async def retry_rate_limited(
+    call: Callable[[], Awaitable[T]],
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    base_delay: float = DEFAULT_BASE_DELAY,
+    max_delay: float = DEFAULT_MAX_DELAY,
+) -> T:
+    """Await `call()`, retrying it when the provider answers 429 Too Many Requests."""
+    for attempt in range(max_retries + 1):
+        try:
+            return await call()
+        except RateLimitError:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            logger.warning(f"Rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            await asyncio.sleep(delay)
+
+
+class EventLoopThread:
+    """An event loop running in a background thread, for awaiting calls from synchronous code.
+
+    Coroutines submitted from the calling thread return concurrent futures, so
+    the caller keeps the ORM and its transactions on its own thread.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self) -> "EventLoopThread":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        async def cancel_pending():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(cancel_pending(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def submit(self, coroutine: Awaitable[T]) -> "Future[T]":
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
@@ -0,0 +1,55 @@
+from dataclasses import asdict
+
+from django.db.models import Avg, Count, Q, QuerySet, Sum
+from loguru import logger
+
+from synthetic_data_generator.models import LLMCall
+from tokenization.cache import DB_BATCH_SIZE
+
+
+def usage_by_model(calls: QuerySet) -> list[dict]:
+    """Totals per model of `calls`, computed with database aggregates."""
+    rows = (
+        calls.values("model")
+        .annotate(
+            calls=Count("id"),
+            chunks=Sum("num_chunks"),
+            prompt_tokens=Sum("prompt_tokens"),
+            completion_tokens=Sum("completion_tokens"),
+            total_latency=Sum("latency"),
+            mean_latency=Avg("latency"),
+            truncated=Count("id", filter=Q(finish_reason="length")),
+            cost=Sum("cost"),
+        )
+        .order_by("model")
+    )
+    for row in rows:
+        # Per second of waiting on the model, comparable whatever the concurrency
+        row["completion_tokens_per_sec"] = (
+            (row["completion_tokens"] or 0) / row["total_latency"] if row["total_latency"] else 0.0
+        )
+        row["chunks_per_sec"] = row["chunks"] / row["total_latency"] if row["total_latency"] else 0.0
+    return list(rows)
+
+
+def log_usage(calls: QuerySet):
+    for row in usage_by_model(calls):
+        cost = f"${row['cost']:.4f}" if row["cost"] is not None else "unknown cost"
+        logger.info(
+            f"LLM_USAGE[{row['model']}]:\t"
+            f"{row['calls']} calls, {row['chunks']} chunks, "
+            f"{row['prompt_tokens'] or 0} prompt + {row['completion_tokens'] or 0} completion tokens, "
+            f"{row['mean_latency']:.2f}s mean latency, "
+            f"{row['completion_tokens_per_sec']:.1f} completion tokens/sec, "
+            f"{row['chunks_per_sec']:.2f} chunks/sec, "
+            f"{row['truncated']} truncated, {cost}"
+        )
+
+
+def save_calls(run_id, usage) -> int:
+    """Write the CallUsage records collected so far, which the LLM requests may still be adding to."""
+    calls = []
+    while usage:
+        calls.append(LLMCall(run_id=run_id, **asdict(usage.popleft())))
+    LLMCall.objects.bulk_create(calls, batch_size=DB_BATCH_SIZE)
+    return len(calls)
@@ -0,0 +1,120 @@
+import json
+import os
+from pathlib import Path
+from time import perf_counter
+
+import djclick as click
+from loguru import logger
+
+from synthetic_data_generator.walking import (
+    DEFAULT_EXCLUDED_DIRS,
+    DEFAULT_READ_WORKERS,
+    WalkStats,
+    read_files,
+    read_text,
+    walk_files,
+)
+
+
+def rglob_python_files(path: Path):
+    """The previous load_project walker: rglob everything, then filter on the parents."""
+    for item in path.rglob("*.py"):
+        if item.is_file() and not any(
+            parent.name in DEFAULT_EXCLUDED_DIRS
+            for parent in item.relative_to(path).parents
+        ):
+            yield item
+
+
+def scan_tree(path: str) -> int:
+    """Number of entries below `path`, i.e. what a walker that doesn't prune has to list."""
+    entries = 0
+    for _, dirs, files in os.walk(path):
+        entries += len(dirs) + len(files)
+    return entries
+
+
+@click.command()
+@click.argument("path")
+@click.option(
+    "--workers",
+    default=DEFAULT_READ_WORKERS,
+    type=int,
+    help="Number of threads reading files in the threaded read pass",
+)
+@click.option("--output", default=None, help="Also write the results as JSON to this path")
+def command(path, workers, output=None):
+    """Benchmark file discovery and reading for load_project on a checkout at PATH.
+
+    Compares the pruning scandir walker against the previous rglob walker,
+    measures how long listing the pruned (excluded or git-ignored) trees takes,
+    and compares sequential reads with reads in a thread pool. Run it twice to
+    compare warm page-cache numbers.
+    """
+    root = Path(path)
+    results = {}
+
+    start = perf_counter()
+    stats = WalkStats()
+    paths = list(walk_files(root, stats=stats))
+    elapsed = perf_counter() - start
+    results["scandir"] = {
+        "files": len(paths),
+        "seconds": elapsed,
+        "files_per_sec": len(paths) / elapsed if elapsed else 0,
+        "dirs_scanned": stats.dirs_scanned,
+        "dirs_pruned": len(stats.pruned_dirs),
+        "ignored_files": stats.ignored_files,
+    }
+
+    start = perf_counter()
+    legacy_files = sum(1 for _ in rglob_python_files(root))
+    elapsed = perf_counter() - start
+    results["rglob"] = {
+        "files": legacy_files,
+        "seconds": elapsed,
+        "files_per_sec": legacy_files / elapsed if elapsed else 0,
+    }
+
+    start = perf_counter()
+    excluded_entries = sum(scan_tree(pruned) for pruned in stats.pruned_dirs)
+    results["excluded_trees"] = {
+        "dirs": len(stats.pruned_dirs),
+        "entries": excluded_entries,
+        "seconds": perf_counter() - start,
+    }
+
+    for name, reader in (
+        ("read_sequential", lambda: map(read_text, paths)),
+        ("read_threaded", lambda: read_files(paths, workers=workers)),
+    ):
+        start = perf_counter()
+        num_chars = sum(len(r.content) for r in reader() if r.content is not None)
+        elapsed = perf_counter() - start
+        results[name] = {
+            "chars": num_chars,
+            "seconds": elapsed,
+            "files_per_sec": len(paths) / elapsed if elapsed else 0,
+        }
+
+    for name in ("scandir", "rglob"):
+        r = results[name]
+        logger.info(
+            f"{name}:\t{r['files']} files in {r['seconds']:.3f}s "
+            f"({r['files_per_sec']:.0f} files/sec)"
+        )
+    r = results["excluded_trees"]
+    logger.info(
+        f"excluded trees:\t{r['dirs']} pruned dirs holding {r['entries']} entries, "
+        f"{r['seconds']:.3f}s to list them"
+    )
+    for name in ("read_sequential", "read_threaded"):
+        r = results[name]
+        logger.info(
+            f"{name}:\t{r['chars']} chars in {r['seconds']:.3f}s "
+            f"({r['files_per_sec']:.0f} files/sec)"
+        )
+
+    if output:
+        Path(output).write_text(json.dumps({"path": str(root), "results": results}, indent=2))
+        logger.success(f"Wrote benchmark results to {output}")
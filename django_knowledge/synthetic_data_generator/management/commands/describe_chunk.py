@@ -1,12 +1,156 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from uuid import uuid4
+
 import djclick as click
-from django.db import transaction
 from loguru import logger
+from chunking.chunker import materialize_chunks
 from chunking.models import Chunk, ChunkDescription
-from synthetic_data_generator.chunk_describe import generate_chunk_descriptions
-from litellm.exceptions import BadRequestError
+from synthetic_data_generator.chunk_describe import (
+    DEFAULT_BATCH_SIZE,
+    MAX_PROMPT_TOKENS,
+    MAX_TOKENS,
+    TokenBudget,
+    adescribe_codes,
+    describe_codes,
+    pack_chunks,
+    token_counter,
+)
+from synthetic_data_generator.llm_cache import DEFAULT_MAX_MB, DescriptionCache, cached
+from synthetic_data_generator.llm_pacing import EventLoopThread, RateLimiter
+from synthetic_data_generator.llm_usage import log_usage, save_calls
+from synthetic_data_generator.models import LLMCall
+from synthetic_data_generator.symbol_index import batched
+from tokenization.cache import DB_BATCH_SIZE
 import time
 
 
+class DescribeRun:
+    """What a describe_chunk run has described so far, and the descriptions still to write.
+
+    Chunks with identical content share their descriptions, so each content is
+    described once: a chunk whose content is already described reuses those
+    descriptions, and one whose content is waiting for a request joins it.
+    """
+
+    def __init__(self, described, described_ids, bar):
+        self.described = described  # content hash -> descriptions
+        self.described_ids = described_ids  # chunks that have descriptions already
+        self.waiting = {}  # content hash -> chunks with the same content as a pending chunk
+        self.bar = bar
+        self.to_write = []
+        # CallUsage of each LLM request, appended to from the event loop in concurrent mode
+        self.run_id = uuid4()
+        self.usage = deque()
+        self.success_count = 0
+        self.reused_count = 0
+
+    def undescribed(self, chunks):
+        """The chunks without descriptions yet, before their text is materialized."""
+        for chunk in chunks:
+            if chunk.id in self.described_ids:
+                self.bar.update(1)
+                continue
+            yield chunk
+
+    def pending(self, chunks):
+        """The chunks that need an LLM request, the others reuse descriptions."""
+        for chunk in chunks:
+            if chunk.content_hash in self.described:
+                self.add(chunk, self.described[chunk.content_hash])
+                self.reused_count += 1
+                self.bar.update(1)
+                continue
+            if chunk.content_hash in self.waiting:
+                self.waiting[chunk.content_hash].append(chunk)
+                continue
+            if chunk.content_hash:
+                self.waiting[chunk.content_hash] = []
+            yield chunk
+
+    def add(self, chunk, descriptions):
+        self.to_write.extend(
+            ChunkDescription(chunk=chunk, description=description)
+            for description in descriptions
+        )
+
+    def complete(self, batch, results):
+        """Record the descriptions of a batch of pending chunks, by chunk ID."""
+        for chunk in batch:
+            copies = self.waiting.pop(chunk.content_hash, []) if chunk.content_hash else []
+            self.bar.update(1 + len(copies))
+            if chunk.id not in results:
+                continue
+            descriptions = results[chunk.id].descriptions
+            for described_chunk in [chunk] + copies:
+                self.add(described_chunk, descriptions)
+            if chunk.content_hash:
+                self.described[chunk.content_hash] = descriptions
+            self.success_count += 1
+            self.reused_count += len(copies)
+        if len(self.to_write) >= DB_BATCH_SIZE:
+            self.write()
+
+    def write(self):
+        ChunkDescription.objects.bulk_create(self.to_write, batch_size=DB_BATCH_SIZE)
+        self.to_write.clear()
+        save_calls(self.run_id, self.usage)
+
+    def uncached(self, chunks, cache):
+        """Complete the chunks the cache has descriptions for, looked up in bulk, and yield the others."""
+        for group in batched(chunks, DB_BATCH_SIZE):
+            hits, _ = cached(cache, {chunk.id: chunk.text for chunk in group})
+            if hits:
+                self.complete([chunk for chunk in group if chunk.id in hits], hits)
+            yield from (chunk for chunk in group if chunk.id not in hits)
+
+
+def describe_serially(run, batches, model, budget, cache=None):
+    for batch in batches:
+        codes = {chunk.id: chunk.text for chunk in batch}
+        start_time = time.time()
+        results = describe_codes(codes, model, budget=budget, usage=run.usage)
+        generation_time = time.time() - start_time
+        logger.info(
+            f"Generated descriptions for {len(results)}/{len(batch)} chunks "
+            f"in {generation_time:.2f} seconds"
+        )
+        if cache:
+            cache.put_many(codes, results)
+        run.complete(batch, results)
+
+
+def describe_concurrently(run, batches, model, budget, concurrency, limiter, cache=None):
+    """Describe batches of chunks with up to `concurrency` LLM requests in flight.
+
+    Requests run on an event loop in a background thread while this thread
+    reads chunks and writes descriptions and cached responses in batches.
+    """
+    in_flight = {}  # future -> (batch, codes)
+
+    def collect(futures):
+        for future in futures:
+            batch, codes = in_flight.pop(future)
+            results = future.result()
+            if cache:
+                cache.put_many(codes, results)
+            run.complete(batch, results)
+
+    with EventLoopThread() as runner:
+        for batch in batches:
+            codes = {chunk.id: chunk.text for chunk in batch}
+            future = runner.submit(
+                adescribe_codes(codes, model, limiter, budget=budget, usage=run.usage)
+            )
+            in_flight[future] = (batch, codes)
+            if len(in_flight) >= concurrency:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+
+
 @click.command()
 @click.option(
     "--model",
@@ -21,15 +165,101 @@ import time
     is_flag=True,
     help="Clear existing descriptions before processing",
 )
-def describe_chunk(model, clear_existing=False):
-    """Generate descriptions for all code chunks using LLM"""
+@click.option(
+    "--concurrency",
+    default=1,
+    type=int,
+    help="LLM requests in flight at once, above 1 requests are sent with litellm.acompletion (default: 1)",
+)
+@click.option(
+    "--requests-per-minute",
+    default=None,
+    type=float,
+    help="Pace requests to this rate in concurrent mode (default: unlimited)",
+)
+@click.option(
+    "--tokens-per-minute",
+    default=None,
+    type=float,
+    help="Pace requests to this many estimated prompt and completion tokens in concurrent mode (default: unlimited)",
+)
+@click.option(
+    "--batch-tokens",
+    default=0,
+    type=int,
+    help="Describe several chunks per request, up to this many tokens of code (default: 0, one chunk per request)",
+)
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    type=int,
+    help=f"Maximum chunks per batched request (default: {DEFAULT_BATCH_SIZE})",
+)
+@click.option(
+    "--max-prompt-tokens",
+    default=MAX_PROMPT_TOKENS,
+    type=int,
+    help=f"Tokens of code per request, long literals are elided and then lines trimmed to fit (default: {MAX_PROMPT_TOKENS})",
+)
+@click.option(
+    "--max-completion-tokens",
+    default=MAX_TOKENS,
+    type=int,
+    help=f"Completion budget cap of a single chunk request, smaller chunks get less (default: {MAX_TOKENS})",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Always call the LLM instead of reusing cached responses for the same code, model and prompt",
+)
+@click.option(
+    "--cache-max-mb",
+    default=DEFAULT_MAX_MB,
+    type=int,
+    help=f"Evict the least recently used cached responses beyond this size (default: {DEFAULT_MAX_MB})",
+)
+def describe_chunk(
+    model,
+    clear_existing=False,
+    concurrency=1,
+    requests_per_minute=None,
+    tokens_per_minute=None,
+    batch_tokens=0,
+    batch_size=DEFAULT_BATCH_SIZE,
+    max_prompt_tokens=MAX_PROMPT_TOKENS,
+    max_completion_tokens=MAX_TOKENS,
+    no_cache=False,
+    cache_max_mb=DEFAULT_MAX_MB,
+):
+    """Generate descriptions for all code chunks using LLM
+
+    With --concurrency N up to N requests are in flight at once, paced by
+    --requests-per-minute and --tokens-per-minute, and requests answered with
+    429 Too Many Requests are retried with exponential backoff and jitter.
+
+    With --batch-tokens small chunks are described together in one request
+    keyed by chunk ID. Each chunk's entry of the response is validated on its
+    own, and only the chunks whose entry is missing or invalid are sent again
+    one by one.
+
+    Responses are cached by model, prompt template version, code and
+    temperature, so describing the same code again, after --clear-existing or
+    in another project, costs no LLM call.
+
+    Long string and constant literals are elided from prompts, and code over
+    --max-prompt-tokens keeps its first and last lines. The completion budget
+    grows with the code up to --max-completion-tokens, and a response cut
+    short is requested again with the full budget. Token usage, latency and
+    cost of every request are recorded for the llm_usage command.
+    """
 
     if clear_existing:
         count = ChunkDescription.objects.count()
         ChunkDescription.objects.all().delete()
         logger.info(f"Cleared {count} existing descriptions")
 
-    chunks = Chunk.objects.all()
+    # Parents of hierarchy chunks are not searched for, only their leaves
+    chunks = Chunk.objects.filter(is_leaf=True)
     total_chunks = chunks.count()
 
     if total_chunks == 0:
@@ -38,54 +268,59 @@ def describe_chunk(model, clear_existing=False):
 
     logger.info(f"Processing {total_chunks} chunks using model: {model}")
 
-    processed_count = 0
-    success_count = 0
+    # Described chunks, and the descriptions of each content, fetched in one query
+    described, described_ids, described_by = {}, set(), {}
+    rows = ChunkDescription.objects.values_list("chunk_id", "chunk__content_hash", "description")
+    for chunk_id, content_hash, description in rows.order_by("chunk_id", "id").iterator(
+        chunk_size=DB_BATCH_SIZE
+    ):
+        described_ids.add(chunk_id)
+        if content_hash and described_by.setdefault(content_hash, chunk_id) == chunk_id:
+            described.setdefault(content_hash, []).append(description)
 
     with click.progressbar(length=total_chunks, label="Generating descriptions") as bar:
-        for chunk in chunks:
-            try:
-                # Check if descriptions already exist for this chunk
-                if not clear_existing and chunk.descriptions.exists():
-                    logger.debug(
-                        f"Skipping chunk {chunk.id} - descriptions already exist"
-                    )
-                    bar.update(1)
-                    processed_count += 1
-                    continue
-
-                # Generate descriptions using LLM
-                try:
-                    start_time = time.time()
-                    code_description = generate_chunk_descriptions(chunk.content, model)
-                    end_time = time.time()
-                    generation_time = end_time - start_time
-                except BadRequestError as e:
-                    logger.error(f"Bad request error for chunk {chunk.id}: {e}")
-                    bar.update(1)
-                    processed_count += 1
-                    continue
-                
-                descriptions = code_description.descriptions
-
-                # Save descriptions to database
-                with transaction.atomic():
-                    for description in descriptions:
-                        ChunkDescription.objects.create(
-                            chunk=chunk, description=description
-                        )
-
-                success_count += 1
-                logger.info(
-                    f"Generated {len(descriptions)} descriptions for chunk {chunk.id} in {generation_time:.2f} seconds"
+        run = DescribeRun(described, described_ids, bar=bar)
+        budget = TokenBudget(prompt=max_prompt_tokens, completion=max_completion_tokens)
+        cache = None
+        if not no_cache:
+            cache = DescriptionCache(
+                model, max_bytes=cache_max_mb * 1024 * 1024, prompt_tokens=budget.prompt
+            )
+        # Chunks are streamed, and every database access below is batched across chunks
+        chunk_stream = chunks.order_by("id").iterator(chunk_size=DB_BATCH_SIZE)
+        pending = run.pending(materialize_chunks(run.undescribed(chunk_stream)))
+        batches = pack_chunks(
+            run.uncached(pending, cache),
+            batch_tokens,
+            max_size=batch_size,
+            count_tokens_many=token_counter(model),
+        )
+        try:
+            if concurrency > 1:
+                describe_concurrently(
+                    run,
+                    batches,
+                    model,
+                    budget,
+                    concurrency,
+                    RateLimiter(requests_per_minute, tokens_per_minute),
+                    cache=cache,
                 )
+            else:
+                describe_serially(run, batches, model, budget, cache=cache)
+        finally:
+            # Descriptions already received are kept even if a request failed
+            run.write()
+            if cache:
+                cache.flush()
+                cache.evict()
+                cache.log_stats()
 
-            except Exception as e:
-                logger.error(f"Error processing chunk {chunk.id}: {e}")
-                raise
-            finally:
-                bar.update(1)
-                processed_count += 1
-
     logger.info(
-        f"Completed! Generated descriptions for {success_count}/{total_chunks} chunks."
+        f"Completed! Generated descriptions for {run.success_count}/{total_chunks} chunks."
+    )
+    logger.info(
+        f"Reused descriptions for {run.reused_count} chunks with duplicate content, "
+        f"{run.reused_count} LLM calls avoided"
     )
+    log_usage(LLMCall.objects.filter(run_id=run.run_id))
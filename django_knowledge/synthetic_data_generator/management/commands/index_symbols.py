@@ -0,0 +1,45 @@
+from time import perf_counter
+
+import djclick as click
+from loguru import logger
+
+from synthetic_data_generator.models import PythonFile
+from synthetic_data_generator.symbol_index import (
+    DEFAULT_WORKERS,
+    index_symbols,
+    prune_symbol_tables,
+)
+
+
+@click.command()
+@click.option(
+    "--project-name", default=None, help="Only index this project's files (default: all)"
+)
+@click.option(
+    "--workers", default=DEFAULT_WORKERS, type=int, help="Number of parser processes"
+)
+@click.option(
+    "--prune",
+    is_flag=True,
+    help="Delete symbol tables whose content no PythonFile has anymore",
+)
+def command(project_name=None, workers=DEFAULT_WORKERS, prune=False):
+    """Parse Python files into per-content symbol tables: classes, functions, methods and imports.
+
+    Tables are keyed on the file's content hash, so unchanged files and
+    duplicates across projects are never parsed twice.
+    """
+    start_time = perf_counter()
+    python_files = PythonFile.objects.all()
+    if project_name:
+        python_files = python_files.filter(project__name=project_name)
+
+    built = index_symbols(python_files, workers=workers)
+    elapsed = perf_counter() - start_time
+    logger.success(
+        f"Built {built} symbol tables in {elapsed:.2f}s "
+        f"({built / elapsed if elapsed else 0:.0f} files/sec)"
+    )
+
+    if prune:
+        logger.info(f"Pruned {prune_symbol_tables()} unused symbol tables")
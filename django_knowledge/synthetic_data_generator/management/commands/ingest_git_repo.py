@@ -0,0 +1,80 @@
+import subprocess
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import djclick as click
+from loguru import logger
+
+from code_fetching.git import repo_name, resolve_remote
+from synthetic_data_generator.ingestion import (
+    DEFAULT_BATCH_SIZE,
+    open_repo,
+    refresh_project,
+)
+from synthetic_data_generator.models import Project
+
+
+@click.command()
+@click.argument("repo")
+@click.option("--rev", default="HEAD", help="Commit, branch or tag to ingest")
+@click.option(
+    "--file-types", default=".py", help="Comma-separated file extensions to ingest"
+)
+@click.option(
+    "--project-name", default=None, help="Project name (default: the repository name)"
+)
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    type=int,
+    help="Number of files read and written per batch",
+)
+@click.option(
+    "--full",
+    is_flag=True,
+    help="Ingest the whole tree even if the last ingested commit is known",
+)
+def command(
+    repo, rev, file_types, project_name=None, batch_size=DEFAULT_BATCH_SIZE, full=False
+):
+    """Load files straight from git objects into the database, without a checkout or copy.
+
+    REPO is a local repository (bare or not), a git URL or a GitHub owner/repo.
+    Remote repositories are cloned bare with depth 1 into a temporary directory.
+    When the project was ingested before, only the files changed since its last
+    ingested commit are touched, and the chunks, descriptions and vector entries
+    of changed or deleted files are invalidated.
+    """
+    start_time = perf_counter()
+    extensions = [ext.strip() for ext in file_types.split(",")]
+
+    project, created = Project.objects.get_or_create(
+        name=project_name or repo_name(repo),
+        defaults={"root_path": str(resolve_remote(repo))},
+    )
+    if created:
+        logger.success(f"Created new project: {project.name}")
+
+    with TemporaryDirectory() as tmp_dir:
+        try:
+            repo_dir = open_repo(repo, tmp_dir, "" if full else project.last_commit)
+            stats = refresh_project(
+                project,
+                repo_dir,
+                rev=rev,
+                extensions=extensions,
+                batch_size=batch_size,
+                full=full,
+            )
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Error reading repository: {e}")
+            logger.error(f"Git output: {e.stderr}")
+            raise click.Abort()
+
+    elapsed = perf_counter() - start_time
+    logger.success(
+        f"Completed! {stats.new} new, {stats.updated} updated, "
+        f"{stats.deleted} deleted, {stats.unchanged} unchanged, {stats.skipped} skipped, "
+        f"{stats.invalidated_chunks} chunks invalidated "
+        f"in {elapsed:.2f}s ({stats.total / elapsed if elapsed else 0:.0f} files/sec)"
+    )
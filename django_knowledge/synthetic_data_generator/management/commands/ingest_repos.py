@@ -0,0 +1,181 @@
+import queue
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Optional
+
+import djclick as click
+from loguru import logger
+
+from code_fetching.git import repo_name, resolve_remote
+from synthetic_data_generator.ingestion import (
+    DEFAULT_BATCH_SIZE,
+    IngestStats,
+    delete_python_files,
+    finish_refresh,
+    known_blob_shas,
+    log_plan,
+    open_repo,
+    plan_refresh,
+    read_changed_blobs,
+    write_files,
+)
+from synthetic_data_generator.models import Project
+
+
+@dataclass
+class RepoJob:
+    repo: str
+    rev: str = "HEAD"
+    project_name: str = ""
+    project: Optional[Project] = None
+    known_shas: dict = field(default_factory=dict)
+    read_stats: IngestStats = field(default_factory=IngestStats)
+    write_stats: IngestStats = field(default_factory=IngestStats)
+    start_time: float = 0.0
+    elapsed: float = 0.0
+    error: str = ""
+
+
+def parse_manifest(path) -> list[RepoJob]:
+    """One repository per line: `<repo or path> [rev] [project name]`, `#` starts a comment."""
+    jobs = []
+    for line in Path(path).read_text().splitlines():
+        parts = line.split("#", 1)[0].split()
+        if parts:
+            jobs.append(RepoJob(*parts[:3]))
+    return jobs
+
+
+@click.command()
+@click.argument("manifest", required=False)
+@click.option(
+    "--repo",
+    "repos",
+    multiple=True,
+    help="Repository to ingest, in addition to the manifest",
+)
+@click.option(
+    "--workers", default=4, type=int, help="Number of repositories read concurrently"
+)
+@click.option(
+    "--file-types", default=".py", help="Comma-separated file extensions to ingest"
+)
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    type=int,
+    help="Number of files per batch handed to the database writer",
+)
+@click.option(
+    "--full",
+    is_flag=True,
+    help="Ingest whole trees even if the last ingested commits are known",
+)
+def command(manifest, repos, workers, file_types, batch_size, full=False):
+    """Ingest many repositories at once from git objects.
+
+    Clones and blob reads run in a pool of worker threads; the main thread is
+    the only database writer and receives file batches from the workers over
+    a bounded queue.
+    """
+    start_time = perf_counter()
+    extensions = [ext.strip() for ext in file_types.split(",")]
+    jobs = (parse_manifest(manifest) if manifest else []) + [RepoJob(r) for r in repos]
+    if not jobs:
+        raise click.UsageError("Give a manifest file or at least one --repo")
+
+    for job in jobs:
+        job.project, created = Project.objects.get_or_create(
+            name=job.project_name or repo_name(job.repo),
+            defaults={"root_path": str(resolve_remote(job.repo))},
+        )
+        if created:
+            logger.success(f"Created new project: {job.project.name}")
+        job.known_shas = known_blob_shas(job.project)
+
+    # Bounded so readers can't run arbitrarily far ahead of the writer
+    messages = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+
+    def put(message):
+        while not stop.is_set():
+            try:
+                messages.put(message, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise RuntimeError("Ingestion aborted")
+
+    def read_repo(job: RepoJob):
+        job.start_time = perf_counter()
+        last_commit = "" if full else job.project.last_commit
+        try:
+            with TemporaryDirectory() as tmp_dir:
+                repo_dir = open_repo(job.repo, tmp_dir, last_commit)
+                plan = plan_refresh(
+                    repo_dir, job.rev, last_commit, job.known_shas, extensions, full
+                )
+                log_plan(job.project.name, last_commit, plan)
+                put(("delete", job, plan.deleted))
+                for rows in read_changed_blobs(
+                    repo_dir, plan.changed, job.known_shas, job.read_stats, batch_size
+                ):
+                    put(("write", job, rows))
+            put(("done", job, plan))
+        except Exception as e:
+            if isinstance(e, subprocess.CalledProcessError):
+                e = f"{e}: {e.stderr}"
+            put(("error", job, e))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for job in jobs:
+            pool.submit(read_repo, job)
+
+        remaining = len(jobs)
+        try:
+            while remaining:
+                kind, job, payload = messages.get()
+                if kind == "delete":
+                    delete_python_files(job.project, payload, job.write_stats)
+                elif kind == "write":
+                    write_files(job.project, payload, job.write_stats)
+                else:
+                    if kind == "done":
+                        finish_refresh(job.project, payload)
+                    else:
+                        job.error = str(payload)
+                        logger.error(f"{job.repo}: {job.error}")
+                    job.elapsed = perf_counter() - job.start_time
+                    remaining -= 1
+        except BaseException:
+            # Unblock the readers so the pool can shut down
+            stop.set()
+            raise
+
+    total = IngestStats()
+    for job in jobs:
+        stats = job.write_stats
+        stats.merge(job.read_stats)
+        total.merge(stats)
+        if job.error:
+            logger.error(f"{job.project.name}: FAILED after {job.elapsed:.2f}s")
+            continue
+        logger.info(
+            f"{job.project.name}: {stats.new} new, {stats.updated} updated, "
+            f"{stats.deleted} deleted, {stats.unchanged} unchanged in {job.elapsed:.2f}s "
+            f"({stats.total / job.elapsed if job.elapsed else 0:.0f} files/sec)"
+        )
+
+    elapsed = perf_counter() - start_time
+    failed = sum(1 for job in jobs if job.error)
+    logger.success(
+        f"Completed {len(jobs) - failed}/{len(jobs)} repositories: {total.new} new, "
+        f"{total.updated} updated, {total.deleted} deleted, {total.unchanged} unchanged, "
+        f"{total.invalidated_chunks} chunks invalidated in {elapsed:.2f}s "
+        f"({total.total / elapsed if elapsed else 0:.0f} files/sec)"
+    )
@@ -0,0 +1,26 @@
+import djclick as click
+from loguru import logger
+
+from synthetic_data_generator.llm_usage import log_usage
+from synthetic_data_generator.models import LLMCall
+
+
+@click.command()
+@click.option("--run", "run_id", default=None, help="Only the calls of this describe_chunk run ID")
+@click.option("--model", "models", multiple=True, help="Only the calls to this model, repeat for several")
+def command(run_id=None, models=()):
+    """Token usage, latency and cost of the recorded LLM calls per model.
+
+    describe_chunk records every request, so runs of the same chunks with
+    different --model values can be compared on completion tokens/sec,
+    chunks/sec and cost.
+    """
+    calls = LLMCall.objects.all()
+    if run_id:
+        calls = calls.filter(run_id=run_id)
+    if models:
+        calls = calls.filter(model__in=models)
+    if not calls.exists():
+        logger.warning("No LLM calls recorded. Please run describe_chunk first.")
+        return
+    log_usage(calls)
@@ -5,19 +5,36 @@ from django.db import transaction
 import djclick as click
 from loguru import logger
 
-from synthetic_data_generator.models import PythonFile, Project
-
+from synthetic_data_generator.ingestion import (
+    DEFAULT_BATCH_SIZE,
+    FileRow,
+    IngestStats,
+    content_hash,
+    delete_python_files,
+    known_content_hashes,
+    write_files,
+)
+from synthetic_data_generator.models import Project
+from synthetic_data_generator.walking import DEFAULT_READ_WORKERS, read_files, walk_files
 
 
 @click.command()
 @click.argument('path')
 @click.option('--delete', is_flag=True, help='Delete the directory after loading Python modules into database')
-def command(path, delete: bool=False):
-    """Recursively traverse the given path and store Python files in the database."""
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, type=int, help='Number of files written per batch')
+@click.option('--workers', default=DEFAULT_READ_WORKERS, type=int, help='Number of threads reading files')
+@click.option('--no-gitignore', is_flag=True, help='Also load files matched by .gitignore')
+def command(path, delete: bool=False, batch_size: int=DEFAULT_BATCH_SIZE, workers: int=DEFAULT_READ_WORKERS, no_gitignore: bool=False):
+    """Recursively traverse the given path and store Python files in the database.
+
+    Virtual environments, VCS and cache directories and anything matched by a
+    .gitignore are skipped without being descended into. Only new and changed
+    files are written, compared by content hash, and files that no longer
+    exist under the path are removed with their chunks.
+    """
     logger.info(f"Starting traversal of path: {path}")
     
-    python_files_found = 0
-    python_files_stored = 0
+    stats = IngestStats()
     
     try:
         with transaction.atomic():
@@ -31,42 +48,48 @@ def command(path, delete: bool=False):
             if created:
                 logger.success(f"Created new project: {project_name}")
             
-            for python_file_path in find_python_files(Path(path)):
-                python_files_found += 1
+            # One query for what is stored already, files are then only compared by hash
+            known_hashes = known_content_hashes(project)
+            seen = set()
+            rows = []
+            
+            python_file_paths = walk_files(Path(path), respect_gitignore=not no_gitignore)
+            for result in read_files(python_file_paths, workers=workers):
+                python_file_path, content = result.path, result.content
                 
                 # Convert to relative path for storage
                 relative_path = str(python_file_path.relative_to(Path(path)))
+                seen.add(relative_path)
                 
-                # Read file content
-                try:
-                    with open(python_file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                except UnicodeDecodeError:
+                if isinstance(result.error, UnicodeDecodeError):
                     logger.warning(f"Skipping binary file: {python_file_path}")
+                    stats.skipped += 1
                     continue
-                except Exception as e:
-                    logger.error(f"Error reading file {python_file_path}: {e}")
+                elif result.error is not None:
+                    logger.error(f"Error reading file {python_file_path}: {result.error}")
+                    stats.skipped += 1
                     continue
                 
-                # Store in database
-                python_file, created = PythonFile.objects.update_or_create(
-                    module_path=relative_path,
-                    defaults={'content': content, 'project': project}
-                )
+                if known_hashes.get(relative_path) == content_hash(content):
+                    stats.unchanged += 1
+                    continue
                 
-                if created:
-                    python_files_stored += 1
-                    logger.success(f"Stored: {relative_path}")
-                else:
-                    logger.info(f"Updated: {relative_path}")
+                rows.append(FileRow(relative_path, content))
+                if len(rows) == batch_size:
+                    write_files(project, rows, stats)
+                    rows = []
+            
+            write_files(project, rows, stats)
+            delete_python_files(project, sorted(set(known_hashes) - seen), stats)
     
     except Exception as e:
         logger.error(f"Error during traversal: {e}")
         return
     
     logger.success(
-        f"Completed! Found {python_files_found} Python files, "
-        f"stored {python_files_stored} new files."
+        f"Completed! {stats.unchanged} unchanged, {stats.new} new, "
+        f"{stats.updated} changed, {stats.deleted} removed, {stats.skipped} skipped, "
+        f"{stats.invalidated_chunks} chunks invalidated."
     )
     
     if delete:
@@ -79,20 +102,3 @@ def command(path, delete: bool=False):
                 logger.warning(f"Directory not found or not a directory: {project_path}")
         except Exception as e:
             logger.error(f"Error deleting directory {path}: {e}")
-
-def find_python_files(path):
-    """Generator that yields all Python files in the given path recursively, skipping virtual env directories."""
-    # Common virtual environment directory names
-    venv_dirs = {'venv', '.venv', 'env', '.env', 'virtualenv', '.virtualenv', 'envs', '.envs'}
-    
-    for item in path.rglob('*.py'):
-        if item.is_file():
-            # Check if any parent directory is a virtual environment directory
-            skip_file = False
-            for parent in item.parents:
-                if parent.name in venv_dirs:
-                    skip_file = True
-                    break
-            
-            if not skip_file:
-                yield item
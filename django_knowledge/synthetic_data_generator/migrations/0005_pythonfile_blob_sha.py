@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthetic_data_generator', '0004_remove_chunkdescription_chunk_delete_chunk_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pythonfile',
+            name='blob_sha',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthetic_data_generator', '0005_pythonfile_blob_sha'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='last_commit',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthetic_data_generator', '0006_project_last_commit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pythonfile',
+            name='num_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='cl100k_base token count of content', null=True),
+        ),
+    ]
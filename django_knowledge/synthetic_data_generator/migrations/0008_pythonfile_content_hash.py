@@ -0,0 +1,33 @@
+# Generated by Django 6.1.2 on 2026-10-19 11:30
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_content_hashes(apps, schema_editor):
+    PythonFile = apps.get_model('synthetic_data_generator', 'PythonFile')
+    batch = []
+    for pk, content in PythonFile.objects.values_list('pk', 'content').iterator(chunk_size=500):
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        batch.append(PythonFile(pk=pk, content_hash=digest))
+        if len(batch) == 500:
+            PythonFile.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    PythonFile.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthetic_data_generator', '0007_pythonfile_num_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pythonfile',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='sha256 hex digest of content', max_length=64),
+        ),
+        migrations.RunPython(fill_content_hashes, migrations.RunPython.noop),
+    ]
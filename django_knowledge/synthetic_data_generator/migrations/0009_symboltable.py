@@ -0,0 +1,30 @@
+# Generated by Django 6.1.2 on 2026-10-19 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthetic_data_generator', '0008_pythonfile_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SymbolTable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('version', models.PositiveSmallIntegerField()),
+                ('symbols', models.JSONField(default=list, help_text='One [kind, name, start_line, end_line, signature, docstring] list per symbol')),
+                ('imports', models.JSONField(default=list)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Symbol Table',
+                'verbose_name_plural': 'Symbol Tables',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.1.2 on 2026-10-19 11:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthetic_data_generator', '0009_symboltable'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=200)),
+                ('template_version', models.PositiveSmallIntegerField()),
+                ('content_hash', models.CharField(help_text='sha256 hex digest of the described code', max_length=64)),
+                ('temperature', models.FloatField()),
+                ('response', models.TextField(help_text='The validated response as JSON')),
+                ('size', models.PositiveIntegerField(help_text='Length of the response, what eviction budgets')),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'LLM Response',
+                'verbose_name_plural': 'LLM Responses',
+                'constraints': [models.UniqueConstraint(fields=('model', 'template_version', 'content_hash', 'temperature'), name='unique_llm_response')],
+            },
+        ),
+    ]
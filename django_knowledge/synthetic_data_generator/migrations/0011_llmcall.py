@@ -0,0 +1,33 @@
+# Generated by Django 6.1.2 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthetic_data_generator', '0010_llmresponse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_id', models.UUIDField(db_index=True, help_text='The describe_chunk run that made the call')),
+                ('model', models.CharField(max_length=200)),
+                ('num_chunks', models.PositiveIntegerField(default=1, help_text='Chunks described by the request')),
+                ('prompt_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('completion_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('max_tokens', models.PositiveIntegerField(help_text='Completion budget of the request')),
+                ('latency', models.FloatField(help_text='Seconds from sending the request to its response')),
+                ('finish_reason', models.CharField(blank=True, default='', max_length=32)),
+                ('cost', models.FloatField(blank=True, help_text="USD, for models in litellm's cost map", null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'LLM Call',
+                'verbose_name_plural': 'LLM Calls',
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.1.2 on 2026-10-19 12:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('synthetic_data_generator', '0011_llmcall'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pythonfile',
+            name='module_path',
+            field=models.CharField(max_length=500),
+        ),
+        migrations.AddConstraint(
+            model_name='pythonfile',
+            constraint=models.UniqueConstraint(fields=('project', 'module_path'), name='unique_project_module_path'),
+        ),
+    ]
@@ -1,9 +1,13 @@
 from django.db import models
+from django.utils import timezone
+
+from synthetic_data_generator.symbols import Symbol
 
 
 class Project(models.Model):
     name = models.CharField(max_length=100)
     root_path = models.CharField(max_length=500)
+    last_commit = models.CharField(max_length=64, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -18,13 +22,103 @@ class Project(models.Model):
 class PythonFile(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     content = models.TextField()
-    module_path = models.CharField(max_length=500, unique=True)
+    module_path = models.CharField(max_length=500)
+    blob_sha = models.CharField(max_length=64, blank=True, default="")
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        db_index=True,
+        help_text="sha256 hex digest of content",
+    )
+    num_tokens = models.PositiveIntegerField(
+        null=True, blank=True, help_text="cl100k_base token count of content"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Python File"
         verbose_name_plural = "Python Files"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["project", "module_path"], name="unique_project_module_path"
+            )
+        ]
 
     def __str__(self):
         return f"{self.project.name} - {self.module_path}"
+
+
+class SymbolTable(models.Model):
+    """Symbols and imports of a module, shared by every PythonFile with the same content."""
+
+    content_hash = models.CharField(max_length=64, unique=True)
+    version = models.PositiveSmallIntegerField()
+    symbols = models.JSONField(
+        default=list,
+        help_text="One [kind, name, start_line, end_line, signature, docstring] list per symbol",
+    )
+    imports = models.JSONField(default=list)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Symbol Table"
+        verbose_name_plural = "Symbol Tables"
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({len(self.symbols)} symbols)"
+
+    def get_symbols(self) -> list[Symbol]:
+        return [Symbol(*row) for row in self.symbols]
+
+
+class LLMResponse(models.Model):
+    """A cached chunk description response, keyed by everything that determines the prompt and sampling."""
+
+    model = models.CharField(max_length=200)
+    template_version = models.PositiveSmallIntegerField()
+    content_hash = models.CharField(max_length=64, help_text="sha256 hex digest of the described code")
+    temperature = models.FloatField()
+    response = models.TextField(help_text="The validated response as JSON")
+    size = models.PositiveIntegerField(help_text="Length of the response, what eviction budgets")
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "LLM Response"
+        verbose_name_plural = "LLM Responses"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["model", "template_version", "content_hash", "temperature"],
+                name="unique_llm_response",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.model}:{self.content_hash[:12]} ({self.hits} hits)"
+
+
+class LLMCall(models.Model):
+    """Token usage and latency of one LLM request, to compare the throughput and cost of models."""
+
+    run_id = models.UUIDField(db_index=True, help_text="The describe_chunk run that made the call")
+    model = models.CharField(max_length=200)
+    num_chunks = models.PositiveIntegerField(default=1, help_text="Chunks described by the request")
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    completion_tokens = models.PositiveIntegerField(null=True, blank=True)
+    max_tokens = models.PositiveIntegerField(help_text="Completion budget of the request")
+    latency = models.FloatField(help_text="Seconds from sending the request to its response")
+    finish_reason = models.CharField(max_length=32, blank=True, default="")
+    cost = models.FloatField(null=True, blank=True, help_text="USD, for models in litellm's cost map")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "LLM Call"
+        verbose_name_plural = "LLM Calls"
+
+    def __str__(self):
+        return f"{self.model} ({self.prompt_tokens}+{self.completion_tokens} tokens, {self.latency:.2f}s)"
@@ -0,0 +1,132 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
+from synthetic_data_generator.ingestion import DEFAULT_BATCH_SIZE, content_hash
+from synthetic_data_generator.models import PythonFile, SymbolTable
+from synthetic_data_generator.symbols import (
+    SYMBOL_TABLE_VERSION,
+    ParsedModule,
+    index_source,
+)
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Sources sent to a worker process per task, to keep pickling overhead low
+SOURCES_PER_TASK = 32
+
+
+def current_tables():
+    return SymbolTable.objects.filter(version=SYMBOL_TABLE_VERSION)
+
+
+def file_hash(python_file: PythonFile) -> str:
+    return python_file.content_hash or content_hash(python_file.content)
+
+
+def unindexed_sources(python_files) -> Iterator[tuple[str, str]]:
+    """(content_hash, content) of every distinct content without an up-to-date symbol table."""
+    indexed = current_tables().values("content_hash")
+    rows = (
+        python_files.exclude(content_hash__in=indexed)
+        .values_list("content_hash", "content")
+        .iterator(chunk_size=DEFAULT_BATCH_SIZE)
+    )
+    seen = set()
+    for stored_hash, content in rows:
+        key = stored_hash or content_hash(content)
+        if key not in seen:
+            seen.add(key)
+            yield key, content
+
+
+def parse_batch(items: list[tuple[str, str]]) -> list[tuple[str, ParsedModule]]:
+    return [index_source(item) for item in items]
+
+
+def parse_sources(
+    sources: Iterable[tuple[str, str]], workers: int = DEFAULT_WORKERS
+) -> Iterator[tuple[str, ParsedModule]]:
+    """Parse sources in a process pool, with a bounded number of batches in flight."""
+    batches = batched(sources, SOURCES_PER_TASK)
+    if workers <= 1:
+        for batch in batches:
+            yield from parse_batch(batch)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(parse_batch, batch))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def save_tables(parsed: Iterable[tuple[str, ParsedModule]]) -> int:
+    """Store symbol tables in batches, replacing tables built by an older extractor version."""
+    stored = 0
+    for batch in batched(parsed, DEFAULT_BATCH_SIZE):
+        SymbolTable.objects.bulk_create(
+            [
+                SymbolTable(
+                    content_hash=key,
+                    version=SYMBOL_TABLE_VERSION,
+                    error=module.error,
+                    **module.to_json(),
+                )
+                for key, module in batch
+            ],
+            update_conflicts=True,
+            unique_fields=["content_hash"],
+            update_fields=["version", "symbols", "imports", "error", "updated_at"],
+        )
+        stored += len(batch)
+    return stored
+
+
+def index_symbols(python_files=None, workers: int = DEFAULT_WORKERS) -> int:
+    """Build the missing symbol tables of `python_files` (default: all), returning how many were built."""
+    if python_files is None:
+        python_files = PythonFile.objects.all()
+    return save_tables(parse_sources(unindexed_sources(python_files), workers))
+
+
+def get_symbol_tables(python_files: Iterable[PythonFile]) -> dict[int, SymbolTable]:
+    """Symbol tables by PythonFile id, parsing (and storing) only the ones not cached yet."""
+    python_files = list(python_files)
+    hashes = {python_file.id: file_hash(python_file) for python_file in python_files}
+    tables = current_tables().in_bulk(set(hashes.values()), field_name="content_hash")
+
+    missing = {
+        hashes[python_file.id]: python_file.content
+        for python_file in python_files
+        if hashes[python_file.id] not in tables
+    }
+    if missing:
+        save_tables(index_source(item) for item in missing.items())
+        tables.update(current_tables().in_bulk(list(missing), field_name="content_hash"))
+    return {file_id: tables[key] for file_id, key in hashes.items()}
+
+
+def get_symbol_table(python_file: PythonFile) -> SymbolTable:
+    return get_symbol_tables([python_file])[python_file.id]
+
+
+def prune_symbol_tables() -> int:
+    """Delete tables no PythonFile has the content of anymore."""
+    used = PythonFile.objects.values("content_hash")
+    deleted, _ = SymbolTable.objects.exclude(content_hash__in=used).delete()
+    return deleted
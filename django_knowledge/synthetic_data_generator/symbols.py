@@ -0,0 +1,122 @@
+import ast
+from dataclasses import astuple, dataclass
+from typing import Optional
+
+# Bump when extract_symbols changes what it produces, so stored tables are rebuilt
+SYMBOL_TABLE_VERSION = 1
+
+
+@dataclass
+class Symbol:
+    kind: str  # "class", "function" or "method"
+    name: str  # Dotted qualified name, e.g. "Model.save"
+    start_line: int  # 1-based, including decorators
+    end_line: int  # 1-based, inclusive
+    signature: str
+    docstring: str
+
+
+@dataclass
+class ParsedModule:
+    symbols: list[Symbol]
+    imports: list[str]
+    error: str = ""
+
+    def to_json(self) -> dict:
+        # Symbols are stored as lists in field order rather than as dicts, to keep rows small
+        return {
+            "symbols": [list(astuple(symbol)) for symbol in self.symbols],
+            "imports": self.imports,
+        }
+
+
+def signature(node) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases]
+        bases += [ast.unparse(keyword) for keyword in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def import_names(node) -> list[str]:
+    """Fully qualified names an import statement binds, relative ones keep their leading dots."""
+    if isinstance(node, ast.Import):
+        return [alias.name for alias in node.names]
+    module = "." * node.level + (node.module or "")
+    separator = "" if module.endswith(".") or not module else "."
+    return [f"{module}{separator}{alias.name}" for alias in node.names]
+
+
+def extract_symbols(source: str) -> ParsedModule:
+    """Classes, functions and methods with their line ranges, plus every import of a module."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError, MemoryError, RecursionError) as e:
+        # Unparsable or too deeply nested for the parser
+        return ParsedModule(symbols=[], imports=[], error=f"{type(e).__name__}: {e}")
+    return symbols_of_tree(tree)
+
+
+def symbols_of_tree(tree: ast.Module) -> ParsedModule:
+    """extract_symbols of an already parsed module."""
+    symbols, imports = [], []
+
+    def visit(node, scope: list[str], in_class: bool):
+        for child in ast.iter_child_nodes(node):
+            # Definitions and imports only occur in statements, so expressions are skipped
+            if not isinstance(child, (ast.stmt, ast.excepthandler, ast.match_case)):
+                continue
+            if isinstance(child, (ast.Import, ast.ImportFrom)):
+                imports.extend(import_names(child))
+            elif isinstance(child, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                if isinstance(child, ast.ClassDef):
+                    kind = "class"
+                else:
+                    kind = "method" if in_class else "function"
+                start_line = min(
+                    [child.lineno] + [d.lineno for d in child.decorator_list]
+                )
+                symbols.append(
+                    Symbol(
+                        kind=kind,
+                        name=".".join(scope + [child.name]),
+                        start_line=start_line,
+                        end_line=child.end_lineno,
+                        signature=signature(child),
+                        docstring=ast.get_docstring(child) or "",
+                    )
+                )
+                visit(child, scope + [child.name], isinstance(child, ast.ClassDef))
+            else:
+                visit(child, scope, in_class)
+
+    visit(tree, [], False)
+    return ParsedModule(symbols=symbols, imports=list(dict.fromkeys(imports)))
+
+
+def index_source(item: tuple[str, str]) -> tuple[str, ParsedModule]:
+    """Parse one (content_hash, source) pair, for use with a process pool."""
+    content_hash, source = item
+    return content_hash, extract_symbols(source)
+
+
+def innermost_symbol(symbols: list[Symbol], line: int) -> Optional[Symbol]:
+    """The most deeply nested symbol whose line range contains `line`."""
+    best = None
+    for symbol in symbols:
+        if symbol.start_line <= line <= symbol.end_line:
+            if best is None or symbol.start_line >= best.start_line:
+                best = symbol
+    return best
+
+
+def symbols_in_range(symbols: list[Symbol], start_line: int, end_line: int) -> list[Symbol]:
+    """Symbols that overlap the given line range."""
+    return [
+        symbol
+        for symbol in symbols
+        if symbol.start_line <= end_line and symbol.end_line >= start_line
+    ]
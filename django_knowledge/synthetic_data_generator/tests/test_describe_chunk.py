@@ -0,0 +1,197 @@
+import asyncio
+import json
+import re
+from time import monotonic
+from types import SimpleNamespace
+
+from django.core.management import call_command
+from litellm.exceptions import RateLimitError
+
+from chunking.models import Chunk, ChunkDescription
+from synthetic_data_generator import chunk_describe, llm_pacing
+from synthetic_data_generator.chunk_describe import BatchDescriptions, CodeDescriptions
+from synthetic_data_generator.llm_pacing import TokenBucket, retry_rate_limited
+from synthetic_data_generator.llm_usage import usage_by_model
+from synthetic_data_generator.models import LLMCall
+
+
+def test_token_bucket_paces_after_the_burst():
+    async def take_all():
+        bucket = TokenBucket(per_minute=600, capacity=2)
+        start = monotonic()
+        for _ in range(5):
+            await bucket.take()
+        return monotonic() - start
+
+    # Two from the burst, then one every 0.1s
+    assert 0.25 < asyncio.run(take_all()) < 1
+
+
+def test_rate_limited_calls_are_retried(monkeypatch):
+    monkeypatch.setattr(llm_pacing, "backoff_delay", lambda attempt, *args: 0)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimitError(message="slow down", llm_provider="groq", model="m")
+        return "ok"
+
+    assert asyncio.run(retry_rate_limited(call)) == "ok"
+    assert len(attempts) == 3
+
+
+def test_concurrent_descriptions_match_serial(make_chunks, monkeypatch):
+    contents = [f"x = {i % 7}\n" for i in range(30)]
+    make_chunks(contents)
+
+    requested, in_flight, most_in_flight = [], set(), []
+
+    async def fake_descriptions(code, model, limiter=None, **kwargs):
+        requested.append(code)
+        in_flight.add(code)
+        most_in_flight.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.discard(code)
+        return CodeDescriptions(descriptions=[f"sets {code.strip()}", "assigns"])
+
+    monkeypatch.setattr(chunk_describe, "agenerate_chunk_descriptions", fake_descriptions)
+    call_command("describe_chunk", "--concurrency", "4", "--requests-per-minute", "6000")
+
+    # Each content is requested once, with several requests overlapping
+    assert sorted(requested) == sorted(set(contents))
+    assert 1 < max(most_in_flight) <= 4
+    for chunk in Chunk.objects.all():
+        assert list(chunk.descriptions.values_list("description", flat=True)) == [
+            f"sets {chunk.content.strip()}",
+            "assigns",
+        ]
+    assert ChunkDescription.objects.count() == 60
+
+
+def completion_response(payload):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(payload)))])
+
+
+def test_batches_resend_only_the_chunks_that_failed(make_chunks, monkeypatch):
+    chunks = make_chunks([f"y = {i}\n" for i in range(10)])
+    requests = []
+
+    def fake_completion(model, messages, response_format, **kwargs):
+        if response_format is BatchDescriptions:
+            chunk_ids = [int(i) for i in re.findall(r"Chunk (\d+):", messages[-1]["content"])]
+            requests.append(chunk_ids)
+            entries = [{"chunk_id": i, "descriptions": [f"batch {i}"]} for i in chunk_ids]
+            # One entry fails validation and one is missing
+            entries[0]["descriptions"] = []
+            return completion_response({"chunks": entries[:-1]})
+        requests.append("single")
+        return completion_response({"descriptions": ["single"]})
+
+    monkeypatch.setattr(chunk_describe.litellm, "completion", fake_completion)
+    call_command("describe_chunk", "--batch-tokens", "1000", "--batch-size", "5")
+
+    ids = [chunk.id for chunk in chunks]
+    assert requests == [ids[:5], "single", "single", ids[5:], "single", "single"]
+    described = {
+        chunk_id: description
+        for chunk_id, description in ChunkDescription.objects.values_list("chunk_id", "description")
+    }
+    assert described == {
+        chunk_id: "single" if i % 5 in (0, 4) else f"batch {chunk_id}"
+        for i, chunk_id in enumerate(ids)
+    }
+
+
+def test_queries_do_not_grow_with_the_number_of_chunks(make_chunks, monkeypatch, django_assert_max_num_queries):
+    chunks = make_chunks([f"z = {i % 50}\n" for i in range(200)])
+    for chunk in chunks[:20]:
+        ChunkDescription.objects.create(chunk=chunk, description="old")
+    monkeypatch.setattr(
+        chunk_describe,
+        "generate_chunk_descriptions",
+        lambda code, model, **kwargs: CodeDescriptions(descriptions=[f"sets {code.strip()}"]),
+    )
+
+    with django_assert_max_num_queries(20):
+        call_command("describe_chunk")
+    assert ChunkDescription.objects.count() == 200
+    # The cache is looked up for all chunks at once too
+    with django_assert_max_num_queries(20):
+        call_command("describe_chunk", "--clear-existing")
+    assert ChunkDescription.objects.count() == 200
+
+
+def test_prompts_elide_long_literals_and_fit_the_budget():
+    code = (
+        "DATA = [" + ", ".join(str(i) for i in range(500)) + "]\n"
+        'SQL = "' + "select * from t " * 40 + '"\n'
+        "def f(a):\n    return g(a, [1, 2])\n"
+    )
+    elided = chunk_describe.elide_literals(code)
+    assert elided.startswith("DATA = [0, 1, 2") and "chars elided>]\nSQL = \"select" in elided
+    assert elided.endswith('chars elided>"\ndef f(a):\n    return g(a, [1, 2])\n')
+    assert len(elided) < 400
+
+    # Oversized code keeps its first and last lines, small codes are left whole
+    big = "".join(f"line_{i} = {i}\n" for i in range(1000))
+    fitted = chunk_describe.fit_codes({1: "a = 1\n", 2: big}, max_tokens=500)
+    assert fitted[1] == "a = 1\n"
+    assert fitted[2].startswith("line_0 = 0\n") and fitted[2].endswith("line_999 = 999\n")
+    assert "lines elided ..." in fitted[2]
+    assert chunk_describe.approx_tokens(fitted[1] + fitted[2]) <= 500
+
+
+def test_prompts_stay_within_the_budget_when_it_runs_out():
+    codes = {i: "".join(f"value_{i}_{j} = {j}\n" for j in range(50)) for i in range(20)}
+    fitted = chunk_describe.fit_codes(codes, max_tokens=60)
+    assert sum(chunk_describe.approx_tokens(code) for code in fitted.values()) <= 60
+    assert any(code == "" for code in fitted.values())
+
+    assert chunk_describe.truncate_code("a" * 100, -5) == ""
+    assert chunk_describe.truncate_code("a" * 100, 3) == ""
+    truncated = chunk_describe.truncate_code("a" * 100, 15)
+    assert truncated.startswith("aaa") and chunk_describe.approx_tokens(truncated) <= 15
+
+
+def test_prompts_are_measured_with_the_model_encoding():
+    # The encoding of the fake counts words, characters/4 is the fallback
+    assert chunk_describe.token_counter("groq/openai/gpt-oss-120b")(["x = 1\n"]) == [3]
+    assert chunk_describe.token_counter("lm_studio/mistralai/ministral-3-14b")(["x = 1\n"]) == [2]
+
+    count_tokens_many = chunk_describe.token_counter("gpt-4o")
+    code = "".join(f"value_{j} = {j}\n" for j in range(100))
+    fitted = chunk_describe.fit_code(code, 60, count_tokens_many)
+    assert 50 < count_tokens_many([fitted])[0] <= 60
+    assert chunk_describe.approx_tokens(fitted) > 60
+
+
+def test_calls_record_usage_and_retry_truncated_responses(make_chunks, monkeypatch):
+    make_chunks(["x = 1\n"])
+    max_tokens = []
+
+    def fake_completion(model, messages, **kwargs):
+        max_tokens.append(kwargs["max_tokens"])
+        content = {"descriptions": ["sets x"]} if len(max_tokens) > 1 else {"descriptions": ["se"]}
+        resp = completion_response(content)
+        resp.choices[0].finish_reason = "stop" if len(max_tokens) > 1 else "length"
+        resp.usage = SimpleNamespace(prompt_tokens=120, completion_tokens=len(max_tokens) * 10)
+        return resp
+
+    monkeypatch.setattr(chunk_describe.litellm, "completion", fake_completion)
+    call_command("describe_chunk", "--max-completion-tokens", "800")
+
+    # The scaled budget is cut short, then the full one is used
+    assert max_tokens == [chunk_describe.completion_tokens("x = 1\n", 800), 800]
+    assert list(ChunkDescription.objects.values_list("description", flat=True)) == ["sets x"]
+    calls = LLMCall.objects.order_by("id")
+    assert [(c.finish_reason, c.prompt_tokens, c.completion_tokens) for c in calls] == [
+        ("length", 120, 10),
+        ("stop", 120, 20),
+    ]
+    assert len({c.run_id for c in calls}) == 1
+    assert all(c.model == "groq/openai/gpt-oss-120b" and c.latency >= 0 for c in calls)
+
+    [row] = usage_by_model(LLMCall.objects.all())
+    assert (row["calls"], row["chunks"], row["completion_tokens"], row["truncated"]) == (2, 2, 30, 1)
+    call_command("llm_usage", "--model", "groq/openai/gpt-oss-120b")
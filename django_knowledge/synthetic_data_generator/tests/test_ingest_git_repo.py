@@ -0,0 +1,115 @@
+from django.core.management import call_command
+
+from code_fetching.git import iter_blobs, ls_tree, run_git
+from synthetic_data_generator.models import Project, PythonFile
+
+
+def test_ls_tree_and_iter_blobs(git_repo):
+    entries = ls_tree(git_repo, "HEAD", [".py"])
+    assert sorted(e.path for e in entries) == [
+        "pkg/__init__.py",
+        "pkg/models.py",
+        "pkg/sub/views.py",
+    ]
+    blobs = dict(iter_blobs(git_repo, [e.sha for e in entries]))
+    by_path = {e.path: blobs[e.sha] for e in entries}
+    assert by_path["pkg/models.py"] == b"class Model:\n    pass\n"
+
+
+def test_ingest_without_checkout(db, git_repo, tmp_path, git_commit):
+    bare = tmp_path / "bare.git"
+    run_git("clone", "--quiet", "--bare", str(git_repo), str(bare))
+
+    call_command("ingest_git_repo", str(bare), "--project-name", "sample")
+
+    project = Project.objects.get(name="sample")
+    files = {pf.module_path: pf for pf in PythonFile.objects.filter(project=project)}
+    assert set(files) == {"pkg/__init__.py", "pkg/models.py", "pkg/sub/views.py"}
+    assert files["pkg/sub/views.py"].content == "def view():\n    return 1\n"
+    # Counted while written, here by the whitespace encoding of the tests
+    assert files["pkg/sub/views.py"].num_tokens == 4
+    assert files["pkg/sub/views.py"].blob_sha == run_git(
+        "rev-parse", "HEAD:pkg/sub/views.py", cwd=bare
+    ).strip()
+
+    (git_repo / "pkg" / "models.py").write_text("class Model:\n    name = 1\n")
+    git_commit(git_repo, "change model")
+    untouched = files["pkg/sub/views.py"].updated_at
+
+    call_command("ingest_git_repo", str(git_repo), "--project-name", "sample")
+
+    assert PythonFile.objects.get(module_path="pkg/models.py").content == (
+        "class Model:\n    name = 1\n"
+    )
+    assert PythonFile.objects.get(module_path="pkg/models.py").num_tokens == 5
+    assert PythonFile.objects.get(module_path="pkg/sub/views.py").updated_at == untouched
+
+
+def test_incremental_refresh_touches_only_changed_files(db, git_repo, git_commit):
+    from chunking.models import Chunk, ChunkDescription
+
+    call_command("ingest_git_repo", str(git_repo), "--project-name", "sample")
+    project = Project.objects.get(name="sample")
+    first_commit = run_git("rev-parse", "HEAD", cwd=git_repo).strip()
+    assert project.last_commit == first_commit
+
+    for pf in PythonFile.objects.all():
+        chunk = Chunk.objects.create(python_file=pf, content=pf.content)
+        ChunkDescription.objects.create(chunk=chunk, description="desc")
+    untouched = PythonFile.objects.get(module_path="pkg/sub/views.py").updated_at
+
+    (git_repo / "pkg" / "models.py").write_text("class Model:\n    name = 1\n")
+    (git_repo / "pkg" / "__init__.py").unlink()
+    (git_repo / "pkg" / "new.py").write_text("NEW = True\n")
+    second_commit = git_commit(git_repo, "second")
+
+    call_command("ingest_git_repo", str(git_repo), "--project-name", "sample")
+
+    project.refresh_from_db()
+    assert project.last_commit == second_commit
+    assert set(PythonFile.objects.values_list("module_path", flat=True)) == {
+        "pkg/models.py",
+        "pkg/new.py",
+        "pkg/sub/views.py",
+    }
+    assert PythonFile.objects.get(module_path="pkg/sub/views.py").updated_at == untouched
+    assert list(
+        Chunk.objects.values_list("python_file__module_path", flat=True)
+    ) == ["pkg/sub/views.py"]
+    assert ChunkDescription.objects.count() == 1
+
+
+def test_ingest_repos_from_manifest(db, git_repo, tmp_path):
+    other = tmp_path / "other_repo"
+    run_git("clone", "--quiet", str(git_repo), str(other))
+    # Both repositories have pkg/__init__.py and pkg/models.py
+    (other / "pkg" / "models.py").write_text("class Other:\n    pass\n")
+    (other / "pkg" / "sub").rename(other / "lib")
+    run_git("add", "-A", cwd=other)
+    run_git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "x", cwd=other)
+
+    manifest = tmp_path / "repos.txt"
+    manifest.write_text(
+        f"# repositories to ingest\n{git_repo} HEAD first\n{other.as_uri()}  HEAD  second\n"
+    )
+    call_command("ingest_repos", str(manifest), "--workers", "2", "--batch-size", "1")
+
+    def files(name):
+        return dict(
+            PythonFile.objects.filter(project__name=name).values_list("module_path", "content")
+        )
+
+    first = files("first")
+    assert set(first) == {"pkg/__init__.py", "pkg/models.py", "pkg/sub/views.py"}
+    assert first["pkg/models.py"] == "class Model:\n    pass\n"
+    second = files("second")
+    assert set(second) == {"pkg/__init__.py", "pkg/models.py", "lib/views.py"}
+    assert second["pkg/models.py"] == "class Other:\n    pass\n"
+    assert Project.objects.get(name="second").last_commit == run_git(
+        "rev-parse", "HEAD", cwd=other
+    ).strip()
+
+    # Ingesting again leaves both projects whole
+    call_command("ingest_repos", str(manifest), "--full")
+    assert files("first") == first
+    assert files("second") == second
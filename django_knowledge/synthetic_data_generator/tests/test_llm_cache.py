@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from chunking.models import ChunkDescription
+from synthetic_data_generator import chunk_describe
+from synthetic_data_generator.chunk_describe import CodeDescriptions
+from synthetic_data_generator.llm_cache import DescriptionCache
+from synthetic_data_generator.models import LLMResponse
+
+
+def test_rerun_after_clearing_is_served_from_the_cache(make_chunks, monkeypatch):
+    make_chunks(["a = 1\n", "b = 2\n", "a = 1\n"])
+    described = []
+
+    def fake_descriptions(code, model, **kwargs):
+        described.append(code)
+        return CodeDescriptions(descriptions=[f"sets {code.strip()}"])
+
+    monkeypatch.setattr(chunk_describe, "generate_chunk_descriptions", fake_descriptions)
+    call_command("describe_chunk")
+    assert described == ["a = 1\n", "b = 2\n"]
+
+    call_command("describe_chunk", "--clear-existing")
+    assert described == ["a = 1\n", "b = 2\n"]
+    assert ChunkDescription.objects.count() == 3
+    assert LLMResponse.objects.get(response__contains="a = 1").hits == 1
+
+    # Another model is a different key
+    call_command("describe_chunk", "--clear-existing", "--model", "other")
+    assert described == ["a = 1\n", "b = 2\n"] * 2
+
+
+def test_keys_and_eviction(db):
+    cache = DescriptionCache("m", max_bytes=100)
+    codes = {i: f"x = {i}\n" for i in range(5)}
+    cache.put_many(codes, {i: CodeDescriptions(descriptions=["d" * 20]) for i in codes})
+    cache.flush()
+    assert set(cache.get_many({0: "x = 0\n", 9: "y\n"})) == {0}
+    assert DescriptionCache("m", temperature=1.0).get_many(codes) == {}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Each response is 41 bytes, so two fit; the least recently used go first
+    now = timezone.now()
+    for i, entry_id in enumerate(LLMResponse.objects.order_by("id").values_list("id", flat=True)):
+        LLMResponse.objects.filter(id=entry_id).update(last_used_at=now - timedelta(minutes=10 - i))
+    assert {entry.size for entry in LLMResponse.objects.all()} == {41}
+    assert cache.evict() == 3
+    assert set(cache.get_many(codes)) == {3, 4}
+
+
+
+def test_keys_depend_on_the_code_the_prompt_shows(db):
+    code = "".join(f"line_{i} = {i}\n" for i in range(400))
+    cache = DescriptionCache("m", prompt_tokens=100)
+    cache.put_many({1: code}, {1: CodeDescriptions(descriptions=["d"])})
+    cache.flush()
+
+    # Another budget trims the code differently
+    assert set(DescriptionCache("m", prompt_tokens=100).get_many({1: code})) == {1}
+    assert DescriptionCache("m", prompt_tokens=200).get_many({1: code}) == {}
+
+    # Chunks trimmed further to share a batch request are not stored
+    codes = {1: code, 2: code.replace("line", "other"), 3: "x = 1\n"}
+    cache = DescriptionCache("m", prompt_tokens=300)
+    cache.put_many(codes, {i: CodeDescriptions(descriptions=["d"]) for i in codes})
+    cache.flush()
+    assert set(cache.get_many(codes)) == {3}
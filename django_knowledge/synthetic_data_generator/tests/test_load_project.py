@@ -0,0 +1,36 @@
+from django.core.management import call_command
+
+from chunking.models import Chunk
+from synthetic_data_generator.ingestion import content_hash
+from synthetic_data_generator.models import Project, PythonFile
+
+
+def test_reload_writes_only_changed_files(db, tmp_path):
+    root = tmp_path / "sample"
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "a.py").write_text("a = 1\n")
+    (root / "pkg" / "b.py").write_text("b = 1\n")
+    (root / "pkg" / "c.py").write_text("c = 1\n")
+    (root / ".venv").mkdir()
+    (root / ".venv" / "site.py").write_text("ignored = 1\n")
+
+    call_command("load_project", str(root))
+
+    project = Project.objects.get(name="sample")
+    files = {pf.module_path: pf for pf in PythonFile.objects.filter(project=project)}
+    assert set(files) == {"pkg/a.py", "pkg/b.py", "pkg/c.py"}
+    assert files["pkg/a.py"].content_hash == content_hash("a = 1\n")
+    Chunk.objects.create(python_file=files["pkg/b.py"], content="b = 1")
+
+    (root / "pkg" / "b.py").write_text("b = 2\n")
+    (root / "pkg" / "c.py").unlink()
+    (root / "pkg" / "d.py").write_text("d = 1\n")
+
+    call_command("load_project", str(root))
+
+    reloaded = {pf.module_path: pf for pf in PythonFile.objects.filter(project=project)}
+    assert set(reloaded) == {"pkg/a.py", "pkg/b.py", "pkg/d.py"}
+    assert reloaded["pkg/a.py"].updated_at == files["pkg/a.py"].updated_at
+    assert reloaded["pkg/b.py"].content == "b = 2\n"
+    assert reloaded["pkg/b.py"].content_hash == content_hash("b = 2\n")
+    assert not Chunk.objects.exists()
@@ -0,0 +1,84 @@
+from django.core.management import call_command
+
+from synthetic_data_generator.ingestion import content_hash
+from synthetic_data_generator.models import Project, PythonFile, SymbolTable
+from synthetic_data_generator.symbol_index import get_symbol_table
+from synthetic_data_generator.symbols import Symbol, extract_symbols, innermost_symbol
+
+SOURCE = '''import os
+from django.db import models
+from .utils import helper as h
+
+
+class Model(models.Model):
+    """A model."""
+
+    @property
+    def name(self) -> str:
+        return "x"
+
+    async def save(self, *args, force=False):
+        def inner():
+            pass
+
+
+def top(a, b=1):
+    """Top level.
+
+    More text."""
+    return a + b
+'''
+
+
+def test_extract_symbols():
+    module = extract_symbols(SOURCE)
+    assert module.imports == ["os", "django.db.models", ".utils.helper"]
+    assert [(s.kind, s.name, s.start_line, s.end_line) for s in module.symbols] == [
+        ("class", "Model", 6, 15),
+        ("method", "Model.name", 9, 11),
+        ("method", "Model.save", 13, 15),
+        ("function", "Model.save.inner", 14, 15),
+        ("function", "top", 18, 22),
+    ]
+    by_name = {s.name: s for s in module.symbols}
+    assert by_name["Model"].signature == "class Model(models.Model)"
+    assert by_name["Model"].docstring == "A model."
+    assert by_name["Model.name"].signature == "def name(self) -> str"
+    assert by_name["Model.save"].signature == "async def save(self, *args, force=False)"
+    assert innermost_symbol(module.symbols, 15).name == "Model.save.inner"
+    assert innermost_symbol(module.symbols, 5) is None
+
+
+def test_syntax_errors_are_recorded():
+    module = extract_symbols("print 'python 2'\n")
+    assert module.symbols == []
+    assert module.error.startswith("SyntaxError")
+
+
+def test_tables_are_shared_by_content_hash(db):
+    project = Project.objects.create(name="p", root_path="/p")
+    for path in ("a.py", "copy_of_a.py"):
+        PythonFile.objects.create(
+            project=project,
+            module_path=path,
+            content=SOURCE,
+            content_hash=content_hash(SOURCE),
+        )
+    PythonFile.objects.create(
+        project=project,
+        module_path="b.py",
+        content="x = 1\n",
+        content_hash=content_hash("x = 1\n"),
+    )
+
+    call_command("index_symbols", "--workers", "2")
+    assert SymbolTable.objects.count() == 2
+
+    table = get_symbol_table(PythonFile.objects.get(module_path="copy_of_a.py"))
+    assert table.get_symbols()[0] == Symbol(
+        "class", "Model", 6, 15, "class Model(models.Model)", "A model."
+    )
+
+    PythonFile.objects.filter(module_path="b.py").delete()
+    call_command("index_symbols", "--prune")
+    assert SymbolTable.objects.count() == 1
@@ -0,0 +1,67 @@
+from synthetic_data_generator.walking import (
+    GitIgnore,
+    WalkStats,
+    read_files,
+    walk_files,
+)
+
+
+def write(path, text=""):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_gitignore_patterns():
+    gitignore = GitIgnore.parse(
+        "/repo",
+        ["# comment", "", "*.gen.py", "build/", "/top.py", "docs/**/conf.py", "!keep.gen.py"],
+    )
+    assert gitignore.match("/repo/a/b.gen.py", False) is True
+    assert gitignore.match("/repo/a/keep.gen.py", False) is False
+    assert gitignore.match("/repo/a/build", True) is True
+    assert gitignore.match("/repo/a/build", False) is None
+    assert gitignore.match("/repo/top.py", False) is True
+    assert gitignore.match("/repo/a/top.py", False) is None
+    assert gitignore.match("/repo/docs/conf.py", False) is True
+    assert gitignore.match("/repo/docs/en/source/conf.py", False) is True
+
+
+def test_walk_prunes_excluded_and_ignored_dirs(tmp_path):
+    write(tmp_path / "a.py")
+    write(tmp_path / "pkg" / "b.py")
+    write(tmp_path / "pkg" / "notes.txt")
+    write(tmp_path / ".venv" / "lib" / "site.py")
+    write(tmp_path / "node_modules" / "x.py")
+    write(tmp_path / ".gitignore", "generated/\n*_pb2.py\n")
+    write(tmp_path / "generated" / "c.py")
+    write(tmp_path / "pkg" / "api_pb2.py")
+    write(tmp_path / "pkg" / "sub" / ".gitignore", "!*_pb2.py\n")
+    write(tmp_path / "pkg" / "sub" / "kept_pb2.py")
+
+    stats = WalkStats()
+    found = [p.relative_to(tmp_path).as_posix() for p in walk_files(tmp_path, stats=stats)]
+
+    assert found == ["a.py", "pkg/b.py", "pkg/sub/kept_pb2.py"]
+    assert sorted(p.rsplit("/", 1)[-1] for p in stats.pruned_dirs) == [
+        ".venv",
+        "generated",
+        "node_modules",
+    ]
+    assert stats.ignored_files == 1
+    assert [p.name for p in walk_files(tmp_path, respect_gitignore=False)].count(
+        "api_pb2.py"
+    ) == 1
+
+
+def test_read_files_keeps_order_and_reports_errors(tmp_path):
+    paths = []
+    for i in range(50):
+        write(tmp_path / f"{i}.py", f"x = {i}\n")
+        paths.append(tmp_path / f"{i}.py")
+    (tmp_path / "bad.py").write_bytes(b"\xff\xfe")
+    paths.append(tmp_path / "bad.py")
+
+    results = list(read_files(paths, workers=3))
+    assert [r.path for r in results] == paths
+    assert results[7].content == "x = 7\n"
+    assert isinstance(results[-1].error, UnicodeDecodeError)
@@ -0,0 +1,220 @@
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+# Directories never worth descending into when looking for source files
+DEFAULT_EXCLUDED_DIRS = frozenset(
+    {
+        "venv",
+        ".venv",
+        "env",
+        ".env",
+        "virtualenv",
+        ".virtualenv",
+        "envs",
+        ".envs",
+        ".git",
+        ".hg",
+        ".svn",
+        "node_modules",
+        "__pycache__",
+        ".tox",
+        ".nox",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".ruff_cache",
+        "site-packages",
+    }
+)
+DEFAULT_READ_WORKERS = 8
+
+
+def _translate(pattern: str) -> str:
+    """Regex for a single .gitignore glob, matched against a path relative to the file's directory."""
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            parts.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2 :]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1 : end]
+            if body[0] in "!^":
+                body = "^" + body[1:]
+            parts.append(f"[{body}]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(parts)
+
+
+@dataclass
+class IgnoreRule:
+    regex: re.Pattern
+    negate: bool
+    dir_only: bool
+
+
+@dataclass
+class GitIgnore:
+    """The rules of one .gitignore file, which apply below its directory."""
+
+    base: str
+    rules: list[IgnoreRule]
+
+    @classmethod
+    def parse(cls, base, lines: Iterable[str]) -> "GitIgnore":
+        rules = []
+        for line in lines:
+            line = line.rstrip("\n")
+            if not line.endswith("\\ "):
+                line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            # A slash anywhere but at the end anchors the pattern to the .gitignore's directory
+            anchored = "/" in line
+            regex = _translate(line.lstrip("/"))
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            rules.append(IgnoreRule(re.compile(regex + r"\Z"), negate, dir_only))
+        return cls(str(base), rules)
+
+    @classmethod
+    def from_file(cls, path: Path) -> "GitIgnore":
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return cls.parse(path.parent, f)
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """Whether `path` is ignored by this file, or None if no rule mentions it."""
+        relative = path[len(self.base) + 1 :].replace(os.sep, "/")
+        for rule in reversed(self.rules):
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.regex.match(relative):
+                return not rule.negate
+        return None
+
+
+def is_ignored(gitignores: list[GitIgnore], path: str, is_dir: bool) -> bool:
+    # The deepest .gitignore that has an opinion wins
+    for gitignore in reversed(gitignores):
+        ignored = gitignore.match(path, is_dir)
+        if ignored is not None:
+            return ignored
+    return False
+
+
+@dataclass
+class WalkStats:
+    dirs_scanned: int = 0
+    files_found: int = 0
+    ignored_files: int = 0
+    pruned_dirs: list[str] = field(default_factory=list)
+
+
+def walk_files(
+    root,
+    extensions: Iterable[str] = (".py",),
+    excluded_dirs: Iterable[str] = DEFAULT_EXCLUDED_DIRS,
+    respect_gitignore: bool = True,
+    stats: Optional[WalkStats] = None,
+) -> Iterator[Path]:
+    """Yield the files under `root` with one of the given extensions, in sorted depth-first order.
+
+    Excluded and git-ignored directories are pruned before they are descended
+    into, so their contents are never listed.
+    """
+    extensions = tuple(extensions)
+    excluded_dirs = frozenset(excluded_dirs)
+    stats = stats if stats is not None else WalkStats()
+
+    stack = [(str(root), [])]
+    while stack:
+        directory, gitignores = stack.pop()
+        stats.dirs_scanned += 1
+        gitignore_path = os.path.join(directory, ".gitignore")
+        if respect_gitignore and os.path.isfile(gitignore_path):
+            gitignores = gitignores + [GitIgnore.from_file(Path(gitignore_path))]
+
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name in excluded_dirs or is_ignored(gitignores, entry.path, True):
+                    stats.pruned_dirs.append(entry.path)
+                else:
+                    subdirs.append(entry.path)
+            elif entry.name.endswith(extensions) and entry.is_file():
+                if is_ignored(gitignores, entry.path, False):
+                    stats.ignored_files += 1
+                    continue
+                stats.files_found += 1
+                yield Path(entry.path)
+
+        stack.extend((subdir, gitignores) for subdir in reversed(subdirs))
+
+
+@dataclass
+class ReadResult:
+    path: Path
+    content: Optional[str] = None
+    error: Optional[Exception] = None
+
+
+def read_text(path: Path) -> ReadResult:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return ReadResult(path, content=f.read())
+    except Exception as e:
+        return ReadResult(path, error=e)
+
+
+def read_files(
+    paths: Iterable[Path], workers: int = DEFAULT_READ_WORKERS
+) -> Iterator[ReadResult]:
+    """Read and decode files in a thread pool, yielding results in the order of `paths`.
+
+    At most a few files per worker are in flight, so memory stays bounded
+    however many paths there are.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append(pool.submit(read_text, path))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import TokenCount
+
+
+@admin.register(TokenCount)
+class TokenCountAdmin(admin.ModelAdmin):
+    list_display = ("text_hash", "encoding", "num_tokens", "created_at")
+    list_filter = ("encoding",)
+    search_fields = ("text_hash",)
+    readonly_fields = ("created_at",)
@@ -0,0 +1,206 @@
+import hashlib
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from loguru import logger
+
+from tokenization.models import TokenCount
+from tokenization.registry import load_encoding
+
+DEFAULT_ENCODING = "cl100k_base"
+DEFAULT_LRU_SIZE = 50_000
+DB_BATCH_SIZE = 500
+
+
+def text_hash(text: str) -> str:
+    """Return the sha256 hex digest of the given text."""
+    h = hashlib.new("sha256")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class TokenCountCache:
+    """Token counts keyed by (sha256 of text, encoding name).
+
+    The encoding name is either a tiktoken encoding or an embedding model name
+    registered in `tokenization.registry`.
+
+    Lookups go to an in-process LRU first, then to the `TokenCount` table.
+    Only texts missing from both are tokenized, and their counts are written
+    back to the DB. The encoding is loaded lazily, so a fully warm cache never
+    touches tiktoken.
+    """
+
+    def __init__(
+        self,
+        encoding_name: str = DEFAULT_ENCODING,
+        maxsize: int = DEFAULT_LRU_SIZE,
+        encoding=None,
+    ):
+        self.encoding_name = encoding_name
+        self.maxsize = maxsize
+        self._encoding = encoding
+        self._lru: OrderedDict[str, int] = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @property
+    def encoding(self):
+        if self._encoding is None:
+            self._encoding = load_encoding(self.encoding_name)
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+    def count_many(self, texts: Iterable[str]) -> list[int]:
+        """Return the token count of every text, in order."""
+        texts = list(texts)
+        hashes = [text_hash(text) for text in texts]
+        counts: dict[str, int] = {}
+
+        missing = []
+        for h in hashes:
+            if h in counts:
+                continue
+            cached = self._lru_get(h)
+            if cached is None:
+                missing.append(h)
+            else:
+                counts[h] = cached
+                self.memory_hits += 1
+
+        for h, num_tokens in self._load_from_db(missing).items():
+            counts[h] = num_tokens
+            self._lru_put(h, num_tokens)
+            self.db_hits += 1
+
+        to_encode = {}
+        for h, text in zip(hashes, texts):
+            if h not in counts:
+                to_encode.setdefault(h, text)
+        if to_encode:
+            self._encode_and_store(to_encode, counts)
+
+        return [counts[h] for h in hashes]
+
+    def count_total(self, texts: Iterable[str], batch_size: int = DB_BATCH_SIZE) -> int:
+        """Return the summed token count of a (possibly streamed) iterable of texts."""
+        total = 0
+        batch = []
+        for text in texts:
+            batch.append(text)
+            if len(batch) == batch_size:
+                total += sum(self.count_many(batch))
+                batch = []
+        if batch:
+            total += sum(self.count_many(batch))
+        return total
+
+    @property
+    def lookups(self) -> int:
+        return self.memory_hits + self.db_hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        if not self.lookups:
+            return 0.0
+        return (self.memory_hits + self.db_hits) / self.lookups
+
+    def log_stats(self):
+        logger.info(
+            f"TOKEN_CACHE[{self.encoding_name}]:\t"
+            f"hit_rate={self.hit_rate:.2%} memory_hits={self.memory_hits} "
+            f"db_hits={self.db_hits} misses={self.misses}"
+        )
+
+    def _lru_get(self, h: str) -> Optional[int]:
+        if h not in self._lru:
+            return None
+        self._lru.move_to_end(h)
+        return self._lru[h]
+
+    def _lru_put(self, h: str, num_tokens: int):
+        self._lru[h] = num_tokens
+        self._lru.move_to_end(h)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def _load_from_db(self, hashes: list[str]) -> dict[str, int]:
+        found = {}
+        for i in range(0, len(hashes), DB_BATCH_SIZE):
+            batch = hashes[i : i + DB_BATCH_SIZE]
+            found.update(
+                TokenCount.objects.filter(
+                    encoding=self.encoding_name, text_hash__in=batch
+                ).values_list("text_hash", "num_tokens")
+            )
+        return found
+
+    def _encode_and_store(self, to_encode: dict[str, str], counts: dict[str, int]):
+        hashes = list(to_encode)
+        encoded = self.encoding.encode_ordinary_batch([to_encode[h] for h in hashes])
+        rows = []
+        for h, tokens in zip(hashes, encoded):
+            counts[h] = len(tokens)
+            self._lru_put(h, len(tokens))
+            self.misses += 1
+            rows.append(
+                TokenCount(
+                    text_hash=h, encoding=self.encoding_name, num_tokens=len(tokens)
+                )
+            )
+        TokenCount.objects.bulk_create(
+            rows, batch_size=DB_BATCH_SIZE, ignore_conflicts=True
+        )
+
+
+_token_counters: dict[str, TokenCountCache] = {}
+
+
+def backfill_token_counts(
+    queryset,
+    text_field: str,
+    count_field: str = "num_tokens",
+    encoding_name: str = DEFAULT_ENCODING,
+) -> int:
+    """Store the token count of every row of `queryset` whose `count_field` is null.
+
+    Only those rows' texts are loaded, in batches. Returns the number of rows filled.
+    """
+    token_counter = get_token_counter(encoding_name)
+    model = queryset.model
+    rows = (
+        queryset.filter(**{f"{count_field}__isnull": True})
+        .values_list("pk", text_field)
+        .iterator(chunk_size=DB_BATCH_SIZE)
+    )
+
+    filled = 0
+    batch = []
+
+    def flush():
+        counts = token_counter.count_many([text or "" for _, text in batch])
+        model.objects.bulk_update(
+            [model(pk=pk, **{count_field: n}) for (pk, _), n in zip(batch, counts)],
+            [count_field],
+            batch_size=DB_BATCH_SIZE,
+        )
+        return len(batch)
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) == DB_BATCH_SIZE:
+            filled += flush()
+            batch = []
+    if batch:
+        filled += flush()
+    return filled
+
+
+def get_token_counter(encoding_name: str = DEFAULT_ENCODING) -> TokenCountCache:
+    """Return the process-wide token count cache for the given encoding."""
+    if encoding_name not in _token_counters:
+        _token_counters[encoding_name] = TokenCountCache(encoding_name)
+    return _token_counters[encoding_name]
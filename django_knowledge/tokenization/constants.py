@@ -0,0 +1,3 @@
+# Constants for the tokenization app
+
+DEFAULT_TOKENIZERS_DIR = 'tokenizers'
@@ -0,0 +1,41 @@
+import shutil
+
+import djclick as click
+from loguru import logger
+
+from tokenization.constants import DEFAULT_TOKENIZERS_DIR
+from tokenization.registry import EMBEDDING_TOKENIZERS, tokenizer_path
+
+
+@click.command()
+@click.option(
+    "--model",
+    "models",
+    multiple=True,
+    help="Embedding model to fetch the tokenizer for (default: all registered models)",
+)
+@click.option(
+    "--tokenizers-dir",
+    default=DEFAULT_TOKENIZERS_DIR,
+    help="Directory to store tokenizer files in",
+)
+def command(models, tokenizers_dir):
+    """Download tokenizer.json of each registered embedding model from HuggingFace."""
+    from huggingface_hub import hf_hub_download
+
+    for model_name in models:
+        if model_name not in EMBEDDING_TOKENIZERS:
+            raise click.BadParameter(f"No tokenizer registered for {model_name}")
+
+    for model_name in models or EMBEDDING_TOKENIZERS:
+        path = tokenizer_path(model_name, tokenizers_dir)
+        if path.exists():
+            logger.info(f"Tokenizer for {model_name} already at {path}")
+            continue
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        downloaded = hf_hub_download(
+            EMBEDDING_TOKENIZERS[model_name].hf_repo, "tokenizer.json"
+        )
+        shutil.copy(downloaded, path)
+        logger.success(f"Saved tokenizer for {model_name} to {path}")
@@ -0,0 +1,122 @@
+import json
+from pathlib import Path
+
+import djclick as click
+from loguru import logger
+
+from chunking.chunker import materialize_chunks
+from chunking.models import Chunk, ChunkDescription
+from embedding_generator.persistence import (
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_BATCH_TOKENS,
+)
+from html_download.models import Page
+from synthetic_data_generator.models import PythonFile
+from tokenization.cache import DB_BATCH_SIZE, get_token_counter
+from tokenization.profiling import TokenLengthProfile
+
+# Model, text field and filter of each profiled table. Only leaf chunks are
+# embedded, the hierarchy parents above them are profiled separately.
+TABLES = {
+    "python_file": (PythonFile, "content", {}),
+    "chunk": (Chunk, "text", {"is_leaf": True}),
+    "chunk_parent": (Chunk, "text", {"is_leaf": False}),
+    "chunk_description": (ChunkDescription, "description", {}),
+    "page": (Page, "cleaned_text", {}),
+}
+
+
+@click.command()
+@click.option(
+    "--encoding",
+    default="cl100k_base",
+    help="tiktoken encoding or registered embedding model to count tokens with",
+)
+@click.option(
+    "--table",
+    "tables",
+    multiple=True,
+    type=click.Choice(list(TABLES)),
+    help="Table to profile (default: all)",
+)
+@click.option(
+    "--batch-tokens",
+    multiple=True,
+    type=int,
+    default=[DEFAULT_MAX_BATCH_TOKENS],
+    help="Embedding batch token budget to estimate request counts for",
+)
+@click.option(
+    "--batch-size",
+    default=DEFAULT_MAX_BATCH_SIZE,
+    type=int,
+    help="Maximum number of texts per embedding request",
+)
+@click.option(
+    "--output",
+    default="token_profile.json",
+    help="Report path, written as Parquet if it ends in .parquet and JSON otherwise",
+)
+def command(encoding, tables, batch_tokens, batch_size, output):
+    """Profile the token-length distribution of every text table in bounded memory."""
+    token_counter = get_token_counter(encoding)
+    report = {}
+
+    for table in tables or TABLES:
+        model, field, filters = TABLES[table]
+        profile = TokenLengthProfile(list(batch_tokens), batch_size)
+        batch = []
+        for text in table_texts(model, field, filters):
+            batch.append(text)
+            if len(batch) == DB_BATCH_SIZE:
+                profile.add_many(token_counter.count_many(batch))
+                batch = []
+        profile.add_many(token_counter.count_many(batch))
+
+        report[table] = profile.report()
+        logger.info(
+            f"{table}:\tcount={profile.count} p50={report[table]['p50']:.0f} "
+            f"p95={report[table]['p95']:.0f} p99={report[table]['p99']:.0f} "
+            f"requests={report[table]['expected_requests']}"
+        )
+
+    token_counter.log_stats()
+    write_report(report, Path(output), encoding)
+    logger.success(f"Wrote token profile to {output}")
+
+
+def table_texts(model, field, filters):
+    if model is Chunk:
+        # Offsets-only chunks and hierarchy parents store no content, their text is sliced from the file
+        chunks = (
+            Chunk.objects.filter(**filters)
+            .only("content", "python_file_id", "start_byte", "end_byte")
+            .iterator(chunk_size=DB_BATCH_SIZE)
+        )
+        return (chunk.text for chunk in materialize_chunks(chunks))
+    return (
+        model.objects.filter(**filters)
+        .exclude(**{f"{field}__isnull": True})
+        .values_list(field, flat=True)
+        .iterator(chunk_size=DB_BATCH_SIZE)
+    )
+
+
+def write_report(report: dict, path: Path, encoding: str):
+    if path.suffix == ".parquet":
+        import pandas as pd
+
+        rows = []
+        for table, stats in report.items():
+            row = {"table": table, "encoding": encoding}
+            row.update(
+                {k: v for k, v in stats.items() if k not in ("expected_requests", "histogram")}
+            )
+            for budget, requests in stats["expected_requests"].items():
+                row[f"requests_{budget}"] = requests
+            row["histogram_bin_starts"] = stats["histogram"]["bin_starts"]
+            row["histogram_counts"] = stats["histogram"]["counts"]
+            rows.append(row)
+        pd.DataFrame(rows).to_parquet(path)
+    else:
+        path.write_text(json.dumps({"encoding": encoding, "tables": report}, indent=2))
@@ -0,0 +1,29 @@
+# Generated by Django 6.1.2 on 2026-10-19 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text_hash', models.CharField(max_length=64)),
+                ('encoding', models.CharField(max_length=100)),
+                ('num_tokens', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Token Count',
+                'verbose_name_plural': 'Token Counts',
+                'constraints': [models.UniqueConstraint(fields=('text_hash', 'encoding'), name='unique_token_count')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import models
+
+
+class TokenCount(models.Model):
+    """Token count of a text, keyed by the sha256 of the text and the encoding name."""
+
+    text_hash = models.CharField(max_length=64)
+    encoding = models.CharField(max_length=100)
+    num_tokens = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Token Count"
+        verbose_name_plural = "Token Counts"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["text_hash", "encoding"], name="unique_token_count"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.encoding}:{self.text_hash[:12]} ({self.num_tokens})"
@@ -0,0 +1,98 @@
+import numpy as np
+
+# Integer-wide bins for short texts, then log-spaced bins up to 16M tokens.
+# Quantiles read off these bins are within ~3% of the exact value while the
+# memory used per profile stays fixed no matter how many texts are added.
+BIN_EDGES = np.unique(
+    np.concatenate(
+        [np.arange(0, 64), np.geomspace(64, 2**24, 400).astype(np.int64)]
+    )
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RequestEstimator:
+    """Count the embedding requests a stream of texts needs under a batch budget.
+
+    Follows the same packing rule as `embedding_generator.persistence.pack_batches`.
+    """
+
+    def __init__(self, max_batch_tokens: int, max_batch_size: int):
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.requests = 0
+        self._batch_tokens = 0
+        self._batch_len = 0
+
+    def add(self, num_tokens: int):
+        if self._batch_len and (
+            self._batch_tokens + num_tokens > self.max_batch_tokens
+            or self._batch_len == self.max_batch_size
+        ):
+            self._batch_tokens = 0
+            self._batch_len = 0
+        if not self._batch_len:
+            self.requests += 1
+        self._batch_tokens += num_tokens
+        self._batch_len += 1
+
+
+class TokenLengthProfile:
+    """Streaming token-length distribution backed by a fixed-size histogram."""
+
+    def __init__(self, batch_budgets: list[int], max_batch_size: int):
+        self.histogram = np.zeros(len(BIN_EDGES), dtype=np.int64)
+        self.count = 0
+        self.total_tokens = 0
+        self.min = None
+        self.max = None
+        self.estimators = [
+            RequestEstimator(budget, max_batch_size) for budget in batch_budgets
+        ]
+
+    def add_many(self, token_counts: list[int]):
+        if not token_counts:
+            return
+        counts = np.asarray(token_counts, dtype=np.int64)
+        bins = np.searchsorted(BIN_EDGES, counts, side="right") - 1
+        self.histogram += np.bincount(bins, minlength=len(BIN_EDGES))
+        self.count += len(counts)
+        self.total_tokens += int(counts.sum())
+        low, high = int(counts.min()), int(counts.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        for estimator in self.estimators:
+            for num_tokens in token_counts:
+                estimator.add(num_tokens)
+
+    def quantile(self, q: float) -> float:
+        """Approximate the q-th quantile by interpolating inside the histogram bin."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = np.cumsum(self.histogram)
+        i = int(np.searchsorted(cumulative, target, side="left"))
+        below = cumulative[i - 1] if i else 0
+        in_bin = self.histogram[i]
+        low = BIN_EDGES[i]
+        high = BIN_EDGES[i + 1] if i + 1 < len(BIN_EDGES) else low + 1
+        value = low + (high - low) * ((target - below) / in_bin if in_bin else 0)
+        return float(min(max(value, self.min), self.max))
+
+    def report(self) -> dict:
+        nonzero = np.nonzero(self.histogram)[0]
+        return {
+            "count": self.count,
+            "total_tokens": self.total_tokens,
+            "mean": self.total_tokens / self.count if self.count else 0.0,
+            "min": self.min or 0,
+            "max": self.max or 0,
+            **{f"p{round(q * 100)}": self.quantile(q) for q in QUANTILES},
+            "expected_requests": {
+                str(e.max_batch_tokens): e.requests for e in self.estimators
+            },
+            "histogram": {
+                "bin_starts": BIN_EDGES[nonzero].tolist(),
+                "counts": self.histogram[nonzero].tolist(),
+            },
+        }
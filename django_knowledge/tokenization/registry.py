@@ -0,0 +1,143 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+import tiktoken
+
+from tokenization.constants import DEFAULT_TOKENIZERS_DIR
+
+
+@dataclass(frozen=True)
+class TokenizerSpec:
+    hf_repo: str
+    max_tokens: int
+
+
+# Keyed by the names used in EmbeddingModel.create_defaults. `hf_repo` is the
+# HuggingFace repository the model's tokenizer.json comes from and
+# `max_tokens` is the model's maximum input length.
+EMBEDDING_TOKENIZERS: dict[str, TokenizerSpec] = {
+    "text-embedding-granite-embedding-30m-english": TokenizerSpec(
+        "ibm-granite/granite-embedding-30m-english", 512
+    ),
+    "text-embedding-granite-embedding-125m-english": TokenizerSpec(
+        "ibm-granite/granite-embedding-125m-english", 512
+    ),
+    "text-embedding-embeddinggemma-300m": TokenizerSpec(
+        "google/embeddinggemma-300m", 2048
+    ),
+    "text-embedding-granite-embedding-278m-multilingual": TokenizerSpec(
+        "ibm-granite/granite-embedding-278m-multilingual", 512
+    ),
+    "text-embedding-qwen3-embedding-0.6b": TokenizerSpec(
+        "Qwen/Qwen3-Embedding-0.6B", 32768
+    ),
+    "text-embedding-qwen3-embedding-4b": TokenizerSpec(
+        "Qwen/Qwen3-Embedding-4B", 32768
+    ),
+    "text-embedding-qwen3-embedding-8b": TokenizerSpec(
+        "Qwen/Qwen3-Embedding-8B", 32768
+    ),
+    "granite-embedding-107m-multilingual-GGUF": TokenizerSpec(
+        "ibm-granite/granite-embedding-107m-multilingual", 512
+    ),
+    "jina-embeddings-v4-text-retrieval-GGUF": TokenizerSpec(
+        "jinaai/jina-embeddings-v4", 32768
+    ),
+    "All-MiniLM-L6-v2-Embedding-GGUF": TokenizerSpec(
+        "sentence-transformers/all-MiniLM-L6-v2", 256
+    ),
+    "jina-code-embeddings-1.5b-GGUF": TokenizerSpec(
+        "jinaai/jina-code-embeddings-1.5b", 32768
+    ),
+    "jina-embeddings-v4-text-code-GGUF": TokenizerSpec(
+        "jinaai/jina-embeddings-v4", 32768
+    ),
+    "jina-embeddings-v2-base-code-GGUF": TokenizerSpec(
+        "jinaai/jina-embeddings-v2-base-code", 8192
+    ),
+}
+
+
+class TokenizerNotFound(Exception):
+    pass
+
+
+class EmbeddingTokenizer:
+    """An embedding model's own tokenizer, loaded from a local tokenizer.json."""
+
+    def __init__(self, model_name: str, spec: TokenizerSpec, backend):
+        self.name = model_name
+        self.spec = spec
+        self.backend = backend
+        self.num_special_tokens = len(backend.encode("", add_special_tokens=True).ids)
+
+    @property
+    def max_tokens(self) -> int:
+        return self.spec.max_tokens
+
+    @property
+    def max_content_tokens(self) -> int:
+        """Tokens left for the text itself once the model's special tokens are added."""
+        return self.max_tokens - self.num_special_tokens
+
+    def encode(self, text: str) -> list[int]:
+        return self.backend.encode(text, add_special_tokens=False).ids
+
+    def encode_batch(self, texts: Sequence[str]) -> list[list[int]]:
+        return [
+            encoding.ids
+            for encoding in self.backend.encode_batch(
+                list(texts), add_special_tokens=False
+            )
+        ]
+
+    # Lets TokenCountCache use an EmbeddingTokenizer like a tiktoken encoding.
+    encode_ordinary_batch = encode_batch
+
+    def count_tokens_batch(self, texts: Sequence[str]) -> list[int]:
+        return [len(ids) for ids in self.encode_batch(texts)]
+
+
+def is_registered(model_name: str) -> bool:
+    return model_name in EMBEDDING_TOKENIZERS
+
+
+def tokenizer_path(model_name: str, tokenizers_dir=DEFAULT_TOKENIZERS_DIR) -> Path:
+    spec = EMBEDDING_TOKENIZERS[model_name]
+    return Path(tokenizers_dir) / spec.hf_repo.replace("/", "_") / "tokenizer.json"
+
+
+_tokenizers: dict[str, EmbeddingTokenizer] = {}
+
+
+def get_tokenizer(
+    model_name: str, tokenizers_dir=DEFAULT_TOKENIZERS_DIR
+) -> EmbeddingTokenizer:
+    """Return the tokenizer of the given embedding model, loading it once per process."""
+    if model_name in _tokenizers:
+        return _tokenizers[model_name]
+
+    if not is_registered(model_name):
+        raise TokenizerNotFound(f"No tokenizer registered for {model_name}")
+
+    path = tokenizer_path(model_name, tokenizers_dir)
+    if not path.exists():
+        raise TokenizerNotFound(
+            f"Tokenizer file {path} not found, run `manage.py fetch_tokenizers` first"
+        )
+
+    from tokenizers import Tokenizer
+
+    tokenizer = EmbeddingTokenizer(
+        model_name, EMBEDDING_TOKENIZERS[model_name], Tokenizer.from_file(str(path))
+    )
+    _tokenizers[model_name] = tokenizer
+    return tokenizer
+
+
+def load_encoding(name: str):
+    """Return the registered embedding tokenizer for `name`, else the tiktoken encoding."""
+    if is_registered(name):
+        return get_tokenizer(name)
+    return tiktoken.get_encoding(name)
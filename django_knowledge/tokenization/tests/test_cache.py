@@ -0,0 +1,96 @@
+import re
+
+from pytest import fixture
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from synthetic_data_generator.models import Project, PythonFile
+from tokenization import cache as cache_module
+from tokenization.cache import TokenCountCache, backfill_token_counts
+from tokenization.models import TokenCount
+
+
+class WhitespaceEncoding:
+    name = "whitespace"
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode_ordinary_batch(self, texts):
+        self.encoded.extend(texts)
+        return [text.split() for text in texts]
+
+
+@fixture
+def encoding():
+    return WhitespaceEncoding()
+
+
+def test_counts_are_cached_in_memory_and_db(db, encoding):
+    cache = TokenCountCache("whitespace", encoding=encoding)
+    assert cache.count_many(["a b c", "d e", "a b c"]) == [3, 2, 3]
+    assert encoding.encoded == ["a b c", "d e"]
+    assert TokenCount.objects.count() == 2
+
+    assert cache.count("d e") == 2
+    assert cache.memory_hits == 1
+
+    fresh_encoding = WhitespaceEncoding()
+    fresh_cache = TokenCountCache("whitespace", encoding=fresh_encoding)
+    assert fresh_cache.count_total(["a b c", "d e"]) == 5
+    assert fresh_encoding.encoded == []
+    assert fresh_cache.db_hits == 2
+    assert fresh_cache.hit_rate == 1.0
+
+
+def test_counts_are_keyed_by_encoding(db, encoding):
+    TokenCountCache("whitespace", encoding=encoding).count("a b")
+    other = TokenCountCache("other", encoding=WhitespaceEncoding())
+    other.count("a b")
+    assert other.misses == 1
+    assert TokenCount.objects.count() == 2
+
+
+def test_lru_evicts_oldest_entries(db, encoding):
+    cache = TokenCountCache("whitespace", maxsize=2, encoding=encoding)
+    cache.count_many(["a", "b", "c"])
+    assert len(cache._lru) == 2
+    cache.count("a")
+    assert cache.db_hits == 1
+
+
+def test_backfill_only_counts_missing_rows(db, encoding, monkeypatch):
+    monkeypatch.setitem(
+        cache_module._token_counters,
+        "whitespace",
+        TokenCountCache("whitespace", encoding=encoding),
+    )
+    project = Project.objects.create(name="p", root_path="/p")
+    PythonFile.objects.create(project=project, module_path="a.py", content="a b c")
+    PythonFile.objects.create(
+        project=project, module_path="b.py", content="d e", num_tokens=7
+    )
+
+    filled = backfill_token_counts(
+        PythonFile.objects.all(), "content", encoding_name="whitespace"
+    )
+    assert filled == 1
+    assert encoding.encoded == ["a b c"]
+    assert dict(PythonFile.objects.values_list("module_path", "num_tokens")) == {
+        "a.py": 3,
+        "b.py": 7,
+    }
+
+
+def test_code_stats_never_load_contents(db):
+    project = Project.objects.create(name="p", root_path="/p")
+    PythonFile.objects.create(
+        project=project, module_path="a.py", content="a b c", num_tokens=3
+    )
+    with CaptureQueriesContext(connection) as queries:
+        call_command("get_code_stats")
+    # Contents may only appear inside LENGTH() or filters, never as a selected column
+    selected_content = re.compile(r'\."content"(,| FROM)')
+    assert not any(selected_content.search(query["sql"]) for query in queries)
@@ -0,0 +1,29 @@
+import numpy as np
+
+from embedding_generator.persistence import pack_batches
+from tokenization.profiling import TokenLengthProfile
+
+
+def test_quantiles_stay_close_to_exact_values():
+    rng = np.random.default_rng(0)
+    counts = rng.lognormal(mean=6, sigma=1.2, size=20_000).astype(int).tolist()
+    profile = TokenLengthProfile([4096], max_batch_size=32)
+    for i in range(0, len(counts), 500):
+        profile.add_many(counts[i : i + 500])
+
+    assert profile.count == len(counts)
+    assert profile.total_tokens == sum(counts)
+    for q in (0.5, 0.95, 0.99):
+        exact = np.quantile(counts, q)
+        assert abs(profile.quantile(q) - exact) / exact < 0.05
+
+
+def test_expected_requests_match_pack_batches():
+    counts = [100, 5000, 30, 30, 4000, 4000, 1, 1, 1]
+    profile = TokenLengthProfile([4096, 8192], max_batch_size=2)
+    profile.add_many(counts)
+    report = profile.report()
+
+    for budget in (4096, 8192):
+        batches = list(pack_batches(counts, counts, budget, 2))
+        assert report["expected_requests"][str(budget)] == len(batches)
@@ -0,0 +1,48 @@
+from pytest import fixture, raises
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+from tokenizers.processors import TemplateProcessing
+
+from embedding_generator.persistence import pack_batches
+from tokenization import registry
+from tokenization.registry import TokenizerNotFound, get_tokenizer, tokenizer_path
+
+MODEL_NAME = "All-MiniLM-L6-v2-Embedding-GGUF"
+
+
+@fixture
+def tokenizers_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "_tokenizers", {})
+    vocab = {"[UNK]": 0, "[CLS]": 1, "[SEP]": 2, "def": 3, "foo": 4}
+    tokenizer = Tokenizer(WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.post_processor = TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 1), ("[SEP]", 2)]
+    )
+    path = tokenizer_path(MODEL_NAME, tmp_path)
+    path.parent.mkdir(parents=True)
+    tokenizer.save(str(path))
+    return tmp_path
+
+
+def test_get_tokenizer_loads_local_file(tokenizers_dir):
+    tokenizer = get_tokenizer(MODEL_NAME, tokenizers_dir)
+    assert tokenizer.max_tokens == 256
+    assert tokenizer.max_content_tokens == 254
+    assert tokenizer.encode_batch(["def foo", "foo bar baz"]) == [[3, 4], [4, 0, 0]]
+    assert get_tokenizer(MODEL_NAME) is tokenizer
+
+
+def test_get_tokenizer_requires_local_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(registry, "_tokenizers", {})
+    with raises(TokenizerNotFound):
+        get_tokenizer(MODEL_NAME, tmp_path)
+    with raises(TokenizerNotFound):
+        get_tokenizer("unknown-model", tmp_path)
+
+
+def test_pack_batches_respects_token_and_size_budget():
+    docs = ["a", "b", "c", "d", "e"]
+    batches = list(pack_batches(docs, [4, 4, 9, 1, 1], max_batch_tokens=8, max_batch_size=2))
+    assert batches == [["a", "b"], ["c"], ["d", "e"]]
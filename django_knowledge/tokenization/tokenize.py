@@ -1,18 +1,21 @@
 # Coded by the VS Code Agent using GPT-5 mini model
 # No human editing needed to run successfully
+from django.db.models import Sum
+from django.db.models.functions import Length
 from html_download.models import Page
 from loguru import logger
-import tiktoken
+
+from tokenization.cache import get_token_counter
 
 
 def count_tokens():
-    all_texts = []
-    for page in Page.objects.all():
-        all_texts.append(page.cleaned_text)
+    pages = Page.objects.exclude(cleaned_text__isnull=True)
+    token_counter = get_token_counter("cl100k_base")
 
-    combined = "\n\n".join(all_texts)
+    texts = pages.values_list("cleaned_text", flat=True).iterator()
+    total_tokens = token_counter.count_total(texts)
+    total_chars = pages.aggregate(total=Sum(Length("cleaned_text")))["total"] or 0
 
-    enc = tiktoken.get_encoding("cl100k_base")
-    tokens = enc.encode(combined)
-    logger.info("TOTAL_TOKENS:\t" + str(len(tokens)))
-    logger.info("TOTAL_CHARS:\t" + str(len(combined)))
+    logger.info("TOTAL_TOKENS:\t" + str(total_tokens))
+    logger.info("TOTAL_CHARS:\t" + str(total_chars))
+    token_counter.log_stats()
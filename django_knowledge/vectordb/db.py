@@ -2,6 +2,7 @@ from dataclasses import dataclass
 from typing import Dict, List, Optional, Type
 
 import chromadb
+from pathlib import Path
 
 
 @dataclass
@@ -30,11 +31,14 @@ class ChromaDB:
         self,
         documents: List[Doc],
         metadatas: Optional[List[Dict]] = None,
+        embeddings: Optional[List] = None,
     ) -> None:
+        """Add documents, embedding them unless their `embeddings` are given."""
         self.collection.add(
             ids=[d.id for d in documents],
             documents=[d.text for d in documents],
             metadatas=metadatas,
+            embeddings=embeddings,
         )
 
     def get_collection(self, collection_name: str, embedding_generator_class: Type):
@@ -51,9 +55,42 @@ class ChromaDB:
     def search(self, text: str, top_k: int):
         return self.collection.query(query_texts=[text], n_results=top_k)
 
+    def existing_ids(self, document_ids: List[str], batch_size: int = 1000) -> set:
+        found = set()
+        for i in range(0, len(document_ids), batch_size):
+            result = self.collection.get(
+                ids=document_ids[i : i + batch_size], include=[]
+            )
+            found.update(result["ids"])
+        return found
+
+    def get_embeddings(self, document_ids: List[str], batch_size: int = 1000) -> Dict:
+        """Stored embeddings of the given documents, by id; missing documents are left out."""
+        found = {}
+        for i in range(0, len(document_ids), batch_size):
+            result = self.collection.get(
+                ids=document_ids[i : i + batch_size], include=["embeddings"]
+            )
+            found.update(zip(result["ids"], result["embeddings"]))
+        return found
+
     def document_exists(self, document_id: str) -> bool:
         try:
             result = self.collection.get(ids=[document_id])
             return len(result["ids"]) > 0
         except Exception:
             return False
+
+
+def delete_from_all_collections(path: str, document_ids: List[str]) -> int:
+    """Delete the given documents from every collection stored at `path`.
+
+    Returns the number of collections touched. Does nothing if no database exists at `path`.
+    """
+    if not document_ids or not Path(path).exists():
+        return 0
+    client = chromadb.PersistentClient(path=path)
+    collections = client.list_collections()
+    for collection in collections:
+        collection.delete(ids=document_ids)
+    return len(collections)